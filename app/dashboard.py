@@ -7,21 +7,50 @@ MELHORIAS PRINCIPAIS:
 ✅ Storytelling: Overview → Diagnóstico → Ação
 ✅ Gráficos simplificados e mais diretos
 ✅ Mini-charts nos KPIs (sparklines)
-✅ Cards de insights automáticos
+✅ Cards de insights automáticos (regras por segmento)
 ✅ Hierarquia visual clara
 """
 
 import streamlit as st
-import duckdb
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
+import plotly.io as pio
 from plotly.subplots import make_subplots
 import google.generativeai as genai
+import json
 import os
 from dotenv import load_dotenv
 from datetime import datetime
+from urllib.parse import quote, urlencode
+from urllib.request import urlopen
 import numpy as np
+import sys
+
+# pasta raiz ao caminho de busca do Python (o Streamlit executa a partir de app/)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.helpers import conectar_duckdb
+from src.utils.manifest import ler_manifesto
+from src.utils.snapshots import snapshot_canonico, assinatura_tabelas, TABELAS_DASHBOARD, SNAPSHOTS_SUBDIR
+from src.utils.downsampling import GRANULARIDADES, reamostrar_serie, reduzir_para_pixels
+from src.utils import profiler
+from src.analysis.insights import avaliar_regras, cards_insight, kpis_por_segmento
+from src.analysis.cenarios_brent import base_cenarios, resumo_cenario, simular_grade
+from src.transform.forecast_layer import TODOS, previsao_total, resumo_previsao
+from src.transform.anomaly_layer import anomalias_recentes
+from src.analysis.lead_time import (
+    METRICAS_LEAD_TIME, SEGMENTOS_LEAD_TIME, periodo_sketch, quantis_lead_time
+)
+from src.serving.exportacao import (
+    FORMATOS, ExportacaoIndisponivel, blocos_exportacao, contar_linhas, excel_disponivel, nome_arquivo
+)
+from src.serving.drill_down import (
+    ORDENACOES, TAMANHO_PAGINA, fato_ordenada_pela_chave, pagina_itens, tem_chave_paginacao
+)
+from contextlib import contextmanager
+import functools
+import traceback
 
 # ============================================================================
 # 1. CONFIGURAÇÃO INICIAL
@@ -29,15 +58,23 @@ import numpy as np
 
 load_dotenv()
 gemini_key = os.getenv("GEMINI_API_KEY")
+
+
+@st.cache_resource(show_spinner=False)
+def configurar_modelo_ia(api_key):
+    """Descobre o modelo Gemini uma única vez por processo (não a cada rerun)."""
+    genai.configure(api_key=api_key)
+    # Busca modelos disponíveis que suportam geração de conteúdo
+    available_models = [m.name for m in genai.list_models() if 'generateContent' in m.supported_generation_methods]
+    # Prioriza o flash, se não houver, pega o primeiro disponível
+    model_name = 'models/gemini-1.5-flash' if 'models/gemini-1.5-flash' in available_models else available_models[0]
+    return genai.GenerativeModel(model_name)
+
+
 model = None
 if gemini_key:
-    genai.configure(api_key=gemini_key)
     try:
-        # Busca modelos disponíveis que suportam geração de conteúdo
-        available_models = [m.name for m in genai.list_models() if 'generateContent' in m.supported_generation_methods]
-        # Prioriza o flash, se não houver, pega o primeiro disponível
-        model_name = 'models/gemini-1.5-flash' if 'models/gemini-1.5-flash' in available_models else available_models[0]
-        model = genai.GenerativeModel(model_name)
+        model = configurar_modelo_ia(gemini_key)
     except Exception as e:
         st.error(f"Erro ao configurar IA: {e}")
 
@@ -242,10 +279,148 @@ st.markdown("""
 # 3. FUNÇÕES DE CARREGAMENTO
 # ============================================================================
 
+GOLD_ROOT = os.path.join("data", "gold")
+
+# Orçamento de pontos por série na timeline (~ largura útil do gráfico em pixels)
+TIMELINE_MAX_PONTOS = 800
+
+# Máximo de figuras serializadas mantidas no cache compartilhado (LRU)
+FIGURAS_CACHE_MAX = 64
+
+# Modo profiling (opt-in): padrão vem do ambiente, pode ser ligado na sidebar
+PROFILING_PADRAO = os.getenv("DASHBOARD_PROFILING", "0") == "1"
+PROFILING_LOG = os.path.join("data", "logs", "dashboard_profile.jsonl")
+
+# Intervalo (s) para checar se um novo snapshot foi publicado (0 desliga)
+ATUALIZACAO_S = int(os.getenv("DASHBOARD_ATUALIZACAO_S", "30"))
+
+# Cards de insight exibidos no overview (top violações do catálogo de regras)
+INSIGHTS_MAX = int(os.getenv("DASHBOARD_INSIGHTS_MAX", "6"))
+
+# Bloco de anomalias: janela (últimos dias de dados) e cards exibidos
+ANOMALIAS_DIAS = int(os.getenv("DASHBOARD_ANOMALIAS_DIAS", "7"))
+ANOMALIAS_CARDS = 4
+
+# Extrato pelo navegador: o Streamlit guarda o arquivo pronto inteiro na memória do processo
+# (~110 bytes por linha em CSV -> ~11 MB em 100 mil linhas). Acima disso, só em streaming pelo serviço HTTP
+EXPORTACAO_MAX_LINHAS = int(os.getenv("DASHBOARD_EXPORTACAO_MAX_LINHAS", "100000"))
+EXPORTACAO_URL = os.getenv(
+    "DASHBOARD_EXPORTACAO_URL",
+    f"http://{os.getenv('KPI_SERVICE_HOST', '127.0.0.1')}:{os.getenv('KPI_SERVICE_PORT', '8502')}/exportar"
+)
+
+# Serviço de KPIs compartilhado (opt-in, ex.: http://127.0.0.1:8502): os quantis de lead time
+# vêm do cache do serviço, aquecido uma vez para todas as réplicas. Vazio = consulta local.
+KPI_SERVICE_URL = os.getenv("DASHBOARD_KPI_SERVICE_URL", "")
+KPI_SERVICE_TIMEOUT_S = float(os.getenv("DASHBOARD_KPI_SERVICE_TIMEOUT_S", "5"))
+
+
+def snapshot_dados(gold_root):
+    """
+    Snapshot usado como chave dos caches: o canônico do publicado (o mais antigo com as
+    mesmas tabelas do dashboard, ver snapshots.snapshot_canonico).
+    Impacto: um build que só altera outras tabelas (ex.: clickstream) publica uma versão nova
+    sem invalidar nenhum cache do dashboard; só mudanças em fato/dimensões lidas recarregam.
+    A limpeza de snapshots preserva o canônico, então os caches podem continuar lendo dele.
+    """
+    return snapshot_canonico(gold_root, TABELAS_DASHBOARD)
+
+
+# Modo aproximado (opt-in): amostra Bernoulli do fact_vendas
+APROXIMADO_PADRAO = os.getenv("DASHBOARD_APROXIMADO", "0") == "1"
+AMOSTRA_ALVO_LINHAS = int(os.getenv("DASHBOARD_AMOSTRA_LINHAS", "200000"))
+AMOSTRA_SEED = 42  # Amostra repetível: mesma fração -> mesmas linhas -> cache estável
+Z_95 = 1.96
+
+
+def linhas_fato(gold_path):
+    """Linhas do fact_vendas pelo manifesto (ou pelo rodapé do Parquet): nenhuma página de dados é lida."""
+    manifesto = ler_manifesto(gold_path)
+    try:
+        return manifesto['tabelas']['fact_vendas']['linhas']
+    except (TypeError, KeyError):
+        fact_path = os.path.join(gold_path, "fact_vendas.parquet").replace("\\", "/")
+        con = conectar_duckdb("dashboard")
+        total = con.execute(f"SELECT COUNT(*) FROM read_parquet('{fact_path}')").fetchone()[0]
+        con.close()
+        return total
+
+
+def fracao_amostra(gold_path):
+    """Fração da amostra Bernoulli que leva o fact_vendas a ~AMOSTRA_ALVO_LINHAS linhas."""
+    total = linhas_fato(gold_path)
+    if total <= AMOSTRA_ALVO_LINHAS:
+        return 1.0
+    return round(AMOSTRA_ALVO_LINHAS / total, 6)
+
+
+def escala_amostra(df):
+    """Fator que expande somas e contagens da amostra para o total (1.0 no modo exato)."""
+    return 1 / df.attrs.get('fracao_amostra', 1.0)
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def estatisticas_rapidas(gold_path, fracao=1.0):
+    """
+    Quick Stats. Exato (fracao = 1): uma varredura da fato com COUNT(DISTINCT) e quantile_cont.
+    Aproximado: nenhuma varredura da fato — registros pelo manifesto, países/categorias/clientes
+    pelas dimensões (pequenas; cada linha nasce de uma venda da Silver) e quantis de dias de
+    envio na amostra Bernoulli já carregada para os KPIs (load_gold_data, mesmo cache).
+    """
+    profiler.marcar_miss('estatisticas_rapidas')
+    fact_path = os.path.join(gold_path, "fact_vendas.parquet").replace("\\", "/")
+    dim_cli = os.path.join(gold_path, "dim_clientes.parquet").replace("\\", "/")
+    dim_prod = os.path.join(gold_path, "dim_produtos.parquet").replace("\\", "/")
+
+    try:
+        con = conectar_duckdb("dashboard")
+        if fracao < 1:
+            paises, clientes = con.execute(
+                f"SELECT COUNT(DISTINCT cliente_pais), COUNT(*) FROM read_parquet('{dim_cli}')"
+            ).fetchone()
+            categorias = con.execute(f"SELECT COUNT(DISTINCT categoria) FROM read_parquet('{dim_prod}')").fetchone()[0]
+            registros = linhas_fato(gold_path)
+            amostra, _ = load_gold_data(gold_path, fracao)
+            dias_envio = (
+                amostra['dias_envio_real'].quantile([0.5, 0.9]).tolist()
+                if amostra is not None and amostra['dias_envio_real'].notna().any() else None
+            )
+        else:
+            registros, paises, categorias, clientes, dias_envio = con.execute(f"""
+                SELECT
+                    COUNT(*),
+                    COUNT(DISTINCT c.cliente_pais),
+                    COUNT(DISTINCT p.categoria),
+                    COUNT(DISTINCT f.id_cliente),
+                    quantile_cont(f.dias_envio_real, [0.5, 0.9])
+                FROM read_parquet('{fact_path}') f
+                LEFT JOIN read_parquet('{dim_cli}') c ON f.id_cliente = c.id_cliente
+                LEFT JOIN read_parquet('{dim_prod}') p ON f.id_produto = p.id_produto
+            """).fetchone()
+        con.close()
+    except Exception:
+        return None
+
+    return {
+        'registros': registros,
+        'paises': paises,
+        'categorias': categorias,
+        'clientes': clientes,
+        'dias_envio_p50': dias_envio[0] if dias_envio else None,
+        'dias_envio_p90': dias_envio[1] if dias_envio else None,
+    }
+
+
 @st.cache_data(ttl=3600, show_spinner="🔄 Carregando dados estratégicos...")
-def load_gold_data():
+def load_gold_data(gold_path, fracao=1.0):
+    """
+    Carrega o Star Schema de UM snapshot da Gold (fato e dimensões da mesma versão).
+    O caminho do snapshot faz parte da chave do cache: um novo build publicado
+    gera uma nova entrada em vez de servir o frame antigo até o TTL expirar.
+    fracao < 1 lê uma amostra Bernoulli repetível do fact_vendas (modo aproximado);
+    a fração fica em df.attrs['fracao_amostra'] para expandir somas e contagens.
+    """
     try:
-        gold_path = os.path.join("data", "gold")
         
         # Caminhos dos arquivos Parquet
         fact_path = os.path.join(gold_path, "fact_vendas.parquet").replace("\\", "/")
@@ -254,11 +429,17 @@ def load_gold_data():
         dim_log = os.path.join(gold_path, "dim_logistica.parquet").replace("\\", "/")
         dim_tempo = os.path.join(gold_path, "dim_tempo.parquet").replace("\\", "/")
 
-        con = duckdb.connect()
+        con = conectar_duckdb("dashboard")
         
         # 1. Note que aqui pegamos f.* (que já inclui o brent_diario)
         query = "SELECT f.*"
         from_clause = f" FROM read_parquet('{fact_path}') f"
+        if fracao < 1:
+            # Amostra aplicada na fato ANTES dos joins (as dimensões são pequenas)
+            from_clause = (
+                f" FROM (SELECT * FROM read_parquet('{fact_path}')"
+                f" USING SAMPLE {fracao * 100:.4f}% (bernoulli, {AMOSTRA_SEED})) f"
+            )
         
         # 2. Joins com as outras dimensões
         if os.path.exists(dim_prod):
@@ -274,18 +455,23 @@ def load_gold_data():
             from_clause += f" LEFT JOIN read_parquet('{dim_log}') l ON f.id_logistica = l.id_logistica"
         
         if os.path.exists(dim_tempo):
-            # Como seu id_tempo já é a data, podemos enriquecer com ano/mês se quiser
-            query += ", t.ano, t.mes"
+            # id_tempo é a chave inteira yyyymmdd: a data do calendário vem da dimensão
+            query += ", t.data_completa, t.ano, t.mes"
             from_clause += f" LEFT JOIN read_parquet('{dim_tempo}') t ON f.id_tempo = t.id_tempo"
 
         full_query = query + from_clause
+        profiler.marcar_miss('load_gold_data')
         df = con.execute(full_query).df()
+        if profiler.ativo():
+            linhas_fato = con.execute(f"SELECT COUNT(*) FROM read_parquet('{fact_path}')").fetchone()[0]
+            profiler.registrar_linhas('load_gold_data', linhas_fato, len(df))
         con.close()
         
         # 3. Ajuste de compatibilidade: renomeamos brent_diario para o nome que o dashboard espera
         if 'brent_diario' in df.columns:
             df = df.rename(columns={'brent_diario': 'preco_petroleo_brent'})
         
+        df.attrs['fracao_amostra'] = fracao
         return df, None
     
     except Exception as e:
@@ -295,16 +481,20 @@ def load_gold_data():
 @st.cache_data(ttl=3600)
 def calcular_metricas_avancadas(df):
     """Calcula KPIs com análise de tendência"""
+    profiler.marcar_miss('calcular_metricas_avancadas')
     if df is None or df.empty:
         return None
     
     metricas = {}
+    escala = escala_amostra(df)
     
-    # KPIs básicos
-    metricas['total_vendas'] = df['valor_venda'].sum()
-    metricas['lucro_total'] = df['lucro_pedido'].sum()
+    # KPIs básicos (somas e contagens expandidas pelo inverso da fração amostrada)
+    metricas['total_vendas'] = df['valor_venda'].sum() * escala
+    metricas['lucro_total'] = df['lucro_pedido'].sum() * escala
     metricas['margem_lucro'] = (metricas['lucro_total'] / metricas['total_vendas'] * 100) if metricas['total_vendas'] > 0 else 0
-    metricas['total_pedidos'] = len(df)
+    # Grão de item: estimativa substituída pela fact_pedidos quando o snapshot a possui
+    metricas['total_pedidos'] = int(round(len(df) * escala))
+    metricas['pedidos_estimados'] = True
     metricas['ticket_medio'] = metricas['total_vendas'] / metricas['total_pedidos']
     
     # Petróleo
@@ -338,9 +528,76 @@ def calcular_metricas_avancadas(df):
         metricas['top_categoria'] = df.groupby('categoria')['valor_venda'].sum().idxmax()
         metricas['pior_categoria'] = df.groupby('categoria')['lucro_pedido'].sum().idxmin()
     
+    metricas['fracao_amostra'] = 1 / escala
+    metricas['erros'] = intervalos_amostra(df, 1 / escala) if escala > 1 else {}
+    
     return metricas
 
 
+def intervalos_amostra(df, fracao):
+    """
+    Meia-largura do IC 95% dos KPIs estimados a partir da amostra Bernoulli (fração f).
+    Totais: estimador de Horvitz-Thompson, Var = (1 - f) / f² · Σy².
+    Margem: razão linearizada; taxas e médias: erro padrão com correção de população finita.
+    """
+    n = len(df)
+    if n == 0:
+        return {}
+
+    fpc = 1 - fracao
+    vendas = df['valor_venda'].to_numpy(dtype=np.float64)
+    lucro = df['lucro_pedido'].to_numpy(dtype=np.float64)
+    total_vendas = vendas.sum() / fracao
+
+    erros = {
+        'total_vendas': Z_95 * np.sqrt(fpc * (vendas ** 2).sum()) / fracao,
+        'lucro_total': Z_95 * np.sqrt(fpc * (lucro ** 2).sum()) / fracao,
+    }
+
+    if total_vendas > 0:
+        razao = lucro.sum() / vendas.sum()
+        residuos = lucro - razao * vendas
+        erros['margem_lucro'] = Z_95 * np.sqrt(fpc * (residuos ** 2).sum()) / fracao / total_vendas * 100
+
+    if 'status_entrega' in df.columns:
+        p = (df['status_entrega'] == 'Late delivery').mean()
+        erros['atraso_rate'] = Z_95 * np.sqrt(fpc * p * (1 - p) / n) * 100
+
+    if 'preco_petroleo_brent' in df.columns:
+        erros['brent_avg'] = Z_95 * np.sqrt(fpc / n) * df['preco_petroleo_brent'].std()
+
+    return {k: float(v) for k, v in erros.items()}
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def metricas_pedidos(gold_path):
+    """
+    KPIs no grão de pedido, lidos da fact_pedidos (uma linha por pedido).
+    Sempre exatos: a tabela é pequena e não precisa de COUNT(DISTINCT) sobre os itens.
+    Retorna None em snapshots anteriores à fact_pedidos.
+    """
+    profiler.marcar_miss('metricas_pedidos')
+    pedidos_path = os.path.join(gold_path, "fact_pedidos.parquet").replace("\\", "/")
+    if not os.path.exists(pedidos_path):
+        return None
+
+    con = conectar_duckdb("dashboard")
+    total, valor, itens, atrasados = con.execute(f"""
+        SELECT COUNT(*), SUM(valor_pedido), AVG(itens), AVG(CAST(entrega_atrasada AS DOUBLE))
+        FROM read_parquet('{pedidos_path}')
+    """).fetchone()
+    con.close()
+    profiler.registrar_linhas('metricas_pedidos', total, 1)
+
+    return {
+        'total_pedidos': total,
+        'pedidos_estimados': False,
+        'ticket_medio': valor / total if total else 0,
+        'itens_por_pedido': itens or 0,
+        'pedidos_atrasados_rate': (atrasados or 0) * 100,
+    }
+
+
 def criar_grafico_moderno(fig, titulo=None):
     """Tema dark modernizado com grid sutil"""
     fig.update_layout(
@@ -371,52 +628,192 @@ def criar_grafico_moderno(fig, titulo=None):
     return fig
 
 
-def gerar_insight_automatico(metricas, df):
-    """Gera cards de insight baseados nos dados"""
-    insights = []
-    
-    # Insight 1: Performance geral
-    if metricas['margem_lucro'] > 15:
-        insights.append({
-            'tipo': 'success',
-            'icone': '✅',
-            'titulo': 'Margem Saudável',
-            'texto': f"Margem de {metricas['margem_lucro']:.1f}% está acima do benchmark de 15%. Operação eficiente!"
-        })
-    else:
-        insights.append({
-            'tipo': 'warning',
-            'icone': '⚠️',
-            'titulo': 'Margem Sob Pressão',
-            'texto': f"Margem de {metricas['margem_lucro']:.1f}% abaixo de 15%. Revisar custos operacionais urgentemente."
-        })
-    
-    # Insight 2: Logística
-    if metricas['atraso_rate'] > 10:
-        insights.append({
-            'tipo': 'danger',
-            'icone': '🚨',
-            'titulo': 'Crise Logística',
-            'texto': f"{metricas['atraso_rate']:.1f}% de atrasos! Meta: <5%. Impacto direto em satisfação do cliente."
-        })
-    elif metricas['atraso_rate'] < 5:
-        insights.append({
-            'tipo': 'success',
-            'icone': '🏆',
-            'titulo': 'Excelência em Entregas',
-            'texto': f"Apenas {metricas['atraso_rate']:.1f}% de atrasos. Time logístico performando acima do mercado!"
-        })
-    
-    # Insight 3: Petróleo
-    if metricas['brent_volatilidade'] > 10:
-        insights.append({
-            'tipo': 'warning',
-            'icone': '📊',
-            'titulo': 'Alta Volatilidade de Brent',
-            'texto': f"Desvio padrão de ${metricas['brent_volatilidade']:.2f}. Hedging recomendado para proteger margens."
-        })
-    
-    return insights
+@st.cache_data(ttl=3600, show_spinner=False)
+def gerar_insights_segmentos(gold_path):
+    """
+    Cards de insight do catálogo de regras (src/analysis/insights.py), avaliado sobre
+    todos os segmentos (total, categoria, país, modo de envio, categoria × modo) em uma
+    única consulta GROUPING SETS na Gold. Sempre exato, independente do modo aproximado.
+    Impacto: aponta ONDE está o problema, não só a média geral.
+    """
+    profiler.marcar_miss('gerar_insights_segmentos')
+    try:
+        segmentos = kpis_por_segmento(gold_path)
+        violacoes = avaliar_regras(segmentos)
+        profiler.registrar_linhas('gerar_insights_segmentos', len(segmentos), len(violacoes))
+        return cards_insight(violacoes, limite=INSIGHTS_MAX)
+    except Exception as e:
+        # Snapshots antigos podem não ter todas as colunas: sem cards, sem derrubar a página
+        print(f"❌ Falha ao avaliar regras de insight: {e}")
+        return []
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def grade_cenarios_brent(gold_path):
+    """
+    Grade what-if de Brent (choque x sensibilidade x categoria x modo) calculada uma vez
+    por snapshot sobre agregados da Gold. Retorna None se a Gold não permitir a simulação.
+    """
+    profiler.marcar_miss('grade_cenarios_brent')
+    try:
+        return simular_grade(base_cenarios(gold_path))
+    except Exception as e:
+        print(f"❌ Falha ao montar a grade de cenários: {e}")
+        return None
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def anomalias_periodo(gold_path):
+    """Anomalias dos últimos ANOMALIAS_DIAS dias de dados (agg_anomalias), ou None sem a tabela."""
+    profiler.marcar_miss('anomalias_periodo')
+    return anomalias_recentes(gold_path, ANOMALIAS_DIAS)
+
+
+def card_anomalia(linha):
+    """Anomalia da Gold -> card no formato dos insights (tipo, icone, titulo, texto)."""
+    data = f"{linha.data:%d/%m/%Y}"
+    if linha.metrica == 'taxa_atraso':
+        return {
+            'tipo': 'danger', 'icone': '🚨', 'titulo': f"Salto de Atrasos: {linha.segmento}",
+            'texto': f"{linha.valor:.0%} dos {linha.itens} itens atrasados em {data} "
+                     f"(normal: ~{linha.esperado:.0%}, z = {linha.z_score:+.1f})."
+        }
+    alta = linha.direcao == 'alta'
+    return {
+        'tipo': 'success' if alta else 'danger',
+        'icone': '📈' if alta else '📉',
+        'titulo': f"{'Pico' if alta else 'Queda'} de Vendas: {linha.segmento}",
+        'texto': f"$ {linha.valor:,.0f} em {data} (esperado: ~$ {linha.esperado:,.0f}, z = {linha.z_score:+.1f})."
+    }
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def previsao_vendas(gold_path):
+    """Previsão diária do total (agg_previsao_vendas), ou None em snapshots sem previsão."""
+    profiler.marcar_miss('previsao_vendas')
+    return previsao_total(gold_path)
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def previsao_segmentos(gold_path):
+    """Previsto no horizonte x realizado no período anterior, por categoria x país."""
+    profiler.marcar_miss('previsao_segmentos')
+    return resumo_previsao(gold_path)
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def periodo_lead_time(gold_path):
+    """(data inicial, data final) do sketch de lead time, ou None em snapshots sem ele."""
+    periodo = periodo_sketch(gold_path)
+    if not periodo or periodo[0] is None:
+        return None
+    return tuple(datetime.strptime(str(id_tempo), "%Y%m%d").date() for id_tempo in periodo)
+
+
+def lead_time_servico(gold_path, segmento, metrica, de, ate):
+    """
+    Quantis via GET /lead_time do serviço de KPIs, ou None para a consulta local:
+    serviço fora do ar/erro HTTP, ou versão publicada no serviço cujo sketch difere do
+    snapshot lido pelo dashboard (comparados pelo sha256 do manifesto).
+    """
+    parametros = urlencode({
+        "segmento": segmento, "metrica": metrica,
+        "de": datetime.strptime(str(de), "%Y%m%d").date().isoformat(),
+        "ate": datetime.strptime(str(ate), "%Y%m%d").date().isoformat(),
+    })
+    try:
+        with urlopen(f"{KPI_SERVICE_URL.rstrip('/')}/lead_time?{parametros}", timeout=KPI_SERVICE_TIMEOUT_S) as resposta:
+            corpo = json.load(resposta)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Serviço de KPIs indisponível ({e}): lead time calculado localmente")
+        return None
+
+    versao_servico = os.path.join(GOLD_ROOT, SNAPSHOTS_SUBDIR, str(corpo.get("versao")))
+    assinatura = assinatura_tabelas(gold_path, ["agg_lead_time_diario"])
+    if assinatura is None or None in assinatura or assinatura_tabelas(versao_servico, ["agg_lead_time_diario"]) != assinatura:
+        print("⚠️ Serviço de KPIs em outra versão da Gold: lead time calculado localmente")
+        return None
+    return pd.DataFrame(corpo["dados"])
+
+
+@st.cache_data(ttl=3600, max_entries=FIGURAS_CACHE_MAX, show_spinner=False)
+def lead_time_segmentos(gold_path, segmento, metrica, de, ate):
+    """
+    p50/p90/p99 por segmento no período, mesclando os histogramas diários do sketch
+    (agg_lead_time_diario) em vez de reler as linhas de pedido.
+    Com DASHBOARD_KPI_SERVICE_URL, pede primeiro ao serviço de KPIs (cache compartilhado).
+    """
+    profiler.marcar_miss('lead_time_segmentos')
+    resultado = lead_time_servico(gold_path, segmento, metrica, de, ate) if KPI_SERVICE_URL else None
+    if resultado is None:
+        resultado = quantis_lead_time(gold_path, segmento, metrica, de, ate)
+    if resultado is not None:
+        profiler.registrar_linhas('lead_time_segmentos', int(resultado['itens'].sum()), len(resultado))
+    return resultado
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def opcoes_exportacao(gold_path):
+    """Valores dos filtros do extrato (dimensões pequenas) e período coberto pela fato."""
+    profiler.marcar_miss('opcoes_exportacao')
+    con = conectar_duckdb("dashboard")
+    try:
+        opcoes = {
+            coluna: [v for (v,) in con.execute(
+                f"SELECT DISTINCT {coluna} FROM read_parquet('{gold_path}/{tabela}.parquet') WHERE {coluna} IS NOT NULL ORDER BY 1"
+            ).fetchall()]
+            for coluna, tabela in [('categoria', 'dim_produtos'), ('modo_envio', 'dim_logistica'),
+                                   ('status_entrega', 'dim_logistica'), ('cliente_pais', 'dim_clientes')]
+        }
+        # MIN/MAX de id_tempo saem das estatísticas dos row groups
+        periodo = con.execute(f"SELECT MIN(id_tempo), MAX(id_tempo) FROM read_parquet('{gold_path}/fact_vendas.parquet')").fetchone()
+    finally:
+        con.close()
+    opcoes['periodo'] = tuple(datetime.strptime(str(id_tempo), "%Y%m%d").date() for id_tempo in periodo)
+    return opcoes
+
+
+@st.cache_data(ttl=3600, max_entries=FIGURAS_CACHE_MAX, show_spinner=False)
+def linhas_exportacao(gold_path, filtros):
+    """Itens que o extrato terá com os filtros escolhidos (COUNT no DuckDB)."""
+    profiler.marcar_miss('linhas_exportacao')
+    return contar_linhas(gold_path, filtros)
+
+
+@st.cache_resource(show_spinner=False)
+def formato_disponivel(formato):
+    """CSV/Parquet sempre; Excel depende da extensão excel do DuckDB (checada uma vez por processo)."""
+    return formato != 'xlsx' or excel_disponivel()
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def chave_paginacao_disponivel(gold_path):
+    """
+    (tem seq_item, fato na ordem física da chave) do snapshot, lidos do rodapé do Parquet.
+    Sem a segunda condição (layout "zorder") a paginação funciona, mas cada página é uma varredura.
+    """
+    if not tem_chave_paginacao(gold_path):
+        return False, False
+    return True, fato_ordenada_pela_chave(gold_path)
+
+
+@st.cache_data(ttl=3600, max_entries=FIGURAS_CACHE_MAX, show_spinner=False)
+def pagina_drill_down(gold_path, filtros, ordem, descendente, cursor):
+    """Uma página do drill-down por keyset: só as TAMANHO_PAGINA linhas visíveis saem do DuckDB."""
+    profiler.marcar_miss('pagina_drill_down')
+    pagina, proximo = pagina_itens(gold_path, filtros, ordem, descendente, cursor)
+    profiler.registrar_linhas('pagina_drill_down', len(pagina), len(pagina))
+    return pagina, proximo
+
+
+def gerar_extrato(gold_path, filtros, formato):
+    """
+    Executado só no clique em "Preparar": o DuckDB grava o extrato em disco com COPY, sem
+    DataFrame. O arquivo final, porém, é lido INTEIRO para a memória do dashboard (o
+    st.download_button precisa dos bytes) e fica na sessão até o download ou a troca de filtros.
+    Quem limita essa memória é EXPORTACAO_MAX_LINHAS, não o streaming dos blocos.
+    """
+    return b"".join(blocos_exportacao(gold_path, filtros, formato))
 
 
 def consultar_ia(contexto, objetivo):
@@ -459,24 +856,432 @@ def consultar_ia(contexto, objetivo):
     except Exception as e:
         return {'status': 'error', 'message': str(e)}
 
+# ============================================================================
+# 3b. FIGURAS (CACHE COMPARTILHADO ENTRE SESSÕES)
+# ============================================================================
+# Cada construtor recebe o DataFrame da Gold + parâmetros e devolve (figura, info),
+# onde info é um dict pequeno usado em legendas/textos ao redor do gráfico.
+
+def fig_timeline(df, granularidade="Dia", previsao=None):
+    """
+    Vendas vs Brent reamostrado (Dia/Semana/Mês), reduzido por LTTB e em WebGL.
+    previsao: série diária prevista do total (agg_previsao_vendas), sobreposta com a faixa de 95%.
+    """
+    if not all(c in df.columns for c in ['data_completa', 'valor_venda', 'preco_petroleo_brent']):
+        return None, {}
+
+    df_time = reamostrar_serie(
+        df[['data_completa', 'valor_venda', 'preco_petroleo_brent']],
+        'data_completa',
+        {'valor_venda': 'sum', 'preco_petroleo_brent': 'mean'},
+        granularidade,
+    )
+    df_time['valor_venda'] *= escala_amostra(df)
+
+    # Cada série é reduzida separadamente para preservar os próprios picos
+    df_vendas = reduzir_para_pixels(df_time, 'data_completa', 'valor_venda', TIMELINE_MAX_PONTOS)
+    df_brent = reduzir_para_pixels(df_time.dropna(subset=['preco_petroleo_brent']), 'data_completa', 'preco_petroleo_brent', TIMELINE_MAX_PONTOS)
+
+    # Dual axis
+    fig = make_subplots(specs=[[{"secondary_y": True}]])
+
+    fig.add_trace(
+        go.Scattergl(
+            x=df_vendas['data_completa'],
+            y=df_vendas['valor_venda'],
+            name="Vendas",
+            mode='lines',
+            line=dict(color='#06D6A0', width=3),
+            fill='tozeroy',
+            fillcolor='rgba(6, 214, 160, 0.1)'
+        ),
+        secondary_y=False
+    )
+
+    fig.add_trace(
+        go.Scattergl(
+            x=df_brent['data_completa'],
+            y=df_brent['preco_petroleo_brent'],
+            name="Brent",
+            mode='lines',
+            line=dict(color='#FFD23F', width=2, dash='dot')
+        ),
+        secondary_y=True
+    )
+
+    if previsao is not None and not previsao.empty:
+        # Mesma granularidade da série realizada (faixa somada: aproximação visual)
+        df_prev = reamostrar_serie(
+            previsao, 'data',
+            {'previsao': 'sum', 'limite_inferior': 'sum', 'limite_superior': 'sum'},
+            granularidade,
+        )
+        fig.add_trace(
+            go.Scatter(x=df_prev['data'], y=df_prev['limite_superior'], mode='lines',
+                       line=dict(width=0), showlegend=False, hoverinfo='skip'),
+            secondary_y=False
+        )
+        fig.add_trace(
+            go.Scatter(x=df_prev['data'], y=df_prev['limite_inferior'], mode='lines', name="Faixa 95%",
+                       line=dict(width=0), fill='tonexty', fillcolor='rgba(255, 107, 53, 0.15)'),
+            secondary_y=False
+        )
+        fig.add_trace(
+            go.Scatter(x=df_prev['data'], y=df_prev['previsao'], name="Previsão",
+                       mode='lines', line=dict(color='#FF6B35', width=3, dash='dash')),
+            secondary_y=False
+        )
+
+    fig.update_yaxes(title_text="Vendas ($)", secondary_y=False)
+    fig.update_yaxes(title_text="Brent ($)", secondary_y=True)
+
+    return criar_grafico_moderno(fig), {
+        'pontos_total': len(df_time),
+        'pontos_exibidos': len(df_vendas),
+        'dias_previsao': 0 if previsao is None else len(previsao),
+    }
+
+
+def fig_mix_produtos(df):
+    """Donut com as 5 categorias de maior faturamento."""
+    if 'categoria' not in df.columns:
+        return None, {}
+
+    df_cat = df.groupby('categoria')['valor_venda'].sum().reset_index()
+    df_cat = df_cat.sort_values('valor_venda', ascending=False).head(5)
+
+    fig = go.Figure(data=[go.Pie(
+        labels=df_cat['categoria'],
+        values=df_cat['valor_venda'],
+        hole=0.5,
+        marker=dict(colors=px.colors.sequential.Sunset),
+        textinfo='label+percent',
+        textposition='outside'
+    )])
+
+    fig.update_layout(
+        showlegend=False,
+        paper_bgcolor='rgba(0,0,0,0)',
+        font=dict(color='#E8EAED'),
+        margin=dict(l=20, r=20, t=40, b=20),
+        annotations=[dict(
+            text=f'${df["valor_venda"].sum() * escala_amostra(df):,.0f}',
+            x=0.5, y=0.5,
+            font_size=16,
+            font_color='#FFD23F',
+            showarrow=False
+        )]
+    )
+    return fig, {}
+
+
+def fig_cidades_atraso(df):
+    """Top 10 cidades por número de entregas atrasadas."""
+    if 'cliente_cidade' not in df.columns or 'status_entrega' not in df.columns:
+        return None, {}
+
+    df_late = df[df['status_entrega'] == 'Late delivery']
+    if df_late.empty:
+        return None, {'sem_atrasos': True}
+
+    top_late = df_late['cliente_cidade'].value_counts().head(10).reset_index()
+    top_late.columns = ['cidade', 'atrasos']
+    top_late['atrasos'] = (top_late['atrasos'] * escala_amostra(df)).round().astype(int)
+
+    fig = go.Figure(data=[go.Bar(
+        y=top_late['cidade'],
+        x=top_late['atrasos'],
+        orientation='h',
+        marker=dict(
+            color=top_late['atrasos'],
+            colorscale='Reds',
+            showscale=False
+        ),
+        text=top_late['atrasos'],
+        textposition='outside'
+    )])
+
+    return criar_grafico_moderno(fig), {'atrasos_top3': int(top_late.iloc[:3]['atrasos'].sum())}
+
+
+def fig_margem_categorias(df):
+    """As 8 categorias de menor margem contra a meta de 15%."""
+    if not all(c in df.columns for c in ['categoria', 'valor_venda', 'lucro_pedido']):
+        return None, {}
+
+    df_margem = df.groupby('categoria').agg({
+        'valor_venda': 'sum',
+        'lucro_pedido': 'sum'
+    }).reset_index()
+    df_margem['margem_%'] = (df_margem['lucro_pedido'] / df_margem['valor_venda'] * 100)
+    df_margem = df_margem.sort_values('margem_%').head(8)
+
+    fig = go.Figure(data=[go.Bar(
+        x=df_margem['categoria'],
+        y=df_margem['margem_%'],
+        marker=dict(
+            color=df_margem['margem_%'],
+            colorscale='RdYlGn',
+            showscale=False,
+            line=dict(color='#FF6B35', width=1)
+        ),
+        text=[f"{x:.1f}%" for x in df_margem['margem_%']],
+        textposition='outside'
+    )])
+
+    fig.add_hline(y=15, line_dash="dash", line_color="#FFD23F", 
+                 annotation_text="Meta: 15%", annotation_position="right")
+
+    return criar_grafico_moderno(fig), {}
+
+
+def fig_matriz_entregas(df):
+    """Mapa de calor Status de Entrega x Modo de Envio."""
+    if not all(c in df.columns for c in ['modo_envio', 'status_entrega']):
+        return None, {}
+
+    df_heatmap = (pd.crosstab(df['status_entrega'], df['modo_envio']) * escala_amostra(df)).round().astype(int)
+
+    fig = go.Figure(data=go.Heatmap(
+        z=df_heatmap.values,
+        x=df_heatmap.columns,
+        y=df_heatmap.index,
+        colorscale='YlOrRd',
+        text=df_heatmap.values,
+        texttemplate='%{text}',
+        textfont={"size": 12},
+        hoverongaps=False
+    ))
+
+    return criar_grafico_moderno(fig), {}
+
+
+def fig_bcg(df):
+    """Matriz BCG (share de vendas x margem) das 15 maiores categorias."""
+    # Agrupar e pegar apenas o Top 15 (evita poluição visual)
+    df_bcg = df.groupby('categoria').agg({
+        'valor_venda': 'sum',
+        'lucro_pedido': 'sum'
+    }).reset_index().nlargest(15, 'valor_venda')
+
+    df_bcg['margem_percentual'] = (df_bcg['lucro_pedido'] / df_bcg['valor_venda']) * 100
+    df_bcg['share_vendas'] = (df_bcg['valor_venda'] / df_bcg['valor_venda'].sum()) * 100
+
+    fig = px.scatter(
+        df_bcg, 
+        x='share_vendas', 
+        y='margem_percentual',
+        size='valor_venda', 
+        color='margem_percentual',
+        hover_name='categoria',
+        text='categoria', # Adiciona o nome apenas nas bolhas maiores
+        color_continuous_scale='Viridis',
+        labels={'share_vendas': '% Volume de Vendas', 'margem_percentual': 'Margem de Lucro (%)'}
+    )
+
+    # Ajustes estéticos "Clean"
+    fig.update_traces(textposition='top center')
+    fig.add_hline(y=df_bcg['margem_percentual'].mean(), line_dash="dot", annotation_text="Margem Média")
+    fig.add_vline(x=df_bcg['share_vendas'].mean(), line_dash="dot", annotation_text="Volume Médio")
+
+    fig.update_layout(showlegend=False, height=450)
+    return fig, {}
+
+
+CONSTRUTORES_FIGURA = {
+    'timeline': fig_timeline,
+    'mix_produtos': fig_mix_produtos,
+    'cidades_atraso': fig_cidades_atraso,
+    'margem_categorias': fig_margem_categorias,
+    'matriz_entregas': fig_matriz_entregas,
+    'bcg': fig_bcg,
+}
+
+
+# Dados da Gold além do fact_vendas que um construtor precisa (lidos por snapshot, dentro do cache da figura)
+DADOS_FIGURA = {
+    'timeline': lambda gold_path: {'previsao': previsao_vendas(gold_path)},
+}
+
+
+@st.cache_data(max_entries=FIGURAS_CACHE_MAX, show_spinner=False)
+def figura_cacheada(gold_path, nome, fracao=1.0, **params):
+    """
+    Figura serializada em JSON, compartilhada entre sessões.
+    Chave: snapshot da Gold (versão) + nome da figura + fração amostrada + estado dos filtros/parâmetros;
+    max_entries limita o cache (LRU), mantendo a memória previsível.
+    """
+    profiler.marcar_miss('figura_cacheada')
+    with profiler.medir('dados', 'load_gold_data', cache='load_gold_data'):
+        df, _ = load_gold_data(gold_path, fracao)
+    with profiler.medir('construcao', nome):
+        extras = DADOS_FIGURA[nome](gold_path) if nome in DADOS_FIGURA else {}
+        fig, info = CONSTRUTORES_FIGURA[nome](df, **params, **extras)
+    if fig is not None:
+        profiler.registrar_linhas(nome, len(df), sum(_pontos_trace(t) for t in fig.data))
+    return (fig.to_json() if fig is not None else None), info
+
+
+def _pontos_trace(trace):
+    """Número de pontos de um trace Plotly (x, valores de pizza ou células de heatmap)."""
+    for atributo in ('x', 'values', 'z'):
+        valores = getattr(trace, atributo, None)
+        if valores is not None:
+            return int(np.size(valores))
+    return 0
+
+
+# Figuras clicáveis: ponto selecionado -> (filtros do drill-down, rótulo do segmento)
+DRILL_DOWN_FIGURAS = {
+    'cidades_atraso': lambda ponto: (
+        {'cliente_cidade': [ponto['y']], 'status_entrega': ['Late delivery']}, f"Atrasos em {ponto['y']}"
+    ),
+    'margem_categorias': lambda ponto: ({'categoria': [ponto['x']]}, f"Categoria {ponto['x']}"),
+}
+
+
+def selecionar_segmento(nome):
+    """Callback do clique numa barra: troca o segmento do drill-down e volta à primeira página."""
+    pontos = st.session_state[f"selecao_{nome}"]["selection"]["points"]
+    if pontos:
+        st.session_state['drill_segmento'] = DRILL_DOWN_FIGURAS[nome](pontos[0])
+        st.session_state['drill_cursores'] = [None]
+
+
+def exibir_figura(gold_path, nome, fracao=1.0, **params):
+    """Desenha a figura do cache (sem agregar nem reconstruir) e devolve o info do construtor."""
+    with profiler.medir('grafico', nome, cache='figura_cacheada'):
+        fig_json, info = figura_cacheada(gold_path, nome, fracao, **params)
+        if fig_json is not None:
+            fig = pio.from_json(fig_json, skip_invalid=True)
+            if nome in DRILL_DOWN_FIGURAS:
+                st.plotly_chart(
+                    fig, use_container_width=True, key=f"selecao_{nome}", selection_mode="points",
+                    on_select=functools.partial(selecionar_segmento, nome)
+                )
+            else:
+                st.plotly_chart(fig, use_container_width=True)
+    return info
+
+
+@contextmanager
+def secao_perfilada(nome):
+    """
+    Mede uma seção. Quando um fragmento reexecuta sozinho não há profiler da página ativo:
+    nesse caso a seção abre a própria execução e grava no log ao final.
+    """
+    if st.session_state.get('profiling', PROFILING_PADRAO) and not profiler.ativo():
+        profiler.iniciar(f"fragmento:{nome}")
+        try:
+            with profiler.medir('secao', nome):
+                yield
+        finally:
+            profiler.finalizar(PROFILING_LOG)
+    else:
+        with profiler.medir('secao', nome):
+            yield
+
+
+def perfilado(nome):
+    """Decorador para fragmentos: mede a seção tanto na página inteira quanto em reruns isolados."""
+    def decorador(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with secao_perfilada(nome):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorador
+
+
+def exibir_painel_profiling(container, resumo):
+    """Painel recolhível na sidebar com tempos, cache hit/miss e linhas lidas vs. retornadas."""
+    with container.expander(f"⏱️ Profiling ({resumo['total_ms']:,.0f} ms)", expanded=False):
+        eventos = pd.DataFrame(resumo['eventos'])
+        tempos = eventos[eventos['categoria'] != 'linhas'].copy()
+        tempos['nome'] = ["· " * n + nome for n, nome in zip(tempos['nivel'], tempos['nome'])]
+        colunas = [c for c in ['nome', 'categoria', 'ms', 'cache'] if c in tempos.columns]
+        st.dataframe(tempos[colunas], hide_index=True, use_container_width=True)
+
+        linhas = eventos[eventos['categoria'] == 'linhas']
+        if not linhas.empty:
+            st.caption("Linhas lidas vs. retornadas")
+            st.dataframe(linhas[['nome', 'linhas_lidas', 'linhas_retornadas']], hide_index=True, use_container_width=True)
+
+        st.caption(f"📝 Log: {PROFILING_LOG} (fragmentos reexecutados são registrados apenas no log)")
+
 # ============================================================================
 # 4. SIDEBAR
 # ============================================================================
 
+# Snapshot da Gold fixado para toda esta execução da página
+gold_path = snapshot_dados(GOLD_ROOT)
+
+
+def liberar_caches(antigo):
+    """Descarta só as entradas do snapshot substituído (as demais sessões/versões ficam intactas)."""
+    # Mesmos argumentos posicionais das chamadas: é o que compõe a chave do cache
+    load_gold_data.clear(antigo, 1.0)
+    load_gold_data.clear(antigo, fracao_amostra(antigo))
+    estatisticas_rapidas.clear(antigo, fracao_amostra(antigo))
+    estatisticas_rapidas.clear(antigo, 1.0)
+    metricas_pedidos.clear(antigo)
+    gerar_insights_segmentos.clear(antigo)
+    grade_cenarios_brent.clear(antigo)
+    periodo_lead_time.clear(antigo)
+    previsao_vendas.clear(antigo)
+    anomalias_periodo.clear(antigo)
+    previsao_segmentos.clear(antigo)
+    opcoes_exportacao.clear(antigo)
+
+
+anterior = st.session_state.get('gold_path_ativo')
+if anterior is not None and anterior != gold_path and os.path.isdir(anterior):
+    liberar_caches(anterior)
+st.session_state['gold_path_ativo'] = gold_path
+
+
+@st.fragment(run_every=ATUALIZACAO_S or None)
+def vigiar_gold():
+    """
+    Checa periodicamente o ponteiro da Gold (leitura de arquivos minúsculos, sem dados).
+    Se as tabelas do dashboard mudaram, recarrega a página (que libera os caches da versão anterior).
+    """
+    if snapshot_dados(GOLD_ROOT) != st.session_state.get('gold_path_ativo'):
+        st.toast("🔄 Nova versão da Gold publicada: atualizando dados...")
+        st.rerun(scope="app")
+
 with st.sidebar:
     st.markdown("## 🏗️ Supply Chain Hub")
     st.caption("v5.0 Storytelling Edition")
     
+    if st.toggle("⏱️ Modo profiling", value=PROFILING_PADRAO, key="profiling"):
+        profiler.iniciar("pagina")
+    painel_profiling = st.container()
+    vigiar_gold()
+    
+    aproximado = st.toggle(
+        "⚡ Modo aproximado", value=APROXIMADO_PADRAO, key="modo_aproximado",
+        help="Amostra do fact_vendas, com margens de erro. Desligue para valores exatos."
+    )
+    fracao = fracao_amostra(gold_path) if aproximado else 1.0
+    
     st.markdown("### 🎯 Quick Stats")
     
-    # Load data preview
-    df_preview, _ = load_gold_data()
-    if df_preview is not None:
-        st.metric("📦 Registros", f"{len(df_preview):,}")
-        if 'cliente_pais' in df_preview.columns:
-            st.metric("🌍 Países", df_preview['cliente_pais'].nunique())
-        if 'categoria' in df_preview.columns:
-            st.metric("📊 Categorias", df_preview['categoria'].nunique())
+    with profiler.medir('dados', 'estatisticas_rapidas', cache='estatisticas_rapidas'):
+        stats = estatisticas_rapidas(gold_path, fracao)
+    if stats is not None:
+        # Contagens exatas nos dois modos: no aproximado vêm do manifesto e das dimensões, sem varrer a fato
+        ajuda = "Do manifesto e das dimensões (sem varrer a fato)" if fracao < 1 else None
+        st.metric("📦 Registros", f"{stats['registros']:,}", help=ajuda)
+        st.metric("🌍 Países", f"{stats['paises']:,}", help=ajuda)
+        st.metric("📊 Categorias", f"{stats['categorias']:,}", help=ajuda)
+        st.metric("👥 Clientes", f"{stats['clientes']:,}", help=ajuda)
+        if stats['dias_envio_p50'] is not None:
+            st.metric(
+                "🚚 Dias de envio (p50 / p90)",
+                f"{'~' if fracao < 1 else ''}{stats['dias_envio_p50']:.0f} / {stats['dias_envio_p90']:.0f}",
+                help=f"Quantis da amostra Bernoulli ({fracao:.1%} dos itens)" if fracao < 1 else "Quantis exatos"
+            )
     
     st.markdown("---")
     
@@ -505,9 +1310,20 @@ with st.sidebar:
         + Brent Oil Prices API
         """)
     
+    # Frescor e integridade vêm do manifesto da Gold (sem ler nenhum dado)
+    manifesto = ler_manifesto(gold_path)
+    if manifesto:
+        gerado_em = datetime.fromisoformat(manifesto['gerado_em']).strftime("%d/%m/%Y %H:%M")
+        cobertura = manifesto.get('cobertura_joins', {}).get('fact_vendas', {})
+        incompletas = [chave for chave, valor in cobertura.items() if valor is not None and valor < 1]
+        if incompletas:
+            st.warning(f"⚠️ Chaves sem dimensão: {', '.join(incompletas)}")
+    else:
+        gerado_em = "sem manifesto"
+    
     st.markdown(f"""
     <div style='text-align: center; color: #8b92a0; font-size: 0.75rem; margin-top: 20px;'>
-    Atualizado em<br>{datetime.now().strftime("%d/%m/%Y %H:%M")}
+    Gold gerada em<br>{gerado_em}
     </div>
     """, unsafe_allow_html=True)
 
@@ -534,7 +1350,8 @@ st.markdown("""
 # 6. CARREGAMENTO E VALIDAÇÃO
 # ============================================================================
 
-df, erro = load_gold_data()
+with profiler.medir('dados', 'load_gold_data', cache='load_gold_data'):
+    df, erro = load_gold_data(gold_path, fracao)
 
 if erro:
     st.error(erro)
@@ -545,330 +1362,602 @@ if df.empty:
     st.warning("DataFrame vazio")
     st.stop()
 
-metricas = calcular_metricas_avancadas(df)
-insights = gerar_insight_automatico(metricas, df)
+with profiler.medir('dados', 'calcular_metricas_avancadas', cache='calcular_metricas_avancadas'):
+    metricas = calcular_metricas_avancadas(df)
+with profiler.medir('dados', 'metricas_pedidos', cache='metricas_pedidos'):
+    pedidos = metricas_pedidos(gold_path)
+if pedidos:
+    # Grão de pedido substitui as contagens por item (sem alterar o dict em cache)
+    metricas = {**metricas, **pedidos}
+with profiler.medir('dados', 'gerar_insights_segmentos', cache='gerar_insights_segmentos'):
+    insights = gerar_insights_segmentos(gold_path)
 
 # ============================================================================
 # 7. PARTE 1 - OVERVIEW EXECUTIVO
 # ============================================================================
 
-st.markdown("""
-<div class='section-header'>
-    <h2 class='section-title'>📊 Overview Executivo</h2>
-    <p class='section-subtitle'>Panorama geral da operação</p>
-</div>
-""", unsafe_allow_html=True)
+@st.fragment
+@perfilado('timeline')
+def grafico_timeline(gold_path, fracao):
+    """Timeline com seletor de granularidade próprio: trocar o seletor reexecuta só este gráfico."""
+    titulo_col, gran_col = st.columns([3, 1])
+    titulo_col.markdown("#### 📈 Evolução: Vendas vs Petróleo")
+    granularidade = gran_col.selectbox(
+        "Granularidade", list(GRANULARIDADES), key="timeline_granularidade", label_visibility="collapsed"
+    )
 
-# KPIs principais com mini sparklines
-kpi1, kpi2, kpi3, kpi4 = st.columns(4)
+    info = exibir_figura(gold_path, 'timeline', fracao, granularidade=granularidade)
+    if not info:
+        st.info("Coluna 'data_completa' não encontrada")
+    elif info['pontos_exibidos'] < info['pontos_total']:
+        st.caption(f"📉 {info['pontos_total']:,} pontos reduzidos para {info['pontos_exibidos']:,} (LTTB)")
 
-with kpi1:
-    st.metric(
-        "💰 Faturamento Total",
-        f"$ {metricas['total_vendas']:,.0f}",
-        delta=f"{metricas['tendencia_vendas']:+.1f}%" if metricas['tendencia_vendas'] != 0 else None,
-        help="Receita bruta acumulada"
-    )
+    if info and info.get('dias_previsao'):
+        painel_previsao(gold_path, info['dias_previsao'])
 
-with kpi2:
-    st.metric(
-        "📈 Margem de Lucro",
-        f"{metricas['margem_lucro']:.1f}%",
-        delta=f"$ {metricas['lucro_total']:,.0f}",
-        help="Rentabilidade sobre faturamento"
-    )
 
-with kpi3:
-    st.metric(
-        "🛢️ Brent Médio",
-        f"$ {metricas['brent_avg']:.2f}",
-        delta=f"±{metricas['brent_volatilidade']:.1f}",
-        delta_color="off",
-        help="Preço médio do petróleo (volatilidade)"
-    )
+def painel_previsao(gold_path, dias):
+    """Visão prospectiva por categoria e país (tabela da Gold, sem recalcular o modelo)."""
+    with st.expander(f"🔮 Previsão dos próximos {dias} dias por categoria e país"):
+        with profiler.medir('dados', 'previsao_segmentos', cache='previsao_segmentos'):
+            resumo = previsao_segmentos(gold_path)
+        if resumo is None or resumo.empty:
+            st.info("Previsão indisponível neste snapshot.")
+            return
 
-with kpi4:
-    st.metric(
-        "🚚 Entregas no Prazo",
-        f"{metricas['entrega_ok_rate']:.1f}%",
-        delta=f"-{metricas['atraso_rate']:.1f}% atrasos",
-        help="Taxa de pontualidade logística"
-    )
+        categorias = [TODOS] + sorted(c for c in resumo['categoria'].unique() if c != TODOS)
+        categoria = st.selectbox("Categoria", categorias, key="previsao_categoria")
+        if categoria == TODOS:
+            # Visão geral: uma linha por categoria (todos os países)
+            tabela = resumo[(resumo['cliente_pais'] == TODOS) & (resumo['categoria'] != TODOS)]
+        else:
+            tabela = resumo[(resumo['categoria'] == categoria) & (resumo['cliente_pais'] != TODOS)]
+        st.dataframe(tabela, hide_index=True, use_container_width=True)
+        st.caption(
+            "💡 Holt-Winters amortecido com sazonalidade semanal, ajustado em lote no build da Gold. "
+            "Países com poucas vendas entram só no agregado da categoria."
+        )
 
-st.markdown("<br>", unsafe_allow_html=True)
 
-# Cards de insights automáticos
-for insight in insights:
-    st.markdown(f"""
-    <div class='alert-{insight['tipo']}'>
-        <div class='insight-title'>
-            {insight['icone']} {insight['titulo']}
-        </div>
-        <div class='insight-text'>
-            {insight['texto']}
-        </div>
+@st.fragment
+@perfilado('overview')
+def secao_overview(gold_path, fracao, metricas, insights):
+    """Overview executivo: KPIs, cards de insight, timeline e mix (reexecuta isolado)."""
+    st.markdown("""
+    <div class='section-header'>
+        <h2 class='section-title'>📊 Overview Executivo</h2>
+        <p class='section-subtitle'>Panorama geral da operação</p>
     </div>
     """, unsafe_allow_html=True)
 
-st.markdown("<br>", unsafe_allow_html=True)
+    # KPIs principais com mini sparklines
+    kpi1, kpi2, kpi3, kpi4 = st.columns(4)
 
-# Gráfico 1: Timeline Vendas vs Brent (storytelling temporal)
-col_timeline, col_composicao = st.columns([2, 1])
+    with kpi1:
+        st.metric(
+            "💰 Faturamento Total",
+            f"$ {metricas['total_vendas']:,.0f}",
+            delta=f"{metricas['tendencia_vendas']:+.1f}%" if metricas['tendencia_vendas'] != 0 else None,
+            help="Receita bruta acumulada"
+        )
 
-with col_timeline:
-    st.markdown("#### 📈 Evolução: Vendas vs Petróleo")
-    df['data_completa'] = pd.to_datetime(df['data_completa']).dt.normalize()
-    if all(c in df.columns for c in ['data_completa', 'valor_venda', 'preco_petroleo_brent']):
-        df_time = df.groupby('data_completa').agg({
-            'valor_venda': 'sum',
-            'preco_petroleo_brent': 'mean'
-        }).reset_index().sort_values('data_completa')
-        
-        # Dual axis
-        fig = make_subplots(specs=[[{"secondary_y": True}]])
-        
-        fig.add_trace(
-            go.Scatter(
-                x=df_time['data_completa'],
-                y=df_time['valor_venda'],
-                name="Vendas",
-                line=dict(color='#06D6A0', width=3),
-                fill='tozeroy',
-                fillcolor='rgba(6, 214, 160, 0.1)'
-            ),
-            secondary_y=False
+    with kpi2:
+        st.metric(
+            "📈 Margem de Lucro",
+            f"{metricas['margem_lucro']:.1f}%",
+            delta=f"$ {metricas['lucro_total']:,.0f}",
+            help="Rentabilidade sobre faturamento"
         )
-        
-        fig.add_trace(
-            go.Scatter(
-                x=df_time['data_completa'],
-                y=df_time['preco_petroleo_brent'],
-                name="Brent",
-                line=dict(color='#FFD23F', width=2, dash='dot')
-            ),
-            secondary_y=True
+
+    with kpi3:
+        st.metric(
+            "🛢️ Brent Médio",
+            f"$ {metricas['brent_avg']:.2f}",
+            delta=f"±{metricas['brent_volatilidade']:.1f}",
+            delta_color="off",
+            help="Preço médio do petróleo (volatilidade)"
         )
-        
-        fig.update_yaxes(title_text="Vendas ($)", secondary_y=False)
-        fig.update_yaxes(title_text="Brent ($)", secondary_y=True)
-        
-        fig = criar_grafico_moderno(fig)
-        st.plotly_chart(fig, use_container_width=True)
-    else:
-        st.info("Coluna 'data_completa' não encontrada")
 
-with col_composicao:
-    st.markdown("#### 🎯 Mix de Produtos")
-    
-    if 'categoria' in df.columns:
-        df_cat = df.groupby('categoria')['valor_venda'].sum().reset_index()
-        df_cat = df_cat.sort_values('valor_venda', ascending=False).head(5)
-        
-        fig = go.Figure(data=[go.Pie(
-            labels=df_cat['categoria'],
-            values=df_cat['valor_venda'],
-            hole=0.5,
-            marker=dict(colors=px.colors.sequential.Sunset),
-            textinfo='label+percent',
-            textposition='outside'
-        )])
-        
-        fig.update_layout(
-            showlegend=False,
-            paper_bgcolor='rgba(0,0,0,0)',
-            font=dict(color='#E8EAED'),
-            margin=dict(l=20, r=20, t=40, b=20),
-            annotations=[dict(
-                text=f'${metricas["total_vendas"]:,.0f}',
-                x=0.5, y=0.5,
-                font_size=16,
-                font_color='#FFD23F',
-                showarrow=False
-            )]
+    with kpi4:
+        st.metric(
+            "🚚 Entregas no Prazo",
+            f"{metricas['entrega_ok_rate']:.1f}%",
+            delta=f"-{metricas['atraso_rate']:.1f}% atrasos",
+            help="Taxa de pontualidade logística (itens)"
         )
-        
-        st.plotly_chart(fig, use_container_width=True)
+        if 'pedidos_atrasados_rate' in metricas:
+            # Grão de pedido (fact_pedidos): pedido com qualquer item atrasado conta como atrasado
+            st.caption(f"🧾 {metricas['pedidos_atrasados_rate']:.1f}% dos pedidos com atraso")
+
+    erros = metricas.get('erros')
+    if erros:
+        st.caption(
+            f"⚡ Modo aproximado: amostra Bernoulli de {metricas['fracao_amostra']:.1%} do fact_vendas. "
+            f"IC 95%: faturamento ±$ {erros['total_vendas']:,.0f} · "
+            f"margem ±{erros.get('margem_lucro', 0):.2f} p.p. · "
+            f"Brent ±$ {erros.get('brent_avg', 0):.2f} · "
+            f"atrasos ±{erros.get('atraso_rate', 0):.2f} p.p."
+        )
+
+    st.markdown("<br>", unsafe_allow_html=True)
+
+    # Cards de insights automáticos
+    for insight in insights:
+        st.markdown(f"""
+        <div class='alert-{insight['tipo']}'>
+            <div class='insight-title'>
+                {insight['icone']} {insight['titulo']}
+            </div>
+            <div class='insight-text'>
+                {insight['texto']}
+            </div>
+        </div>
+        """, unsafe_allow_html=True)
+
+    painel_anomalias(gold_path)
+
+    st.markdown("<br>", unsafe_allow_html=True)
+
+    # Gráfico 1: Timeline Vendas vs Brent (storytelling temporal)
+    col_timeline, col_composicao = st.columns([2, 1])
+
+    with col_timeline:
+        grafico_timeline(gold_path, fracao)
+
+    with col_composicao:
+        st.markdown("#### 🎯 Mix de Produtos")
+        exibir_figura(gold_path, 'mix_produtos', fracao)
+
+
+def painel_anomalias(gold_path):
+    """Cards das anomalias mais fortes do período recente (detecção incremental no build da Gold)."""
+    with profiler.medir('dados', 'anomalias_periodo', cache='anomalias_periodo'):
+        anomalias = anomalias_periodo(gold_path)
+    if anomalias is None:
+        return
+
+    st.markdown(f"#### 🚨 Anomalias (últimos {ANOMALIAS_DIAS} dias de dados)")
+    if anomalias.empty:
+        st.caption("✅ Nenhuma anomalia em vendas ou atrasos por categoria e cidade no período.")
+        return
+
+    colunas = st.columns(2)
+    for i, linha in enumerate(anomalias.head(ANOMALIAS_CARDS).itertuples(index=False)):
+        card = card_anomalia(linha)
+        colunas[i % 2].markdown(f"""
+        <div class='alert-{card['tipo']}'>
+            <div class='insight-title'>
+                {card['icone']} {card['titulo']}
+            </div>
+            <div class='insight-text'>
+                {card['texto']}
+            </div>
+        </div>
+        """, unsafe_allow_html=True)
+
+    if len(anomalias) > ANOMALIAS_CARDS:
+        with st.expander(f"📋 Todas as anomalias do período ({len(anomalias)})"):
+            st.dataframe(anomalias, hide_index=True, use_container_width=True)
+
+
+secao_overview(gold_path, fracao, metricas, insights)
 
 # ============================================================================
 # 8. PARTE 2 - DIAGNÓSTICO DE PROBLEMAS
 # ============================================================================
 
-st.markdown("""
-<div class='section-header'>
-    <h2 class='section-title'>🔍 Diagnóstico de Problemas</h2>
-    <p class='section-subtitle'>Identificando gargalos e riscos</p>
-</div>
-""", unsafe_allow_html=True)
+@st.fragment
+@perfilado('diagnostico')
+def secao_diagnostico(gold_path, fracao):
+    """Diagnóstico de problemas: só agrega e desenha quando o usuário abre a seção."""
+    st.markdown("""
+    <div class='section-header'>
+        <h2 class='section-title'>🔍 Diagnóstico de Problemas</h2>
+        <p class='section-subtitle'>Identificando gargalos e riscos</p>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    if not st.toggle("Abrir diagnóstico", key="abrir_diagnostico"):
+        st.caption("▶️ Ative para calcular cidades com atraso, margens por categoria e a matriz de entregas.")
+        return
+    
+    diag_col1, diag_col2 = st.columns(2)
 
-diag_col1, diag_col2 = st.columns(2)
+    with diag_col1:
+        st.markdown("#### 🚨 Top 10 Cidades com Atrasos")
+        info = exibir_figura(gold_path, 'cidades_atraso', fracao)
 
-with diag_col1:
-    st.markdown("#### 🚨 Top 10 Cidades com Atrasos")
-    
-    if 'cliente_cidade' in df.columns and 'status_entrega' in df.columns:
-        df_late = df[df['status_entrega'] == 'Late delivery']
-        
-        if not df_late.empty:
-            top_late = df_late['cliente_cidade'].value_counts().head(10).reset_index()
-            top_late.columns = ['cidade', 'atrasos']
-            
-            fig = go.Figure(data=[go.Bar(
-                y=top_late['cidade'],
-                x=top_late['atrasos'],
-                orientation='h',
-                marker=dict(
-                    color=top_late['atrasos'],
-                    colorscale='Reds',
-                    showscale=False
-                ),
-                text=top_late['atrasos'],
-                textposition='outside'
-            )])
-            
-            fig = criar_grafico_moderno(fig)
-            st.plotly_chart(fig, use_container_width=True)
-            
-            st.caption(f"🎯 Prioridade: Revisar logística nas top 3 cidades ({top_late.iloc[:3]['atrasos'].sum()} atrasos)")
-        else:
+        if info.get('sem_atrasos'):
             st.success("✅ Nenhuma entrega atrasada registrada!")
+        elif info:
+            st.caption(f"🎯 Prioridade: Revisar logística nas top 3 cidades ({info['atrasos_top3']} atrasos)")
 
-with diag_col2:
-    st.markdown("#### 💸 Categorias com Menor Margem")
-    
-    if all(c in df.columns for c in ['categoria', 'valor_venda', 'lucro_pedido']):
-        df_margem = df.groupby('categoria').agg({
-            'valor_venda': 'sum',
-            'lucro_pedido': 'sum'
-        }).reset_index()
-        df_margem['margem_%'] = (df_margem['lucro_pedido'] / df_margem['valor_venda'] * 100)
-        df_margem = df_margem.sort_values('margem_%').head(8)
-        
-        fig = go.Figure(data=[go.Bar(
-            x=df_margem['categoria'],
-            y=df_margem['margem_%'],
-            marker=dict(
-                color=df_margem['margem_%'],
-                colorscale='RdYlGn',
-                showscale=False,
-                line=dict(color='#FF6B35', width=1)
-            ),
-            text=[f"{x:.1f}%" for x in df_margem['margem_%']],
-            textposition='outside'
-        )])
-        
-        fig.add_hline(y=15, line_dash="dash", line_color="#FFD23F", 
-                     annotation_text="Meta: 15%", annotation_position="right")
-        
-        fig = criar_grafico_moderno(fig)
-        st.plotly_chart(fig, use_container_width=True)
+    with diag_col2:
+        st.markdown("#### 💸 Categorias com Menor Margem")
+        exibir_figura(gold_path, 'margem_categorias', fracao)
 
-# Mapa de calor: Status x Modo de Envio
-st.markdown("#### 🗺️ Matriz: Status de Entrega vs Modo de Envio")
+    painel_drill_down(gold_path)
 
-if all(c in df.columns for c in ['modo_envio', 'status_entrega']):
-    df_heatmap = pd.crosstab(df['status_entrega'], df['modo_envio'])
-    
-    fig = go.Figure(data=go.Heatmap(
-        z=df_heatmap.values,
-        x=df_heatmap.columns,
-        y=df_heatmap.index,
-        colorscale='YlOrRd',
-        text=df_heatmap.values,
-        texttemplate='%{text}',
-        textfont={"size": 12},
-        hoverongaps=False
-    ))
-    
-    fig = criar_grafico_moderno(fig)
-    st.plotly_chart(fig, use_container_width=True)
-    
+    # Mapa de calor: Status x Modo de Envio
+    st.markdown("#### 🗺️ Matriz: Status de Entrega vs Modo de Envio")
+    exibir_figura(gold_path, 'matriz_entregas', fracao)
     st.caption("💡 Insight: Identifique combinações de alto risco (cor vermelha intensa)")
 
-# ============================================================================
-# 9. PARTE 3 - OPORTUNIDADES
-# ============================================================================
+    painel_lead_time(gold_path)
 
-st.markdown("""
-<div class='section-header'>
-    <h2 class='section-title'>💡 Oportunidades de Crescimento</h2>
-    <p class='section-subtitle'>Onde focar esforços para maximizar resultados</p>
-</div>
-""", unsafe_allow_html=True)
 
-opp_col1, opp_col2 = st.columns([3, 2])
+def reiniciar_paginacao():
+    st.session_state['drill_cursores'] = [None]
 
-# No dashboard.py, dentro da Parte 3:
-with opp_col1:
-    st.markdown("#### 🎯 Matriz BCG: Categorias Estratégicas")
-    
-    # Agrupar e pegar apenas o Top 15 (evita poluição visual)
-    df_bcg = df.groupby('categoria').agg({
-        'valor_venda': 'sum',
-        'lucro_pedido': 'sum'
-    }).reset_index().nlargest(15, 'valor_venda')
-    
-    df_bcg['margem_percentual'] = (df_bcg['lucro_pedido'] / df_bcg['valor_venda']) * 100
-    df_bcg['share_vendas'] = (df_bcg['valor_venda'] / df_bcg['valor_venda'].sum()) * 100
-    
-    fig = px.scatter(
-        df_bcg, 
-        x='share_vendas', 
-        y='margem_percentual',
-        size='valor_venda', 
-        color='margem_percentual',
-        hover_name='categoria',
-        text='categoria', # Adiciona o nome apenas nas bolhas maiores
-        color_continuous_scale='Viridis',
-        labels={'share_vendas': '% Volume de Vendas', 'margem_percentual': 'Margem de Lucro (%)'}
+
+def painel_drill_down(gold_path):
+    """Itens de pedido da barra clicada, página a página (keyset sobre a chave clusterizada da fato)."""
+    segmento = st.session_state.get('drill_segmento')
+    if segmento is None:
+        st.caption("👆 Clique em uma barra de cidade ou categoria para ver os pedidos por trás dela.")
+        return
+
+    filtros, rotulo = segmento
+    st.markdown(f"#### 🔎 Pedidos: {rotulo}")
+    disponivel, ordenada = chave_paginacao_disponivel(gold_path)
+    if not disponivel:
+        st.info("💡 Snapshot sem seq_item em fact_vendas: execute `python main.py` para habilitar o drill-down.")
+        return
+
+    col_ordem, col_dir, col_fechar = st.columns([2, 1, 1])
+    with col_ordem:
+        ordem = st.selectbox(
+            "Ordenar por", list(ORDENACOES), key="drill_ordem",
+            format_func=lambda o: ORDENACOES[o][1], on_change=reiniciar_paginacao
+        )
+    with col_dir:
+        descendente = st.toggle("Decrescente", key="drill_desc", on_change=reiniciar_paginacao)
+    with col_fechar:
+        st.button(
+            "✖ Fechar", key="drill_fechar", use_container_width=True,
+            on_click=lambda: st.session_state.pop('drill_segmento', None)
+        )
+
+    # Pilha de cursores: cada página guarda a chave em que começa (voltar = desempilhar)
+    cursores = st.session_state.setdefault('drill_cursores', [None])
+    with profiler.medir('dados', 'pagina_drill_down', cache='pagina_drill_down'):
+        pagina, proximo = pagina_drill_down(gold_path, filtros, ordem, descendente, cursores[-1])
+    with profiler.medir('dados', 'linhas_exportacao', cache='linhas_exportacao'):
+        total = linhas_exportacao(gold_path, filtros)
+
+    st.dataframe(pagina, hide_index=True, use_container_width=True)
+    if ordem != 'data' or not ordenada:
+        motivo = "ordenação por métrica" if ordem != 'data' else "fact_vendas fora do layout \"sort\""
+        st.caption(f"⏳ {motivo.capitalize()}: cada página varre os itens do segmento e mantém um top-N "
+                   "(custo constante por página, mas sem busca direta na chave clusterizada).")
+
+    inicio = (len(cursores) - 1) * TAMANHO_PAGINA
+    col_ant, col_info, col_prox = st.columns([1, 3, 1])
+    with col_ant:
+        st.button(
+            "◀ Anterior", key="drill_anterior", disabled=len(cursores) == 1, use_container_width=True,
+            on_click=lambda: st.session_state['drill_cursores'].pop()
+        )
+    with col_info:
+        st.caption(
+            f"Página {len(cursores)} · itens {inicio + 1 if len(pagina) else 0:,}–{inicio + len(pagina):,} de {total:,} "
+            "(base completa, mesmo no modo aproximado)"
+        )
+    with col_prox:
+        st.button(
+            "Próxima ▶", key="drill_proxima", disabled=proximo is None, use_container_width=True,
+            on_click=lambda: st.session_state['drill_cursores'].append(proximo)
+        )
+
+
+def painel_lead_time(gold_path):
+    """Quantis de lead time/atraso por segmento e período (sempre exatos, via sketch diário)."""
+    st.markdown("#### ⏱️ Distribuição de Lead Time: p50 / p90 / p99")
+    periodo = periodo_lead_time(gold_path)
+    if periodo is None:
+        st.info("💡 Snapshot sem agg_lead_time_diario: execute `python main.py` para gerar o sketch.")
+        return
+
+    col_seg, col_met, col_per = st.columns([1, 1, 2])
+    with col_seg:
+        segmento = st.selectbox(
+            "Segmento", SEGMENTOS_LEAD_TIME, key="lead_time_segmento",
+            format_func=lambda s: {"modo_envio": "Modo de envio", "pedido_regiao": "Região do pedido", "categoria": "Categoria"}[s]
+        )
+    with col_met:
+        metrica = st.radio(
+            "Métrica", list(METRICAS_LEAD_TIME), key="lead_time_metrica",
+            format_func=lambda m: "Lead time" if m == "lead_time" else "Atraso"
+        )
+    with col_per:
+        de, ate = periodo
+        if de < ate:
+            de, ate = st.slider("Período", min_value=de, max_value=ate, value=(de, ate), key="lead_time_periodo", format="DD/MM/YYYY")
+
+    with profiler.medir('dados', 'lead_time_segmentos', cache='lead_time_segmentos'):
+        quantis = lead_time_segmentos(gold_path, segmento, metrica, int(de.strftime("%Y%m%d")), int(ate.strftime("%Y%m%d")))
+    if quantis is None or quantis.empty:
+        st.warning("Nenhum pedido no período selecionado.")
+        return
+
+    # 12 segmentos de maior volume, do pior p90 para o melhor
+    top = quantis.nlargest(12, 'itens').sort_values(['p90', 'p50'], ascending=False)
+    fig = go.Figure([
+        go.Bar(name=rotulo, x=top['segmento'], y=top[coluna], marker_color=cor)
+        for coluna, rotulo, cor in [('p50', 'p50', '#004E89'), ('p90', 'p90', '#FF6B35'), ('p99', 'p99', '#EF476F')]
+    ])
+    fig.update_layout(barmode='group', yaxis_title=METRICAS_LEAD_TIME[metrica][1])
+    st.plotly_chart(criar_grafico_moderno(fig), use_container_width=True)
+
+    with st.expander(f"📋 Todos os segmentos ({len(quantis)})"):
+        st.dataframe(quantis, hide_index=True, use_container_width=True)
+    st.caption(
+        f"💡 {int(quantis['itens'].sum()):,} itens entre {de:%d/%m/%Y} e {ate:%d/%m/%Y}. "
+        "Quantis exatos do histograma diário mesclado (atraso = dias reais − agendados)."
     )
+
+
+secao_diagnostico(gold_path, fracao)
+
+# ============================================================================
+# 9. PARTE 3 - OPORTUNIDADES
+# ============================================================================
+
+@st.fragment
+@perfilado('oportunidades')
+def secao_oportunidades(df, gold_path, fracao, metricas):
+    """Oportunidades de crescimento: só agrega e desenha quando o usuário abre a seção."""
+    st.markdown("""
+    <div class='section-header'>
+        <h2 class='section-title'>💡 Oportunidades de Crescimento</h2>
+        <p class='section-subtitle'>Onde focar esforços para maximizar resultados</p>
+    </div>
+    """, unsafe_allow_html=True)
     
-    # Ajustes estéticos "Clean"
-    fig.update_traces(textposition='top center')
-    fig.add_hline(y=df_bcg['margem_percentual'].mean(), line_dash="dot", annotation_text="Margem Média")
-    fig.add_vline(x=df_bcg['share_vendas'].mean(), line_dash="dot", annotation_text="Volume Médio")
+    if not st.toggle("Abrir oportunidades", key="abrir_oportunidades"):
+        st.caption("▶️ Ative para calcular a matriz BCG, os produtos campeões e o ticket médio.")
+        return
     
-    fig.update_layout(showlegend=False, height=450)
-    st.plotly_chart(fig, use_container_width=True)
+    opp_col1, opp_col2 = st.columns([3, 2])
 
-with opp_col2:
-    st.markdown("#### 🏆 Produtos Campeões")
-    
-    if 'categoria' in df.columns:
-        top_cats = df.groupby('categoria').agg({
-            'valor_venda': 'sum',
-            'lucro_pedido': 'sum'
-        }).reset_index().sort_values('lucro_pedido', ascending=False).head(5)
-        
-        for idx, row in top_cats.iterrows():
-            margem = (row['lucro_pedido'] / row['valor_venda'] * 100)
-            
-            st.markdown(f"""
-            <div class='insight-card'>
-                <div style='display: flex; justify-content: space-between; align-items: center;'>
-                    <div>
-                        <strong style='color: #FFD23F; font-size: 1.1rem;'>{row['categoria']}</strong><br>
-                        <span style='color: #B0B3B8; font-size: 0.85rem;'>
-                            Lucro: ${row['lucro_pedido']:,.0f} | Margem: {margem:.1f}%
-                        </span>
-                    </div>
-                    <div style='font-size: 2rem;'>
-                        {'🥇' if idx == 0 else '🥈' if idx == 1 else '🥉' if idx == 2 else '🏅'}
+    with opp_col1:
+        st.markdown("#### 🎯 Matriz BCG: Categorias Estratégicas")
+        exibir_figura(gold_path, 'bcg', fracao)
+
+    with opp_col2:
+        st.markdown("#### 🏆 Produtos Campeões")
+
+        if 'categoria' in df.columns:
+            top_cats = df.groupby('categoria').agg({
+                'valor_venda': 'sum',
+                'lucro_pedido': 'sum'
+            }).reset_index().sort_values('lucro_pedido', ascending=False).head(5)
+            top_cats[['valor_venda', 'lucro_pedido']] *= escala_amostra(df)
+
+            for idx, row in top_cats.iterrows():
+                margem = (row['lucro_pedido'] / row['valor_venda'] * 100)
+
+                st.markdown(f"""
+                <div class='insight-card'>
+                    <div style='display: flex; justify-content: space-between; align-items: center;'>
+                        <div>
+                            <strong style='color: #FFD23F; font-size: 1.1rem;'>{row['categoria']}</strong><br>
+                            <span style='color: #B0B3B8; font-size: 0.85rem;'>
+                                Lucro: ${row['lucro_pedido']:,.0f} | Margem: {margem:.1f}%
+                            </span>
+                        </div>
+                        <div style='font-size: 2rem;'>
+                            {'🥇' if idx == 0 else '🥈' if idx == 1 else '🥉' if idx == 2 else '🏅'}
+                        </div>
                     </div>
                 </div>
-            </div>
-            """, unsafe_allow_html=True)
-    
-    st.markdown("#### 💰 Ticket Médio")
-    st.metric("Valor Médio por Pedido", f"$ {metricas['ticket_medio']:.2f}")
-    
-    if 'categoria' in df.columns:
-        ticket_cat = df.groupby('categoria')['valor_venda'].mean().sort_values(ascending=False).head(1)
-        st.caption(f"🎯 Maior ticket: {ticket_cat.index[0]} ($ {ticket_cat.values[0]:.2f})")
+                """, unsafe_allow_html=True)
+
+        st.markdown("#### 💰 Ticket Médio")
+        st.metric("Valor Médio por Pedido", f"$ {metricas['ticket_medio']:.2f}")
+        if 'itens_por_pedido' in metricas:
+            st.caption(f"🧾 {metricas['total_pedidos']:,} pedidos · {metricas['itens_por_pedido']:.2f} itens por pedido")
+
+        if 'categoria' in df.columns:
+            ticket_cat = df.groupby('categoria')['valor_venda'].mean().sort_values(ascending=False).head(1)
+            st.caption(f"🎯 Maior ticket: {ticket_cat.index[0]} ($ {ticket_cat.values[0]:.2f})")
+
+
+secao_oportunidades(df, gold_path, fracao, metricas)
+
+# ============================================================================
+# 10. PARTE 4 - SIMULADOR DE CHOQUE NO BRENT
+# ============================================================================
+
+@st.fragment
+@perfilado('cenarios_brent')
+def secao_cenarios(gold_path):
+    """What-if de Brent: a grade inteira vem do cache; os sliders só indexam a matriz."""
+    st.markdown("""
+    <div class='section-header'>
+        <h2 class='section-title'>🛢️ Simulador de Choque no Brent</h2>
+        <p class='section-subtitle'>E se o petróleo subir? Margem por categoria e modo de envio</p>
+    </div>
+    """, unsafe_allow_html=True)
+
+    if not st.toggle("Abrir simulador", key="abrir_cenarios"):
+        st.caption("▶️ Ative para simular choques no Brent sobre a margem de cada categoria e modo de envio.")
+        return
+
+    with profiler.medir('dados', 'grade_cenarios_brent', cache='grade_cenarios_brent'):
+        grade = grade_cenarios_brent(gold_path)
+    if grade is None:
+        st.warning("Simulador indisponível para este snapshot da Gold.")
+        return
+
+    col_choque, col_sens = st.columns(2)
+    with col_choque:
+        choque = st.select_slider(
+            "Variação do Brent (%)", options=grade['choques'].tolist(), value=30,
+            format_func=lambda x: f"{x:+d}%", key="cenario_choque"
+        )
+    with col_sens:
+        sensibilidade = st.select_slider(
+            "Sensibilidade do frete ao Brent", options=grade['sensibilidades'].tolist(), value=0.5,
+            key="cenario_sensibilidade", help="0 = frete não reage ao petróleo; 1 = frete varia na mesma proporção do Brent"
+        )
+
+    cenario = resumo_cenario(grade, choque, sensibilidade)
+    m1, m2, m3 = st.columns(3)
+    m1.metric("🛢️ Brent Simulado", f"$ {grade['brent_medio'] * (1 + choque / 100):.2f}", f"{choque:+d}%")
+    m2.metric("📊 Margem no Cenário", f"{cenario['margem_total']:.2f}%",
+              f"{cenario['margem_total'] - grade['margem_base_total']:+.2f} p.p.")
+    m3.metric("💵 Impacto no Lucro", f"$ {cenario['delta_lucro'] / 1e3:,.1f}K")
+
+    graf1, graf2 = st.columns(2)
+    with graf1:
+        st.markdown("#### 💸 Margem por Categoria: Base vs Cenário")
+        delta = cenario['margem_categoria'] - grade['margem_base_categoria']
+        ordem = np.argsort(delta)[:10]  # 10 categorias mais atingidas
+        categorias = [grade['categorias'][i] for i in ordem]
+        fig = go.Figure([
+            go.Bar(name='Base', x=categorias, y=grade['margem_base_categoria'][ordem], marker_color='#004E89'),
+            go.Bar(name='Cenário', x=categorias, y=cenario['margem_categoria'][ordem], marker_color='#FF6B35'),
+        ])
+        fig.update_layout(barmode='group')
+        fig.add_hline(y=15, line_dash="dash", line_color="#FFD23F",
+                      annotation_text="Meta: 15%", annotation_position="right")
+        st.plotly_chart(criar_grafico_moderno(fig), use_container_width=True)
+
+    with graf2:
+        st.markdown("#### 🗺️ Margem Total em Toda a Grade")
+        fig = go.Figure(go.Heatmap(
+            z=grade['margem_total'].T, x=grade['choques'], y=grade['sensibilidades'],
+            colorscale='RdYlGn', colorbar=dict(title="Margem %"),
+            hovertemplate="Brent %{x:+d}%<br>Sensibilidade %{y:.2f}<br>Margem %{z:.2f}%<extra></extra>"
+        ))
+        fig.add_trace(go.Scatter(
+            x=[choque], y=[sensibilidade], mode='markers', showlegend=False,
+            marker=dict(symbol='x', size=14, color='#FFFFFF', line=dict(width=2))
+        ))
+        fig.update_layout(xaxis_title="Variação do Brent (%)", yaxis_title="Sensibilidade", hovermode='closest')
+        st.plotly_chart(criar_grafico_moderno(fig), use_container_width=True)
+
+    modos = " · ".join(
+        f"{modo}: {base:.1f}% → {novo:.1f}%"
+        for modo, base, novo in zip(grade['modos'], grade['margem_base_modo'], cenario['margem_modo'])
+    )
+    st.caption(f"🚚 Por modo de envio — {modos}")
+    st.caption(
+        "💡 Premissa: frete como % do faturamento por modo (Same Day 12%, First 9%, Second 7%, Standard 5%); "
+        "o choque altera só o custo de frete, proporcional à sensibilidade."
+    )
+
+
+secao_cenarios(gold_path)
 
 # ============================================================================
-# 10. CONSULTORIA IA
+# 11. EXPORTAÇÃO DE PEDIDOS
 # ============================================================================
 
+@st.fragment
+@perfilado('exportacao')
+def secao_exportacao(gold_path):
+    """Extrato em nível de item com os filtros escolhidos; nada é consultado até o clique."""
+    st.markdown("""
+    <div class='section-header'>
+        <h2 class='section-title'>📥 Exportação de Pedidos</h2>
+        <p class='section-subtitle'>Extrato bruto da Gold com os filtros aplicados</p>
+    </div>
+    """, unsafe_allow_html=True)
+
+    if not st.toggle("Abrir exportação", key="abrir_exportacao"):
+        st.caption("▶️ Ative para filtrar e baixar os itens de pedido em CSV, Parquet ou Excel.")
+        return
+
+    with profiler.medir('dados', 'opcoes_exportacao', cache='opcoes_exportacao'):
+        opcoes = opcoes_exportacao(gold_path)
+
+    col1, col2, col3, col4 = st.columns(4)
+    filtros = {}
+    for coluna_ui, (coluna, rotulo) in zip(
+        [col1, col2, col3, col4],
+        [('categoria', 'Categoria'), ('modo_envio', 'Modo de envio'),
+         ('status_entrega', 'Status de entrega'), ('cliente_pais', 'País do cliente')]
+    ):
+        with coluna_ui:
+            selecionados = st.multiselect(rotulo, opcoes[coluna], key=f"exportacao_{coluna}", placeholder="Todos")
+        if selecionados:
+            filtros[coluna] = selecionados
+
+    de, ate = opcoes['periodo']
+    if de < ate:
+        de, ate = st.slider("Período", min_value=de, max_value=ate, value=(de, ate), key="exportacao_periodo", format="DD/MM/YYYY")
+    if (de, ate) != opcoes['periodo']:
+        filtros['de'], filtros['ate'] = int(de.strftime("%Y%m%d")), int(ate.strftime("%Y%m%d"))
+
+    with profiler.medir('dados', 'linhas_exportacao', cache='linhas_exportacao'):
+        linhas = linhas_exportacao(gold_path, filtros)
+    st.metric("📦 Itens no Extrato", f"{linhas:,}")
+    if linhas == 0:
+        st.warning("Nenhum item com os filtros selecionados.")
+        return
+
+    grande = linhas > EXPORTACAO_MAX_LINHAS
+    versao = os.path.basename(gold_path)
+    # Um extrato pronto por sessão; outro snapshot ou outros filtros o descartam
+    pronto = st.session_state.get('extrato_pronto')
+    if pronto and pronto['chave'][:2] != (gold_path, repr(sorted(filtros.items()))):
+        pronto = st.session_state['extrato_pronto'] = None
+
+    colunas_botoes = st.columns(len(FORMATOS))
+    for coluna_ui, (formato, rotulo) in zip(colunas_botoes, [('csv', 'CSV'), ('parquet', 'Parquet'), ('xlsx', 'Excel')]):
+        with coluna_ui:
+            disponivel = formato_disponivel(formato)
+            chave = (gold_path, repr(sorted(filtros.items())), formato)
+            if st.button(f"📄 Preparar {rotulo}", key=f"preparar_{formato}",
+                         disabled=grande or not disponivel, use_container_width=True):
+                try:
+                    with st.spinner(f"Gerando {rotulo}..."):
+                        dados = gerar_extrato(gold_path, filtros, formato)
+                except ExportacaoIndisponivel as e:
+                    st.warning(f"⚠️ {e}. Exporte em CSV ou Parquet.")
+                except Exception as e:
+                    traceback.print_exc()
+                    st.warning(f"⚠️ Falha ao gerar o {rotulo}: {e}. Tente CSV ou Parquet.")
+                else:
+                    pronto = st.session_state['extrato_pronto'] = {'chave': chave, 'dados': dados}
+            if pronto and pronto['chave'] == chave:
+                st.download_button(
+                    f"⬇️ Baixar {rotulo} ({len(pronto['dados']) / 1024 ** 2:,.1f} MB)",
+                    data=pronto['dados'],
+                    file_name=nome_arquivo(formato, versao),
+                    mime=FORMATOS[formato][2],
+                    key=f"exportar_{formato}",
+                    on_click="ignore",
+                    use_container_width=True,
+                )
+            if not disponivel:
+                st.caption("Requer a extensão excel do DuckDB.")
+
+    if grande:
+        parametros = "&".join(
+            [f"{c}={quote(str(v))}" for c, valores in filtros.items() if c in opcoes for v in valores]
+            + [f"{c}={datetime.strptime(str(filtros[c]), '%Y%m%d'):%Y-%m-%d}" for c in ('de', 'ate') if c in filtros]
+        )
+        st.warning(
+            f"⚠️ {linhas:,} itens passam do limite de download pelo dashboard ({EXPORTACAO_MAX_LINHAS:,}). "
+            "Baixe em streaming pelo serviço de KPIs (`python src/serving/kpi_service.py`):"
+        )
+        st.code(f'curl -o extrato.csv "{EXPORTACAO_URL}?formato=csv{"&" + parametros if parametros else ""}"', language="bash")
+    else:
+        st.caption(
+            "💡 Em \"Preparar\", o DuckDB grava o extrato da Gold em disco e o arquivo pronto é carregado na "
+            f"memória do dashboard até o download (o limite de {EXPORTACAO_MAX_LINHAS:,} itens é o que limita "
+            "essa memória; extratos maiores vão em streaming pelo serviço de KPIs)."
+        )
+
+
+secao_exportacao(gold_path)
+
+# ============================================================================
+# 12. CONSULTORIA IA
+# ============================================================================
 st.markdown("""
 <div class='section-header'>
     <h2 class='section-title'>🤖 Consultoria com IA</h2>
@@ -876,66 +1965,75 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
-tab1, tab2, tab3 = st.tabs(["📊 Visão Executiva", "🚚 Logística", "💰 Comercial"])
-
-with tab1:
-    if st.button("🎯 Gerar Relatório Executivo", key="exec", use_container_width=True):
-        with st.spinner("🧠 Analisando dados..."):
-            ctx = {
-                "Faturamento": f"$ {metricas['total_vendas']:,.0f}",
-                "Margem": f"{metricas['margem_lucro']:.1f}%",
-                "Lucro": f"$ {metricas['lucro_total']:,.0f}",
-                "Tendência": f"{metricas['tendencia_vendas']:+.1f}%",
-                "Top Categoria": metricas.get('top_categoria', 'N/A'),
-                "Pior Categoria": metricas.get('pior_categoria', 'N/A')
-            }
-            
-            r = consultar_ia(ctx, "Análise executiva: saúde financeira e próximos passos estratégicos")
+@st.fragment
+def painel_ia(chave, rotulo, spinner, ctx, objetivo, msg_sucesso):
+    """Botão de consultoria IA: o clique reexecuta apenas este painel, não a página."""
+    if st.button(rotulo, key=chave, use_container_width=True):
+        with st.spinner(spinner):
+            with secao_perfilada(f"ia:{chave}"):
+                r = consultar_ia(ctx, objetivo)
             
             if r['status'] == 'success':
-                st.success("✅ Análise concluída")
+                st.success(msg_sucesso)
                 st.markdown(r['content'])
             else:
                 st.error(r['message'])
 
+
+tab1, tab2, tab3 = st.tabs(["📊 Visão Executiva", "🚚 Logística", "💰 Comercial"])
+
+with tab1:
+    painel_ia(
+        "exec",
+        "🎯 Gerar Relatório Executivo",
+        "🧠 Analisando dados...",
+        {
+            "Faturamento": f"$ {metricas['total_vendas']:,.0f}",
+            "Margem": f"{metricas['margem_lucro']:.1f}%",
+            "Lucro": f"$ {metricas['lucro_total']:,.0f}",
+            "Tendência": f"{metricas['tendencia_vendas']:+.1f}%",
+            "Top Categoria": metricas.get('top_categoria', 'N/A'),
+            "Pior Categoria": metricas.get('pior_categoria', 'N/A')
+        },
+        "Análise executiva: saúde financeira e próximos passos estratégicos",
+        "✅ Análise concluída",
+    )
+
 with tab2:
-    if st.button("🚚 Otimizar Logística", key="log", use_container_width=True):
-        with st.spinner("🔍 Identificando gargalos..."):
-            ctx = {
-                "Taxa de Atraso": f"{metricas['atraso_rate']:.1f}%",
-                "Entregas OK": f"{metricas['entrega_ok_rate']:.1f}%",
-                "Brent Médio": f"$ {metricas['brent_avg']:.2f}",
-                "Volatilidade Brent": f"±{metricas['brent_volatilidade']:.1f}"
-            }
-            
-            r = consultar_ia(ctx, "Plano tático para reduzir atrasos e custos logísticos")
-            
-            if r['status'] == 'success':
-                st.success("✅ Plano gerado")
-                st.markdown(r['content'])
-            else:
-                st.error(r['message'])
+    painel_ia(
+        "log",
+        "🚚 Otimizar Logística",
+        "🔍 Identificando gargalos...",
+        {
+            "Taxa de Atraso": f"{metricas['atraso_rate']:.1f}%",
+            "Entregas OK": f"{metricas['entrega_ok_rate']:.1f}%",
+            "Brent Médio": f"$ {metricas['brent_avg']:.2f}",
+            "Volatilidade Brent": f"±{metricas['brent_volatilidade']:.1f}"
+        },
+        "Plano tático para reduzir atrasos e custos logísticos",
+        "✅ Plano gerado",
+    )
 
 with tab3:
-    if st.button("💰 Estratégia Comercial", key="com", use_container_width=True):
-        with st.spinner("💡 Desenvolvendo estratégias..."):
-            ctx = {
-                "Ticket Médio": f"$ {metricas['ticket_medio']:.2f}",
-                "Margem": f"{metricas['margem_lucro']:.1f}%",
-                "Top Produto": metricas.get('top_categoria', 'N/A'),
-                "Total Pedidos": f"{metricas['total_pedidos']:,}"
-            }
-            
-            r = consultar_ia(ctx, "Ações comerciais para aumentar ticket médio e margem")
-            
-            if r['status'] == 'success':
-                st.success("✅ Estratégia pronta")
-                st.markdown(r['content'])
-            else:
-                st.error(r['message'])
+    painel_ia(
+        "com",
+        "💰 Estratégia Comercial",
+        "💡 Desenvolvendo estratégias...",
+        {
+            "Ticket Médio": f"$ {metricas['ticket_medio']:.2f}",
+            "Margem": f"{metricas['margem_lucro']:.1f}%",
+            "Top Produto": metricas.get('top_categoria', 'N/A'),
+            "Total Pedidos": (
+                f"~{metricas['total_pedidos']:,} (estimativa: itens de pedido)"
+                if metricas.get('pedidos_estimados') else f"{metricas['total_pedidos']:,}"
+            )
+        },
+        "Ações comerciais para aumentar ticket médio e margem",
+        "✅ Estratégia pronta",
+    )
 
 # ============================================================================
-# 11. FOOTER
+# 13. FOOTER
 # ============================================================================
 
 st.markdown("---")
@@ -950,4 +2048,9 @@ st.markdown("""
         </span>
     </p>
 </div>
-""", unsafe_allow_html=True)
\ No newline at end of file
+""", unsafe_allow_html=True)
+
+# Fecha a coleta da página inteira e mostra o painel na sidebar
+resumo_profiling = profiler.finalizar(PROFILING_LOG)
+if resumo_profiling:
+    exibir_painel_profiling(painel_profiling, resumo_profiling)
\ No newline at end of file
@@ -7,8 +7,11 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '.')))
 # Importar suas funções de pipeline
 from src.extract.kaggle_api import download_supply_chain_data
 from src.extract.context_api import get_brent_oil_price_api
-from src.transform.silver_layer import process_silver_layer
-from src.transform.gold_layer import create_gold_layer_complete
+from src.transform.silver_layer import process_silver_layer, process_silver_access_logs
+from src.transform.gold_layer import build_gold, create_gold_clickstream, OUTPUT_GOLD_DIR
+from src.utils.snapshots import versao_atual
+from src.serving.aquecimento import aguardar_dashboard_pronto
+from src.utils.watcher import estado_arquivos, alterados, ler_estado, salvar_estado
 
 import subprocess
 import time
@@ -22,9 +25,96 @@ def run_pipeline():
     get_brent_oil_price_api() 
     download_supply_chain_data() # Bronze
     process_silver_layer()  # Silver
-    create_gold_layer_complete() # Gold
+    process_silver_access_logs()  # Silver (clickstream)
+    build_gold()  # Gold (Star Schema + clickstream + previsão + anomalias, publicado atomicamente)
     print("✅ Pipeline concluído com sucesso!")
 
+# Watch mode: arquivo da Bronze -> etapas que precisam rodar quando ele muda
+BRONZE_DIR = "data/bronze"
+WATCH_ESTADO = "data/tmp/watch_estado.json"
+WATCH_INTERVALO_S = float(os.getenv("WATCH_INTERVALO_S", "5"))
+ETAPAS_POR_ARQUIVO = {
+    "raw/DataCoSupplyChainDataset.csv": "vendas",
+    "contexto_externo.parquet": "vendas",  # Brent entra na Silver de vendas
+    "raw/tokenized_access_logs.csv": "acessos",
+}
+
+
+def run_incremental(etapas):
+    """
+    Roda só as etapas afetadas (a granularidade é a etapa, não a linha).
+    - vendas: qualquer mudança do lado de vendas (CSV da DataCo ou contexto_externo.parquet)
+      reconstrói a Silver de vendas e a Gold INTEIRAS — não é atualização incremental
+      (ids das dimensões mudam, o clickstream é refeito junto)
+    - acessos: Silver de acessos + clickstream em snapshot que herda o Star Schema publicado
+    Retorna a versão publicada, ou None se nada foi publicado.
+    """
+    if "vendas" in etapas:
+        if not process_silver_layer():
+            return None
+        if "acessos" in etapas and not process_silver_access_logs():
+            return None
+        return build_gold()
+
+    if "acessos" in etapas:
+        if process_silver_access_logs() and create_gold_clickstream():
+            return versao_atual(OUTPUT_GOLD_DIR)
+    return None
+
+
+def watch_pipeline(intervalo=WATCH_INTERVALO_S):
+    """
+    Monitora data/bronze (apenas metadados: tamanho e mtime) e dispara o pipeline incremental.
+    Um arquivo só é processado depois de ficar estável por um intervalo (download/cópia concluídos).
+    A publicação do snapshot é o sinal para o dashboard: ele detecta a troca do ponteiro e
+    descarta apenas os caches das tabelas que mudaram.
+    Se a atualização falha, o estado que falhou é lembrado: o arquivo só é tentado de novo
+    quando mudar outra vez (sem isso, um arquivo estável e quebrado refaria Silver + Gold a cada intervalo).
+    """
+    print(f"👀 Watch mode: monitorando {BRONZE_DIR} a cada {intervalo:.0f}s (Ctrl+C para sair)")
+    processado = ler_estado(WATCH_ESTADO)
+    if not processado:
+        # Primeira execução: o que já existe é a linha de base, não uma alteração
+        processado = estado_arquivos(BRONZE_DIR)
+        salvar_estado(WATCH_ESTADO, processado)
+    anterior = processado
+    falhou = {}  # path -> estado (tamanho, mtime) cuja atualização falhou
+
+    try:
+        while True:
+            time.sleep(intervalo)
+            atual = estado_arquivos(BRONZE_DIR)
+
+            # Candidatos: diferentes do último processado, iguais à leitura anterior (estáveis)
+            # e diferentes da versão que já falhou
+            pendentes = [
+                path for path in alterados(processado, atual)
+                if anterior.get(path) == atual[path] and falhou.get(path) != atual[path]
+            ]
+            anterior = atual
+            etapas = {ETAPAS_POR_ARQUIVO[p] for p in pendentes if p in ETAPAS_POR_ARQUIVO}
+            if not pendentes:
+                continue
+
+            if etapas:
+                print(f"\n🔔 Alterações em {', '.join(pendentes)} -> etapas: {', '.join(sorted(etapas))}")
+                inicio = time.perf_counter()
+                versao = run_incremental(etapas)
+                if versao is None:
+                    for path in pendentes:
+                        falhou[path] = atual[path]
+                    print("❌ Atualização incremental falhou; nova tentativa na próxima alteração dos arquivos.")
+                    continue
+                print(f"✅ Gold {versao} publicada em {time.perf_counter() - inicio:.1f}s")
+
+            for path in pendentes:
+                processado[path] = atual[path]
+                falhou.pop(path, None)
+            salvar_estado(WATCH_ESTADO, processado)
+    except KeyboardInterrupt:
+        print("\n🛑 Watch mode encerrado.")
+
+
 def start_dashboard():
     load_dotenv()
     token = os.getenv("NGROK_AUTH_TOKEN")
@@ -42,10 +132,14 @@ def start_dashboard():
     "run", 
     "app/dashboard.py", 
     "--browser.gatherUsageStats=false", # Desativar coleta de dados
-    "--server.headless=true"            # Evita abrir o browser automaticamente (o Ngrok já faz o papel de link)
+    "--server.headless=true",           # Evita abrir o browser automaticamente (o Ngrok já faz o papel de link)
+    "--server.scriptHealthCheckEnabled=true"  # Endpoint de prontidão (executa a página e aquece os caches)
 ])
     
-    time.sleep(3) # Tempo para o streamlit "respirar"
+    # O túnel só abre quando a página já rodou uma vez com os caches quentes
+    if not aguardar_dashboard_pronto(processo=proc):
+        proc.terminate()
+        return
     
     public_url = ngrok.connect(8501)
     print(f"\n🔗 ACESSO PÚBLICO: {public_url.public_url}\n")
@@ -57,6 +151,11 @@ def start_dashboard():
         proc.terminate()
 
 if __name__ == "__main__":
+    # python main.py --watch: pipeline incremental contínuo (dashboard roda em outro processo)
+    if "--watch" in sys.argv:
+        watch_pipeline()
+        sys.exit(0)
+
     # 1. Primeiro garante que os dados estão prontos
     run_pipeline()
     
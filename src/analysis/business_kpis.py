@@ -1,39 +1,235 @@
-import duckdb
-
-def run_business_analysis():
-    con = duckdb.connect()
-    print("📊 EXTRAINDO INSIGHTS DA CAMADA GOLD...")
-
-    # SQL que cruza a Fato com as Dimensões (O poder do Star Schema)
-    query = """
-        SELECT 
-            p.categoria,
-            COUNT(f.id_produto) as total_pedidos,
-            ROUND(SUM(f.valor_venda), 2) as faturamento_total,
-            ROUND(AVG(f.preco_petroleo_brent), 2) as media_petroleo_brent,
-            ROUND(SUM(f.lucro_pedido), 2) as lucro_total
-        FROM read_parquet('data/gold/fact_vendas.parquet') f
-        JOIN read_parquet('data/gold/dim_produtos.parquet') p ON f.id_produto = p.id_produto
-        GROUP BY p.categoria
-        ORDER BY faturamento_total DESC
-        LIMIT 5;
-    """
-    
-    result = con.execute(query).df()
-    print("\n🏆 TOP 5 CATEGORIAS POR FATURAMENTO:")
-    print(result)
-    
-    # Insight de Logística
-    query_log = """
-        SELECT 
-            l.status_entrega,
-            COUNT(*) as total
-        FROM read_parquet('data/gold/fact_vendas.parquet') f
-        JOIN read_parquet('data/gold/dim_logistica.parquet') l ON f.id_logistica = l.id_logistica
-        GROUP BY 1
-    """
-    print("\n🚚 STATUS DE LOGÍSTICA:")
-    print(con.execute(query_log).df())
+import argparse
+import datetime
+import os
+import sys
+
+# pasta raiz ao caminho de busca do Python (permite executar o módulo diretamente)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.utils.helpers import conectar_duckdb
+from src.utils.snapshots import snapshot_atual, versao_atual
+
+GOLD_ROOT = "data/gold"
+OUTPUT_REPORTS = "data/reports"
+FORMATOS = ["parquet", "json", "csv"]
+
+# Dimensões disponíveis para agrupamento: coluna -> (alias da dimensão, arquivo)
+DIMENSOES = {
+    "categoria": ("p", "dim_produtos"),
+    "status_entrega": ("l", "dim_logistica"),
+    "modo_envio": ("l", "dim_logistica"),
+    "cliente_pais": ("c", "dim_clientes"),
+    "cliente_cidade": ("c", "dim_clientes"),
+    "ano": ("t", "dim_tempo"),
+    "mes": ("t", "dim_tempo"),
+}
+
+CHAVES_JOIN = {
+    "p": "id_produto",
+    "l": "id_logistica",
+    "c": "id_cliente",
+    "t": "id_tempo",
+}
+
+# Catálogo de KPIs: nome -> (expressão agregada sobre a fato e dimensões, descrição)
+KPIS = {
+    "total_itens": ("COUNT(*)", "Linhas de pedido (itens vendidos)"),
+    "faturamento_total": ("ROUND(SUM(f.valor_venda), 2)", "Receita bruta"),
+    "lucro_total": ("ROUND(SUM(f.lucro_pedido), 2)", "Lucro"),
+    "margem_pct": ("ROUND(SUM(f.lucro_pedido) / NULLIF(SUM(f.valor_venda), 0) * 100, 2)", "Lucro / receita (%)"),
+    "total_pedidos": ("COUNT(DISTINCT f.id_pedido_original)", "Pedidos distintos"),
+    "ticket_medio_pedido": ("ROUND(SUM(f.valor_venda) / NULLIF(COUNT(DISTINCT f.id_pedido_original), 0), 2)", "Receita média por pedido"),
+    "ticket_medio_item": ("ROUND(AVG(f.valor_venda), 2)", "Receita média por item"),
+    "media_petroleo_brent": ("ROUND(AVG(f.brent_diario), 2)", "Brent médio na data do pedido"),
+    "volatilidade_brent": ("ROUND(STDDEV_SAMP(f.brent_diario), 2)", "Desvio padrão do Brent"),
+    "taxa_atraso_pct": ("ROUND(AVG(CASE WHEN l.status_entrega = 'Late delivery' THEN 1 ELSE 0 END) * 100, 2)", "Entregas atrasadas (%)"),
+    "dias_envio_medio": ("ROUND(AVG(f.dias_envio_real), 2)", "Dias reais de envio"),
+    "clientes_unicos": ("COUNT(DISTINCT f.id_cliente)", "Clientes distintos"),
+}
+
+# KPIs de pedido lidos da fact_pedidos (uma linha por pedido, sem COUNT(DISTINCT) sobre os itens)
+# no conjunto "total"; os demais conjuntos cortam por produto e seguem no grão de item
+KPIS_PEDIDO = {
+    "total_pedidos": "COUNT(*)",
+    "ticket_medio_pedido": "ROUND(SUM(f.valor_pedido) / NULLIF(COUNT(*), 0), 2)",
+}
+
+# Catálogo de agrupamentos: nome -> colunas (cada um vira um GROUPING SET da mesma varredura)
+AGRUPAMENTOS = {
+    "total": [],
+    "categoria": ["categoria"],
+    "status_entrega": ["status_entrega"],
+    "modo_envio": ["modo_envio"],
+    "pais": ["cliente_pais"],
+    "mes": ["ano", "mes"],
+    "categoria_modo": ["categoria", "modo_envio"],
+}
+
+
+def montar_origem(gold_dir, aliases, filtros=None, condicoes_extras=None, fato="fact_vendas"):
+    """
+    FROM da fato + LEFT JOINs das dimensões pedidas (e das usadas nos filtros) + WHERE.
+
+    filtros: {coluna de DIMENSOES: [valores]} e/ou {"de"/"ate": id_tempo yyyymmdd}.
+    condicoes_extras: [(sql sobre a fato "f", [parametros])], somadas ao WHERE após os filtros.
+    Retorna (sql, parametros); os valores dos filtros vão como parâmetros, nunca no texto.
+    """
+    filtros = filtros or {}
+    condicoes, parametros = [], []
+    for coluna, valores in filtros.items():
+        if coluna == "de":
+            condicoes.append("f.id_tempo >= ?")
+            parametros.append(valores)
+        elif coluna == "ate":
+            condicoes.append("f.id_tempo <= ?")
+            parametros.append(valores)
+        else:
+            condicoes.append(f"{DIMENSOES[coluna][0]}.{coluna} IN ({', '.join('?' for _ in valores)})")
+            parametros.extend(valores)
+    for condicao, valores in condicoes_extras or []:
+        condicoes.append(condicao)
+        parametros.extend(valores)
+
+    aliases = set(aliases) | {DIMENSOES[c][0] for c in filtros if c in DIMENSOES}
+    arquivos = {alias: arquivo for alias, arquivo in DIMENSOES.values()}
+    joins = "".join(
+        f"\n        LEFT JOIN read_parquet('{gold_dir}/{arquivos[a]}.parquet') {a} ON f.{CHAVES_JOIN[a]} = {a}.{CHAVES_JOIN[a]}"
+        for a in sorted(aliases)
+    )
+    where = f"\n        WHERE {' AND '.join(condicoes)}" if condicoes else ""
+
+    return f"read_parquet('{gold_dir}/{fato}.parquet') f{joins}{where}", parametros
+
+
+def montar_query(gold_dir, kpis, agrupamentos, filtros=None):
+    """
+    Uma única consulta: a fato é lida uma vez, juntada às dimensões necessárias e agregada
+    em todos os GROUPING SETS pedidos. A coluna `agrupamento` identifica cada conjunto.
+    No conjunto "total", os KPIS_PEDIDO vêm da fact_pedidos quando o snapshot a possui.
+    Retorna (sql, parametros), como montar_origem.
+    """
+    colunas = list(dict.fromkeys(c for nome in agrupamentos for c in AGRUPAMENTOS[nome]))
+
+    # Dimensões necessárias: as dos agrupamentos + as citadas nas expressões dos KPIs
+    aliases = {DIMENSOES[c][0] for c in colunas}
+    aliases |= {alias for alias in CHAVES_JOIN if any(f"{alias}." in KPIS[k][0] for k in kpis)}
+    origem, parametros = montar_origem(gold_dir, aliases, filtros)
+
+    # Rótulo do conjunto: colunas do conjunto com GROUPING() = 0 e as demais com 1
+    casos = []
+    for nome in agrupamentos:
+        cols = AGRUPAMENTOS[nome]
+        bits = [f"GROUPING({DIMENSOES[c][0]}.{c}) = {0 if c in cols else 1}" for c in colunas]
+        casos.append(f"WHEN {' AND '.join(bits) or 'TRUE'} THEN '{nome}'")
+
+    select_colunas = "".join(f"{DIMENSOES[c][0]}.{c},\n            " for c in colunas)
+    select_kpis = ",\n            ".join(f"{KPIS[k][0]} AS {k}" for k in kpis)
+    grouping_sets = ", ".join(
+        "(" + ", ".join(f"{DIMENSOES[c][0]}.{c}" for c in AGRUPAMENTOS[nome]) + ")" for nome in agrupamentos
+    )
+
+    sql = f"""
+        SELECT
+            CASE {' '.join(casos)} END AS agrupamento,
+            {select_colunas}{select_kpis}
+        FROM {origem}
+        GROUP BY GROUPING SETS ({grouping_sets})
+    """
+
+    # Conjunto "total": KPIs de pedido trocados pelos da fact_pedidos, com os mesmos filtros.
+    # Filtro por produto não tem equivalente no grão de pedido: fica o COUNT(DISTINCT) dos itens
+    pedidos = [k for k in kpis if k in KPIS_PEDIDO]
+    filtro_produto = any(DIMENSOES[c][0] == "p" for c in (filtros or {}) if c in DIMENSOES)
+    if (
+        pedidos and "total" in agrupamentos and not filtro_produto
+        and os.path.exists(os.path.join(gold_dir, "fact_pedidos.parquet"))
+    ):
+        origem_pedidos, parametros_pedidos = montar_origem(gold_dir, set(), filtros, fato="fact_pedidos")
+        substituicoes = ", ".join(
+            f"CASE WHEN g.agrupamento = 'total' THEN o.{k} ELSE g.{k} END AS {k}" for k in pedidos
+        )
+        sql = f"""
+        WITH pedidos AS (
+            SELECT {', '.join(f"{KPIS_PEDIDO[k]} AS {k}" for k in pedidos)}
+            FROM {origem_pedidos}
+        )
+        SELECT g.* REPLACE ({substituicoes})
+        FROM ({sql}) g, pedidos o
+    """
+        parametros = parametros_pedidos + parametros
+
+    return sql, parametros
+
+
+def run_business_analysis(kpis=None, agrupamentos=None, formatos=None, saida=OUTPUT_REPORTS):
+    """
+    Relatório de KPIs da Gold em uma única varredura (GROUPING SETS), gravado em
+    Parquet/JSON/CSV. Retorna o dict {formato: caminho} dos arquivos gerados.
+    Impacto: todos os números gerenciais saem de uma passada pela fato, sem o dashboard.
+    """
+    kpis = kpis or list(KPIS)
+    agrupamentos = agrupamentos or list(AGRUPAMENTOS)
+    formatos = formatos or FORMATOS
+
+    con = conectar_duckdb("pipeline")
+    try:
+        # Fixa o snapshot no início: todas as consultas leem a mesma versão da Gold
+        gold_dir = snapshot_atual(GOLD_ROOT)
+        versao = versao_atual(GOLD_ROOT) or datetime.datetime.now().strftime("%Y%m%dT%H%M%S")
+        print(f"📊 EXTRAINDO INSIGHTS DA CAMADA GOLD ({gold_dir})...")
+
+        # Materializa o resultado (pequeno) uma vez; exportações e resumos leem daqui
+        sql, parametros = montar_query(gold_dir, kpis, agrupamentos)
+        con.execute(f"CREATE TEMP TABLE relatorio AS {sql}", parametros)
+        linhas = con.execute("SELECT COUNT(*) FROM relatorio").fetchone()[0]
+        print(f"✅ {len(kpis)} KPIs x {len(agrupamentos)} agrupamentos = {linhas} linhas (1 varredura)")
+
+        os.makedirs(saida, exist_ok=True)
+        opcoes = {
+            "parquet": "FORMAT PARQUET",
+            "json": "FORMAT JSON, ARRAY true",
+            "csv": "FORMAT CSV, HEADER",
+        }
+        arquivos = {}
+        for formato in formatos:
+            path = os.path.join(saida, f"kpis_{versao}.{formato}").replace("\\", "/")
+            con.execute(f"COPY (SELECT * FROM relatorio ORDER BY agrupamento) TO '{path}' ({opcoes[formato]})")
+            arquivos[formato] = path
+            print(f"💾 {formato.upper()}: {path}")
+
+        if "categoria" in agrupamentos and "faturamento_total" in kpis:
+            print("\n🏆 TOP 5 CATEGORIAS POR FATURAMENTO:")
+            print(con.execute("""
+                SELECT * EXCLUDE (agrupamento) FROM relatorio
+                WHERE agrupamento = 'categoria'
+                ORDER BY faturamento_total DESC LIMIT 5
+            """).df().dropna(axis=1, how="all"))
+
+        if "status_entrega" in agrupamentos and "total_itens" in kpis:
+            print("\n🚚 STATUS DE LOGÍSTICA:")
+            print(con.execute("""
+                SELECT status_entrega, total_itens AS total FROM relatorio
+                WHERE agrupamento = 'status_entrega' ORDER BY total DESC
+            """).df())
+
+        return arquivos
+    finally:
+        con.close()
+
 
 if __name__ == "__main__":
-    run_business_analysis()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Relatório de KPIs da Gold (uma varredura, GROUPING SETS)")
+    parser.add_argument("--kpis", nargs="+", choices=list(KPIS), help="KPIs do catálogo (padrão: todos)")
+    parser.add_argument("--agrupamentos", nargs="+", choices=list(AGRUPAMENTOS), help="Agrupamentos (padrão: todos)")
+    parser.add_argument("--formatos", nargs="+", choices=FORMATOS, help="Formatos de saída (padrão: todos)")
+    parser.add_argument("--saida", default=OUTPUT_REPORTS, help="Diretório de saída")
+    parser.add_argument("--listar", action="store_true", help="Lista o catálogo de KPIs e agrupamentos")
+    args = parser.parse_args()
+
+    if args.listar:
+        for nome, (_, descricao) in KPIS.items():
+            print(f"📈 {nome:<22} {descricao}")
+        for nome, colunas in AGRUPAMENTOS.items():
+            print(f"🧩 {nome:<22} {', '.join(colunas) or '(total geral)'}")
+    else:
+        run_business_analysis(args.kpis, args.agrupamentos, args.formatos, args.saida)
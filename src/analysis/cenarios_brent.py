@@ -0,0 +1,136 @@
+import argparse
+import os
+import sys
+
+import numpy as np
+
+# pasta raiz ao caminho de busca do Python (permite executar o módulo diretamente)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.analysis.business_kpis import montar_query
+from src.utils.helpers import conectar_duckdb
+
+# Grade de cenários: choque no Brent (%) x sensibilidade do frete ao Brent (elasticidade)
+CHOQUES_PCT = np.arange(-50, 101, 5)
+SENSIBILIDADES = np.round(np.arange(0, 1.0001, 0.05), 2)
+
+# Participação do frete no faturamento por modo de envio (premissa: a Gold não tem custo de frete)
+PARTICIPACAO_FRETE = {
+    "Same Day": 0.12,
+    "First Class": 0.09,
+    "Second Class": 0.07,
+    "Standard Class": 0.05,
+}
+PARTICIPACAO_FRETE_PADRAO = 0.07
+
+
+def base_cenarios(gold_dir):
+    """
+    Faturamento e lucro pré-agregados por categoria x modo de envio (uma consulta na Gold),
+    em matrizes K x M prontas para broadcasting.
+    """
+    sql, parametros = montar_query(
+        gold_dir, ["faturamento_total", "lucro_total", "media_petroleo_brent"], ["categoria_modo", "total"]
+    )
+    con = conectar_duckdb("dashboard")
+    try:
+        df = con.execute(sql, parametros).df()
+    finally:
+        con.close()
+
+    brent_medio = float(df.loc[df["agrupamento"] == "total", "media_petroleo_brent"].iloc[0] or 0)
+    segmentos = df[df["agrupamento"] == "categoria_modo"].dropna(subset=["categoria", "modo_envio"])
+
+    faturamento = segmentos.pivot_table(
+        index="categoria", columns="modo_envio", values="faturamento_total", aggfunc="sum", fill_value=0
+    )
+    lucro = segmentos.pivot_table(
+        index="categoria", columns="modo_envio", values="lucro_total", aggfunc="sum", fill_value=0
+    ).reindex(index=faturamento.index, columns=faturamento.columns, fill_value=0)
+
+    modos = list(faturamento.columns)
+    return {
+        "categorias": list(faturamento.index),
+        "modos": modos,
+        "faturamento": faturamento.to_numpy(dtype=np.float64),
+        "lucro": lucro.to_numpy(dtype=np.float64),
+        "participacao_frete": np.array([PARTICIPACAO_FRETE.get(m, PARTICIPACAO_FRETE_PADRAO) for m in modos]),
+        "brent_medio": brent_medio,
+    }
+
+
+def _margem(lucro, faturamento):
+    """Margem % com divisão segura (segmento sem faturamento -> 0)."""
+    return np.divide(lucro * 100, faturamento, out=np.zeros(np.broadcast(lucro, faturamento).shape), where=faturamento != 0)
+
+
+def simular_grade(base, choques=CHOQUES_PCT, sensibilidades=SENSIBILIDADES):
+    """
+    Avalia TODOS os cenários de uma vez por broadcasting (C choques x S sensibilidades x
+    K categorias x M modos), sem laço em Python:
+
+        lucro[c, s, k, m] = lucro_base[k, m] - frete[k, m] * choque[c] * sensibilidade[s]
+
+    onde frete = faturamento x participação do frete no modo.
+    Impacto: a grade inteira custa milissegundos; mover os sliders é só indexar.
+    """
+    faturamento = base["faturamento"]
+    frete = faturamento * base["participacao_frete"][None, :]                     # (K, M)
+    fator = (np.asarray(choques) / 100)[:, None] * np.asarray(sensibilidades)[None, :]  # (C, S)
+    lucro = base["lucro"][None, None] - fator[:, :, None, None] * frete[None, None]  # (C, S, K, M)
+
+    fat_categoria = faturamento.sum(axis=1)
+    fat_modo = faturamento.sum(axis=0)
+    return {
+        "choques": np.asarray(choques),
+        "sensibilidades": np.asarray(sensibilidades),
+        "categorias": base["categorias"],
+        "modos": base["modos"],
+        "brent_medio": base["brent_medio"],
+        "margem_base_total": float(_margem(base["lucro"].sum(), faturamento.sum())),
+        "margem_base_categoria": _margem(base["lucro"].sum(axis=1), fat_categoria),
+        "margem_base_modo": _margem(base["lucro"].sum(axis=0), fat_modo),
+        "lucro_base_total": float(base["lucro"].sum()),
+        "lucro_total": lucro.sum(axis=(2, 3)),                                     # (C, S)
+        "margem_total": _margem(lucro.sum(axis=(2, 3)), faturamento.sum()),         # (C, S)
+        "margem_categoria": _margem(lucro.sum(axis=3), fat_categoria),               # (C, S, K)
+        "margem_modo": _margem(lucro.sum(axis=2), fat_modo),                         # (C, S, M)
+    }
+
+
+def indice_cenario(grade, choque, sensibilidade):
+    """Posição (c, s) do cenário mais próximo na grade."""
+    c = int(np.abs(grade["choques"] - choque).argmin())
+    s = int(np.abs(grade["sensibilidades"] - sensibilidade).argmin())
+    return c, s
+
+
+def resumo_cenario(grade, choque, sensibilidade):
+    """Margem por categoria e por modo no cenário escolhido, contra a base."""
+    c, s = indice_cenario(grade, choque, sensibilidade)
+    return {
+        "choque": float(grade["choques"][c]),
+        "sensibilidade": float(grade["sensibilidades"][s]),
+        "margem_total": float(grade["margem_total"][c, s]),
+        "delta_lucro": float(grade["lucro_total"][c, s] - grade["lucro_base_total"]),
+        "margem_categoria": grade["margem_categoria"][c, s],
+        "margem_modo": grade["margem_modo"][c, s],
+    }
+
+
+if __name__ == "__main__":
+    from src.utils.snapshots import snapshot_atual
+
+    parser = argparse.ArgumentParser(description="Simulador what-if de choque no Brent")
+    parser.add_argument("--choque", type=float, default=30, help="Variação do Brent em %% (padrão: 30)")
+    parser.add_argument("--sensibilidade", type=float, default=0.5, help="Elasticidade do frete ao Brent (padrão: 0.5)")
+    args = parser.parse_args()
+
+    grade = simular_grade(base_cenarios(snapshot_atual("data/gold")))
+    cenario = resumo_cenario(grade, args.choque, args.sensibilidade)
+    print(f"🛢️ Brent {cenario['choque']:+.0f}% (base $ {grade['brent_medio']:.2f}), sensibilidade {cenario['sensibilidade']:.2f}")
+    print(f"   Margem: {grade['margem_base_total']:.2f}% -> {cenario['margem_total']:.2f}% | Δ lucro $ {cenario['delta_lucro']:,.0f}")
+    for nome, base, nova in sorted(
+        zip(grade["categorias"], grade["margem_base_categoria"], cenario["margem_categoria"]), key=lambda x: x[2] - x[1]
+    ):
+        print(f"   {nome:<30} {base:6.2f}% -> {nova:6.2f}%")
@@ -0,0 +1,204 @@
+import argparse
+import datetime
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+# pasta raiz ao caminho de busca do Python (permite executar o módulo diretamente)
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(RAIZ)
+
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+from src.serving.drill_down import tem_chave_paginacao
+from src.transform.gold_layer import FACT_SEQ_ITEM
+from src.utils.helpers import conectar_duckdb, opcoes_parquet_duckdb
+from src.utils.snapshots import snapshot_atual, publicar_snapshot
+
+DASHBOARD = os.path.join(RAIZ, "app", "dashboard.py")
+GOLD_ROOT = "data/gold"
+BASELINE_PATH = "data/benchmarks/dashboard_baseline.json"
+
+# Multiplicadores do fact_vendas atual (1x = Gold publicada)
+ESCALAS = [1, 2, 5, 10]
+TOLERANCIA = 0.25  # Regressão: passo 25% mais lento que o baseline
+TIMEOUT_S = 300
+
+# Interações roteirizadas após a carga (chave do widget, ação, valor)
+ROTEIRO = [
+    ("abrir_diagnostico", "toggle", True),
+    ("abrir_oportunidades", "toggle", True),
+    ("timeline_granularidade", "selectbox", "Semana"),
+    ("timeline_granularidade", "selectbox", "Mês"),
+    ("abrir_cenarios", "toggle", True),
+    ("cenario_choque", "select_slider", 100),
+    ("modo_aproximado", "toggle", True),
+]
+
+
+def memoria_mb():
+    """RSS atual do processo em MB (Linux via /proc; fallback para o pico via resource)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+    except (OSError, ValueError):
+        try:
+            import resource
+            pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return pico / 1024 ** 2 if sys.platform == "darwin" else pico / 1024
+        except ImportError:
+            return None
+
+
+def montar_gold_escalada(destino, escala):
+    """
+    Cria data/gold em `destino` com o fact_vendas publicado replicado `escala` vezes
+    e as dimensões/manifesto do mesmo snapshot (hard link).
+    """
+    origem = os.path.abspath(snapshot_atual(GOLD_ROOT))
+    gold_root = os.path.join(destino, GOLD_ROOT)
+    snapshot = os.path.join(gold_root, "snapshots", f"bench_{escala:03d}x")
+    os.makedirs(snapshot)
+
+    for nome in os.listdir(origem):
+        if nome.endswith((".parquet", ".json")) and nome != "fact_vendas.parquet":
+            try:
+                os.link(os.path.join(origem, nome), os.path.join(snapshot, nome))
+            except OSError:
+                shutil.copy2(os.path.join(origem, nome), os.path.join(snapshot, nome))
+
+    # Cópias renumeram o desempate: a chave de paginação continua única na escala
+    colunas = "f.*"
+    if tem_chave_paginacao(origem):
+        colunas = f"""f.* REPLACE (CAST(f.{FACT_SEQ_ITEM} + r.range * (
+            SELECT MAX({FACT_SEQ_ITEM}) FROM read_parquet('{origem}/fact_vendas.parquet')
+        ) AS INTEGER) AS {FACT_SEQ_ITEM})"""
+
+    con = conectar_duckdb("pipeline")
+    con.execute(f"""
+        COPY (
+            SELECT {colunas} FROM read_parquet('{origem}/fact_vendas.parquet') f, range({escala}) r
+            ORDER BY f.id_tempo
+        ) TO '{snapshot}/fact_vendas.parquet' ({opcoes_parquet_duckdb()})
+    """)
+    linhas = con.execute(f"SELECT COUNT(*) FROM read_parquet('{snapshot}/fact_vendas.parquet')").fetchone()[0]
+    con.close()
+
+    publicar_snapshot(snapshot, gold_root)
+    return linhas
+
+
+def _passo(resultados, escala, nome, acao):
+    """Executa e cronometra um passo do AppTest, registrando latência e memória."""
+    inicio = time.perf_counter()
+    at = acao()
+    latencia = time.perf_counter() - inicio
+
+    if at.exception:
+        raise RuntimeError(f"Dashboard falhou em '{nome}' ({escala}x): {at.exception[0].value}")
+
+    resultados.append({
+        "escala": escala,
+        "passo": nome,
+        "latencia_s": round(latencia, 4),
+        "memoria_mb": round(memoria_mb() or 0, 1),
+    })
+    return at
+
+
+def executar_roteiro(escala):
+    """Carga fria, rerun quente e interações roteirizadas para uma escala."""
+    resultados = []
+
+    # Frio: sem nenhum cache do Streamlit (como o primeiro visitante após o deploy)
+    st.cache_data.clear()
+    st.cache_resource.clear()
+    at = AppTest.from_file(DASHBOARD, default_timeout=TIMEOUT_S)
+    at = _passo(resultados, escala, "carga_fria", at.run)
+
+    # Quente: nova sessão reaproveitando os caches compartilhados
+    at = AppTest.from_file(DASHBOARD, default_timeout=TIMEOUT_S)
+    at = _passo(resultados, escala, "rerun_quente", at.run)
+
+    for chave, tipo, valor in ROTEIRO:
+        widget = getattr(at, tipo)(key=chave)
+        at = _passo(resultados, escala, f"{chave}={valor}", widget.set_value(valor).run)
+
+    return resultados
+
+
+def comparar_baseline(resultados, baseline, tolerancia):
+    """Lista de regressões (passos mais lentos que baseline * (1 + tolerância))."""
+    referencia = {(r["escala"], r["passo"]): r["latencia_s"] for r in baseline["resultados"]}
+    regressoes = []
+    for r in resultados:
+        anterior = referencia.get((r["escala"], r["passo"]))
+        if anterior and r["latencia_s"] > anterior * (1 + tolerancia):
+            regressoes.append({**r, "baseline_s": anterior, "variacao": r["latencia_s"] / anterior - 1})
+    return regressoes
+
+
+def run_dashboard_benchmark(escalas=None, salvar_baseline=False, tolerancia=TOLERANCIA):
+    """
+    Benchmark headless do dashboard via streamlit.testing (AppTest) com a Gold
+    publicada replicada em tamanhos crescentes.
+    Retorna 0 se não houver regressão em relação ao baseline, 1 caso contrário.
+    """
+    escalas = escalas or ESCALAS
+    cwd_original = os.getcwd()
+    todos = []
+
+    print(f"🏁 Benchmark do dashboard: escalas {escalas}")
+    for escala in escalas:
+        with tempfile.TemporaryDirectory(prefix="dashboard_bench_") as tmp:
+            linhas = montar_gold_escalada(tmp, escala)
+            print(f"\n📦 {escala}x: {linhas:,} linhas em fact_vendas")
+            os.chdir(tmp)
+            try:
+                resultados = executar_roteiro(escala)
+            finally:
+                os.chdir(cwd_original)
+
+        for r in resultados:
+            r["linhas_fato"] = linhas
+            print(f"   {r['passo']:<36} {r['latencia_s']:>8.3f}s  {r['memoria_mb']:>8.1f} MB")
+        todos.extend(resultados)
+
+    execucao = {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "resultados": todos,
+    }
+
+    os.makedirs(os.path.dirname(BASELINE_PATH), exist_ok=True)
+    if salvar_baseline or not os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH, "w", encoding="utf-8") as f:
+            json.dump(execucao, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Baseline salvo em: {BASELINE_PATH}")
+        return 0
+
+    with open(BASELINE_PATH, encoding="utf-8") as f:
+        baseline = json.load(f)
+
+    regressoes = comparar_baseline(todos, baseline, tolerancia)
+    if not regressoes:
+        print(f"\n✅ Sem regressões em relação ao baseline de {baseline['timestamp']} (tolerância {tolerancia:.0%})")
+        return 0
+
+    print(f"\n❌ {len(regressoes)} regressões em relação ao baseline de {baseline['timestamp']}:")
+    for r in regressoes:
+        print(f"   {r['escala']}x {r['passo']}: {r['baseline_s']:.3f}s → {r['latencia_s']:.3f}s ({r['variacao']:+.0%})")
+    return 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark headless de latência do dashboard")
+    parser.add_argument("--escalas", type=int, nargs="+", default=ESCALAS, help="Multiplicadores do fact_vendas")
+    parser.add_argument("--salvar-baseline", action="store_true", help="Grava esta execução como novo baseline")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA, help="Regressão tolerada (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    sys.exit(run_dashboard_benchmark(args.escalas, args.salvar_baseline, args.tolerancia))
@@ -0,0 +1,176 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+# pasta raiz ao caminho de busca do Python (permite executar o módulo diretamente)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.analysis.business_kpis import AGRUPAMENTOS, montar_query
+from src.utils.helpers import conectar_duckdb
+
+# Segmentos avaliados (todos na mesma varredura, um GROUPING SET cada)
+SEGMENTOS = ["total", "categoria", "pais", "modo_envio", "categoria_modo"]
+
+# Segmentos com menos itens que isso não geram alerta (ruído estatístico)
+MIN_ITENS_SEGMENTO = 30
+
+# Máximo de cards por regra (um problema sistêmico não ocupa todos os cards)
+MAX_CARDS_POR_REGRA = int(os.getenv("INSIGHTS_MAX_POR_REGRA", "2"))
+
+# Prioridade de exibição por tipo de card (alertas antes de reconhecimentos)
+PRIORIDADE_TIPO = {"danger": 3, "warning": 2, "success": 1}
+
+# Catálogo declarativo de regras: cada regra compara um KPI do catálogo com um limite.
+#   segmentos: onde a regra vale (None = todos)
+#   texto: formatado com {segmento}, {valor} e {limite}
+REGRAS_INSIGHT = [
+    {
+        "id": "prejuizo", "kpi": "lucro_total", "op": "<", "limite": 0,
+        "tipo": "danger", "icone": "🩸", "titulo": "Segmento no Prejuízo",
+        "texto": "{segmento} acumula prejuízo de $ {valor:,.0f}. Revisar preço, mix e custo logístico.",
+        "segmentos": None,
+    },
+    {
+        "id": "atraso_critico", "kpi": "taxa_atraso_pct", "op": ">", "limite": 10,
+        "tipo": "danger", "icone": "🚨", "titulo": "Crise Logística",
+        "texto": "{valor:.1f}% de atrasos em {segmento}! Meta: <5%. Impacto direto em satisfação do cliente.",
+        "segmentos": None,
+    },
+    {
+        "id": "margem_baixa", "kpi": "margem_pct", "op": "<", "limite": 15,
+        "tipo": "warning", "icone": "⚠️", "titulo": "Margem Sob Pressão",
+        "texto": "Margem de {valor:.1f}% em {segmento}, abaixo de {limite:.0f}%. Revisar custos operacionais.",
+        "segmentos": None,
+    },
+    {
+        "id": "envio_lento", "kpi": "dias_envio_medio", "op": ">", "limite": 4,
+        "tipo": "warning", "icone": "🐢", "titulo": "Envio Lento",
+        "texto": "{segmento} leva {valor:.1f} dias em média para enviar (limite: {limite:.0f}).",
+        "segmentos": None,
+    },
+    {
+        "id": "brent_volatil", "kpi": "volatilidade_brent", "op": ">", "limite": 10,
+        "tipo": "warning", "icone": "📊", "titulo": "Alta Volatilidade de Brent",
+        "texto": "Desvio padrão de $ {valor:.2f} no Brent. Hedging recomendado para proteger margens.",
+        "segmentos": ["total"],
+    },
+    {
+        "id": "margem_saudavel", "kpi": "margem_pct", "op": ">=", "limite": 15,
+        "tipo": "success", "icone": "✅", "titulo": "Margem Saudável",
+        "texto": "Margem de {valor:.1f}% na {segmento}, acima do benchmark de {limite:.0f}%. Operação eficiente!",
+        "segmentos": ["total"],
+    },
+    {
+        "id": "entregas_excelentes", "kpi": "taxa_atraso_pct", "op": "<", "limite": 5,
+        "tipo": "success", "icone": "🏆", "titulo": "Excelência em Entregas",
+        "texto": "Apenas {valor:.1f}% de atrasos na {segmento}. Time logístico performando acima do mercado!",
+        "segmentos": ["total"],
+    },
+]
+
+OPERADORES = {
+    "<": np.less,
+    "<=": np.less_equal,
+    ">": np.greater,
+    ">=": np.greater_equal,
+}
+
+
+def kpis_por_segmento(gold_dir):
+    """Todos os KPIs usados pelas regras, para todos os segmentos, em UMA consulta (GROUPING SETS)."""
+    kpis = list(dict.fromkeys(["total_itens", "faturamento_total"] + [r["kpi"] for r in REGRAS_INSIGHT]))
+    sql, parametros = montar_query(gold_dir, kpis, SEGMENTOS)
+    con = conectar_duckdb("dashboard")
+    try:
+        return con.execute(sql, parametros).df()
+    finally:
+        con.close()
+
+
+def rotular_segmentos(df):
+    """Nome legível de cada linha ('categoria Cleats', 'Cleats × Same Day', 'operação geral')."""
+    rotulos = pd.Series("operação geral", index=df.index, dtype=object)
+    for nome in SEGMENTOS:
+        colunas = AGRUPAMENTOS[nome]
+        if not colunas:
+            continue
+        mascara = (df["agrupamento"] == nome).to_numpy()
+        valores = df.loc[mascara, colunas].astype(str)
+        if len(colunas) == 1:
+            prefixo = {"categoria": "categoria", "cliente_pais": "país", "modo_envio": "modo"}.get(colunas[0], colunas[0])
+            rotulos[mascara] = prefixo + " " + valores[colunas[0]]
+        else:
+            rotulos[mascara] = valores.agg(" × ".join, axis=1)
+    return rotulos
+
+
+def avaliar_regras(df, regras=REGRAS_INSIGHT, min_itens=MIN_ITENS_SEGMENTO):
+    """
+    Avalia o catálogo sobre todos os segmentos de uma vez: cada regra é uma máscara
+    vetorizada sobre a tabela de segmentos (o laço é sobre as regras, nunca sobre segmentos).
+
+    Score: desvio relativo ao limite x participação do segmento no faturamento,
+    para que um desvio grande em um segmento relevante venha antes de um ruído pequeno.
+    """
+    if df is None or df.empty:
+        return pd.DataFrame()
+
+    faturamento_total = df.loc[df["agrupamento"] == "total", "faturamento_total"].sum() or 1
+    peso = (df["faturamento_total"].to_numpy(dtype=np.float64) / faturamento_total).clip(0, 1)
+    suporte = df["total_itens"].to_numpy() >= min_itens
+    rotulos = rotular_segmentos(df)
+
+    violacoes = []
+    for regra in regras:
+        valores = df[regra["kpi"]].to_numpy(dtype=np.float64)
+        mascara = OPERADORES[regra["op"]](valores, regra["limite"]) & suporte & ~np.isnan(valores)
+        if regra["segmentos"] is not None:
+            mascara &= df["agrupamento"].isin(regra["segmentos"]).to_numpy()
+        if not mascara.any():
+            continue
+
+        desvio = np.abs(valores[mascara] - regra["limite"]) / max(abs(regra["limite"]), 1)
+        violacoes.append(pd.DataFrame({
+            "regra": regra["id"],
+            "agrupamento": df["agrupamento"].to_numpy()[mascara],
+            "segmento": rotulos.to_numpy()[mascara],
+            "valor": valores[mascara],
+            "score": desvio * np.where(df["agrupamento"].to_numpy()[mascara] == "total", 1.0, peso[mascara]),
+            "prioridade": PRIORIDADE_TIPO[regra["tipo"]],
+        }))
+
+    if not violacoes:
+        return pd.DataFrame()
+    return pd.concat(violacoes, ignore_index=True).sort_values(
+        ["prioridade", "score"], ascending=False, ignore_index=True
+    )
+
+
+def cards_insight(violacoes, limite=6, regras=REGRAS_INSIGHT, por_regra=MAX_CARDS_POR_REGRA):
+    """Top violações no formato dos cards do dashboard (tipo, icone, titulo, texto)."""
+    if violacoes.empty:
+        return []
+    por_id = {r["id"]: r for r in regras}
+    # Já ordenado por prioridade/score: as N primeiras de cada regra, na mesma ordem
+    selecionadas = violacoes.groupby("regra", sort=False).head(por_regra).head(limite)
+    cards = []
+    for linha in selecionadas.itertuples(index=False):
+        regra = por_id[linha.regra]
+        cards.append({
+            "tipo": regra["tipo"],
+            "icone": regra["icone"],
+            "titulo": regra["titulo"],
+            "texto": regra["texto"].format(segmento=linha.segmento, valor=linha.valor, limite=regra["limite"]),
+        })
+    return cards
+
+
+if __name__ == "__main__":
+    from src.utils.snapshots import snapshot_atual
+
+    segmentos = kpis_por_segmento(snapshot_atual("data/gold"))
+    violacoes = avaliar_regras(segmentos)
+    print(f"🔎 {len(segmentos)} segmentos avaliados, {len(violacoes)} violações")
+    print(violacoes.head(20).to_string(index=False))
@@ -0,0 +1,131 @@
+import argparse
+import os
+import sys
+from fractions import Fraction
+
+# pasta raiz ao caminho de busca do Python (permite executar o módulo diretamente)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.utils.helpers import conectar_duckdb
+
+SKETCH_TABELA = "agg_lead_time_diario"
+
+# Segmentos disponíveis no sketch diário
+SEGMENTOS_LEAD_TIME = ["modo_envio", "pedido_regiao", "categoria"]
+
+# Distribuições derivadas do histograma conjunto (real x agendado)
+METRICAS_LEAD_TIME = {
+    "lead_time": ("dias_envio_real", "Dias de envio (real)"),
+    "atraso": ("dias_envio_real - dias_envio_agendado", "Dias de atraso (real - agendado)"),
+}
+
+QUANTIS = [0.5, 0.9, 0.99]
+
+
+def caminho_sketch(gold_dir):
+    """Parquet do sketch no snapshot, ou None em snapshots anteriores a ele."""
+    path = os.path.join(gold_dir, f"{SKETCH_TABELA}.parquet").replace("\\", "/")
+    return path if os.path.exists(path) else None
+
+
+def _validar(segmento, metrica):
+    if segmento not in SEGMENTOS_LEAD_TIME:
+        raise ValueError(f"Segmento inválido: {segmento} (opções: {', '.join(SEGMENTOS_LEAD_TIME)})")
+    if metrica not in METRICAS_LEAD_TIME:
+        raise ValueError(f"Métrica inválida: {metrica} (opções: {', '.join(METRICAS_LEAD_TIME)})")
+
+
+def _histograma_sql(sketch, segmento, metrica, de=None, ate=None):
+    """
+    Mescla os histogramas diários do período: somar contagens por (segmento, valor)
+    é a operação de merge do sketch. Retorna (sql, parametros).
+    """
+    filtros, parametros = [], []
+    if de is not None:
+        filtros.append("id_tempo >= ?")
+        parametros.append(de)
+    if ate is not None:
+        filtros.append("id_tempo <= ?")
+        parametros.append(ate)
+    where = f"WHERE {' AND '.join(filtros)}" if filtros else ""
+
+    sql = f"""
+        SELECT {segmento} AS segmento, {METRICAS_LEAD_TIME[metrica][0]} AS valor, CAST(SUM(itens) AS BIGINT) AS itens
+        FROM read_parquet('{sketch}')
+        {where}
+        GROUP BY ALL
+    """
+    return sql, parametros
+
+
+def quantis_lead_time(gold_dir, segmento="modo_envio", metrica="lead_time", de=None, ate=None, quantis=QUANTIS):
+    """
+    p50/p90/p99 (e média) por segmento a partir do sketch, para o período [de, ate] em id_tempo.
+    Quantil = menor valor cuja contagem acumulada atinge ceil(q * total) (mesma definição de
+    quantile_disc), exato porque o histograma guarda cada valor inteiro de dias.
+    q vira a fração num/den e a comparação é acumulado * den >= num * total, só com inteiros:
+    uma razão em ponto flutuante (ex.: 9/10 contra 0.9) pode errar o degrau por arredondamento.
+    Retorna um DataFrame, ou None se o snapshot não tiver o sketch.
+    """
+    _validar(segmento, metrica)
+    sketch = caminho_sketch(gold_dir)
+    if sketch is None:
+        return None
+
+    histograma, parametros = _histograma_sql(sketch, segmento, metrica, de, ate)
+    fracoes = [Fraction(q).limit_denominator(1_000_000) for q in quantis]
+    colunas_quantis = ",\n".join(
+        f"MIN(valor) FILTER (WHERE acumulado * {f.denominator} >= total * {f.numerator}) AS p{round(q * 100)}"
+        for q, f in zip(quantis, fracoes)
+    )
+    con = conectar_duckdb("dashboard")
+    try:
+        return con.execute(f"""
+            WITH hist AS ({histograma}),
+            acum AS (
+                SELECT segmento, valor, itens,
+                    CAST(SUM(itens) OVER (PARTITION BY segmento ORDER BY valor) AS HUGEINT) AS acumulado,
+                    CAST(SUM(itens) OVER (PARTITION BY segmento) AS HUGEINT) AS total
+                FROM hist
+            )
+            SELECT
+                segmento,
+                CAST(SUM(itens) AS BIGINT) AS itens,
+                ROUND(SUM(valor * itens) / SUM(itens), 2) AS media,
+                {colunas_quantis}
+            FROM acum
+            GROUP BY segmento
+            ORDER BY segmento
+        """, parametros).df()
+    finally:
+        con.close()
+
+
+def periodo_sketch(gold_dir):
+    """(primeiro, último) id_tempo coberto pelo sketch, ou None."""
+    sketch = caminho_sketch(gold_dir)
+    if sketch is None:
+        return None
+    con = conectar_duckdb("dashboard")
+    try:
+        return con.execute(f"SELECT MIN(id_tempo), MAX(id_tempo) FROM read_parquet('{sketch}')").fetchone()
+    finally:
+        con.close()
+
+
+if __name__ == "__main__":
+    from src.utils.snapshots import snapshot_atual
+
+    parser = argparse.ArgumentParser(description="Quantis de lead time a partir do sketch diário da Gold")
+    parser.add_argument("--segmento", choices=SEGMENTOS_LEAD_TIME, default="modo_envio")
+    parser.add_argument("--metrica", choices=list(METRICAS_LEAD_TIME), default="lead_time")
+    parser.add_argument("--de", type=int, help="id_tempo inicial (yyyymmdd)")
+    parser.add_argument("--ate", type=int, help="id_tempo final (yyyymmdd)")
+    args = parser.parse_args()
+
+    resultado = quantis_lead_time(snapshot_atual("data/gold"), args.segmento, args.metrica, args.de, args.ate)
+    if resultado is None:
+        print("❌ Snapshot sem agg_lead_time_diario: execute o pipeline Gold novamente.")
+        sys.exit(1)
+    print(f"⏱️ {METRICAS_LEAD_TIME[args.metrica][1]} por {args.segmento}")
+    print(resultado.to_string(index=False))
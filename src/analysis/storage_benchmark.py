@@ -0,0 +1,89 @@
+import os
+import sys
+import time
+
+import pandas as pd
+
+# pasta raiz ao caminho de busca do Python (permite executar o módulo diretamente)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.utils.helpers import (
+    conectar_duckdb,
+    esquema_parquet,
+    opcoes_parquet_pandas,
+    PERFIS_ARMAZENAMENTO,
+)
+from src.transform.silver_layer import OUTPUT_SILVER, TIPOS_COMPACTOS
+
+BENCH_DIR = "data/tmp/storage_benchmark"
+REPETICOES = 5
+
+
+def _medir(con, sql):
+    """Menor tempo (s) entre REPETICOES execuções de uma consulta."""
+    tempos = []
+    for _ in range(REPETICOES):
+        inicio = time.perf_counter()
+        con.execute(sql).fetchall()
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos)
+
+
+def run_storage_benchmark(perfis=None):
+    """
+    Regrava a Silver em cada perfil de armazenamento e compara tamanho e velocidade de leitura.
+    Impacto: escolha do perfil baseada nos nossos dados, não em benchmarks genéricos.
+    """
+    if not os.path.exists(OUTPUT_SILVER):
+        print(f"❌ Silver não encontrada em {OUTPUT_SILVER}. Execute silver_layer.py primeiro.")
+        return None
+
+    perfis = perfis or list(PERFIS_ARMAZENAMENTO)
+    os.makedirs(BENCH_DIR, exist_ok=True)
+
+    # Lê a Silver de volta para strings/int64 puros, base comum a todos os perfis
+    df = pd.read_parquet(OUTPUT_SILVER)
+    for col in df.select_dtypes(include="category").columns:
+        df[col] = df[col].astype(str)
+    for col in df.select_dtypes(include="integer").columns:
+        df[col] = df[col].astype("int64")
+
+    print(f"📏 Benchmark de armazenamento: {len(df):,} linhas, {len(perfis)} perfis")
+    con = conectar_duckdb("pipeline")
+    resultados = []
+
+    for perfil in perfis:
+        destino = os.path.join(BENCH_DIR, f"silver_{perfil}.parquet")
+
+        inicio = time.perf_counter()
+        df.to_parquet(
+            destino, index=False, schema=esquema_parquet(df, TIPOS_COMPACTOS, perfil), **opcoes_parquet_pandas(perfil)
+        )
+        tempo_escrita = time.perf_counter() - inicio
+
+        resultados.append({
+            "perfil": perfil,
+            "tamanho_mb": os.path.getsize(destino) / 1024 ** 2,
+            "escrita_s": tempo_escrita,
+            # Leitura completa (todas as colunas) e consulta típica do dashboard (poucas colunas)
+            "leitura_total_s": _medir(con, f"SELECT * FROM read_parquet('{destino}')"),
+            "agregacao_s": _medir(con, f"""
+                SELECT categoria, modo_envio, SUM(valor_venda), AVG(dias_envio_real)
+                FROM read_parquet('{destino}')
+                GROUP BY 1, 2
+            """),
+        })
+
+    con.close()
+
+    df_res = pd.DataFrame(resultados)
+    base = df_res["tamanho_mb"].iloc[0]
+    df_res["vs_" + perfis[0]] = (df_res["tamanho_mb"] / base).map(lambda x: f"{x:.0%}")
+
+    print("\n📊 RESULTADO (menor de", REPETICOES, "execuções):")
+    print(df_res.to_string(index=False, float_format=lambda x: f"{x:.3f}"))
+    return df_res
+
+
+if __name__ == "__main__":
+    run_storage_benchmark()
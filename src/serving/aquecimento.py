@@ -0,0 +1,105 @@
+import os
+import sys
+import time
+import urllib.error
+import urllib.request
+
+DASHBOARD_URL = os.getenv("DASHBOARD_URL", "http://localhost:8501")
+PRONTO_TIMEOUT_S = float(os.getenv("DASHBOARD_PRONTO_TIMEOUT_S", "600"))
+INTERVALO_S = 0.5
+
+# Checagens de 60s (limite fixo do Streamlit) antes de desistir: cada uma reexecuta a página
+# do início aproveitando o que já entrou em cache; um trecho sem cache que passe de 60s nunca conclui
+TENTATIVAS_AQUECIMENTO = int(os.getenv("DASHBOARD_AQUECIMENTO_TENTATIVAS", "5"))
+
+# Endpoints do Streamlit: servidor no ar / script executado de ponta a ponta.
+# O script-health-check exige --server.scriptHealthCheckEnabled=true e roda a página em uma
+# sessão interna do próprio servidor: os caches compartilhados (st.cache_data/resource) ficam quentes.
+ROTA_SAUDE = "/_stcore/health"
+ROTA_SCRIPT = "/_stcore/script-health-check"
+
+
+def _get(url, timeout):
+    """(status, corpo) de um GET; (None, motivo) se não houve resposta HTTP."""
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as resp:
+            return resp.status, resp.read().decode("utf-8", "replace").strip()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read().decode("utf-8", "replace").strip()
+    except (urllib.error.URLError, ConnectionError, TimeoutError) as e:
+        return None, str(e)
+
+
+def aguardar_servidor(url_base=DASHBOARD_URL, timeout=PRONTO_TIMEOUT_S, processo=None):
+    """Espera o servidor Streamlit responder ao health check (sem sleep fixo)."""
+    limite = time.perf_counter() + timeout
+    while time.perf_counter() < limite:
+        if processo is not None and processo.poll() is not None:
+            print(f"❌ Streamlit encerrou durante a inicialização (código {processo.returncode}).")
+            return False
+        status, _ = _get(url_base + ROTA_SAUDE, timeout=5)
+        if status == 200:
+            return True
+        time.sleep(INTERVALO_S)
+    print(f"❌ Servidor não respondeu em {timeout:.0f}s: {url_base}")
+    return False
+
+
+def aquecer_dashboard(url_base=DASHBOARD_URL, timeout=PRONTO_TIMEOUT_S, tentativas=TENTATIVAS_AQUECIMENTO):
+    """
+    Executa a página uma vez dentro do servidor (carga da Gold, KPIs, figuras da visão padrão
+    e descoberta do modelo de IA). O Streamlit limita cada checagem a 60s e, em "timeout",
+    ENCERRA a sessão interna: a execução não continua. A próxima checagem roda a página de novo
+    do início; só os passos em st.cache_data/st.cache_resource já concluídos (e o que estava
+    em cálculo) são reaproveitados. Por isso a checagem é refeita até `tentativas` vezes.
+    Retorna True quando a página terminou sem erro.
+    """
+    limite = time.perf_counter() + timeout
+    for tentativa in range(1, tentativas + 1):
+        if time.perf_counter() >= limite:
+            break
+        status, corpo = _get(url_base + ROTA_SCRIPT, timeout=90)
+        if status == 200:
+            return True
+        if status == 404:
+            print("❌ script-health-check desativado: inicie com --server.scriptHealthCheckEnabled=true")
+            return False
+        if status == 503 and corpo != "timeout":
+            print(f"❌ Dashboard falhou no aquecimento: {corpo}")
+            return False
+        if status == 503 and tentativa < tentativas:
+            print(f"   ⏳ Checagem {tentativa}/{tentativas} passou de 60s: reexecutando com os caches já preenchidos...")
+        time.sleep(INTERVALO_S)
+    else:
+        print(
+            f"❌ Aquecimento não concluiu em {tentativas} checagens: se todas passaram de 60s, algum trecho "
+            "fora de st.cache_* leva, sozinho, mais que o limite do script-health-check do Streamlit"
+        )
+        return False
+    print(f"❌ Aquecimento não concluiu em {timeout:.0f}s")
+    return False
+
+
+def aguardar_dashboard_pronto(url_base=DASHBOARD_URL, timeout=PRONTO_TIMEOUT_S, processo=None):
+    """
+    Prontidão = servidor no ar + página executada com caches quentes.
+    Impacto: o primeiro usuário externo já encontra Gold, KPIs e figuras padrão em cache.
+    """
+    inicio = time.perf_counter()
+    print("⏳ Aguardando o servidor do dashboard...")
+    if not aguardar_servidor(url_base, timeout, processo):
+        return False
+    print(f"   ✅ Servidor no ar em {time.perf_counter() - inicio:.1f}s")
+
+    print("🔥 Aquecendo caches (Gold, KPIs, figuras da visão padrão, modelo de IA)...")
+    restante = max(timeout - (time.perf_counter() - inicio), 1)
+    if not aquecer_dashboard(url_base, restante):
+        return False
+    print(f"   ✅ Dashboard pronto em {time.perf_counter() - inicio:.1f}s")
+    return True
+
+
+if __name__ == "__main__":
+    # Checagem de prontidão para orquestradores: python src/serving/aquecimento.py [url]
+    url = sys.argv[1] if len(sys.argv) > 1 else DASHBOARD_URL
+    sys.exit(0 if aguardar_dashboard_pronto(url) else 1)
@@ -0,0 +1,163 @@
+import argparse
+import os
+import sys
+
+import pyarrow.parquet as pq
+
+# pasta raiz ao caminho de busca do Python (permite executar o módulo diretamente)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.analysis.business_kpis import montar_origem
+from src.serving.exportacao import COLUNAS_EXPORTACAO
+from src.transform.gold_layer import FACT_CLUSTER_COLUNAS, FACT_SEQ_ITEM
+from src.utils.helpers import conectar_duckdb
+
+# Chave única e clusterizada da fact_vendas: cursor de toda paginação
+CHAVE_PAGINACAO = FACT_CLUSTER_COLUNAS + [FACT_SEQ_ITEM]
+
+# Ordenações no servidor: nome -> (expressão sobre a fato ou None = só a chave, rótulo).
+# Só "data" segue a ordem física da fato; as métricas exigem varrer a fato inteira (filtrada)
+# e manter um top-N a cada página. O custo não cresce com a profundidade, mas não é uma busca.
+# NULL vira -inf para a ordem ser total (uma linha nula não some entre duas páginas).
+ORDENACOES = {
+    "data": (None, "Data"),
+    "valor_venda": ("COALESCE(CAST(f.valor_venda AS DOUBLE), '-inf'::DOUBLE)", "Valor da venda"),
+    "lucro_pedido": ("COALESCE(CAST(f.lucro_pedido AS DOUBLE), '-inf'::DOUBLE)", "Lucro"),
+    "dias_envio_real": ("COALESCE(CAST(f.dias_envio_real AS DOUBLE), '-inf'::DOUBLE)", "Dias de envio"),
+}
+
+TAMANHO_PAGINA = int(os.getenv("DRILL_DOWN_TAMANHO_PAGINA", "50"))
+
+
+def tem_chave_paginacao(gold_dir):
+    """Snapshots anteriores ao seq_item não têm chave única (só o rodapé do Parquet é lido)."""
+    path = os.path.join(gold_dir, "fact_vendas.parquet")
+    return os.path.exists(path) and FACT_SEQ_ITEM in pq.ParquetFile(path).schema_arrow.names
+
+
+def fato_ordenada_pela_chave(gold_dir):
+    """
+    True se os row groups da fact_vendas cobrem faixas crescentes e disjuntas de id_tempo
+    (layout "sort" com seq_item na ordenação), lido só do rodapé do Parquet.
+    No layout "zorder" a ordem física é a curva Morton: o keyset continua correto, mas cada
+    página da ordenação "data" vira uma varredura + top-N, como as ordenações por métrica.
+    """
+    meta = pq.ParquetFile(os.path.join(gold_dir, "fact_vendas.parquet")).metadata
+    indice = meta.schema.to_arrow_schema().get_field_index(CHAVE_PAGINACAO[0])
+    faixas = []
+    for rg in range(meta.num_row_groups):
+        stats = meta.row_group(rg).column(indice).statistics
+        if stats is None or not stats.has_min_max:
+            return False
+        faixas.append((stats.min, stats.max))
+    return all(anterior[1] <= atual[0] for anterior, atual in zip(faixas, faixas[1:]))
+
+
+def _colunas_chave(ordem):
+    """Colunas do cursor: expressão de ordenação (se houver) + chave única da fato."""
+    expressao = ORDENACOES[ordem][0]
+    return ([expressao] if expressao else []) + [f"f.{c}" for c in CHAVE_PAGINACAO]
+
+
+def predicado_keyset(colunas, cursor, descendente=False):
+    """
+    Linhas estritamente depois do cursor na ordem (c1, c2, ..., cn):
+        c1 >= v1 AND (c1 > v1 OR (c1 = v1 AND c2 > v2) OR ...)
+    O primeiro termo é redundante de propósito: um filtro simples na coluna líder desce até o
+    scan do Parquet e descarta row groups inteiros pelas estatísticas min/max.
+    Retorna (sql, parametros).
+    """
+    op = "<" if descendente else ">"
+    termos, parametros = [], [cursor[0]]
+    for i, coluna in enumerate(colunas):
+        iguais = [f"{c} = ?" for c in colunas[:i]]
+        termos.append("(" + " AND ".join(iguais + [f"{coluna} {op} ?"]) + ")")
+        parametros.extend(list(cursor[:i]) + [cursor[i]])
+    return f"{colunas[0]} {op}= ? AND ({' OR '.join(termos)})", parametros
+
+
+def pagina_itens(gold_dir, filtros=None, ordem="data", descendente=False, cursor=None, tamanho=TAMANHO_PAGINA):
+    """
+    Uma página de itens de pedido por keyset: WHERE (chave) > cursor ORDER BY chave LIMIT n.
+    Sem OFFSET: nada antes do cursor é materializado nem descartado, então a página 1.000
+    custa o mesmo que a primeira. Só as linhas da página são juntadas às dimensões de exibição.
+
+    Custo por página:
+    - ordem "data" com a fato no layout "sort" (fato_ordenada_pela_chave): busca — o limite
+      inferior em id_tempo descarta os row groups anteriores pelas estatísticas min/max;
+    - ordens por métrica, ou layout "zorder": varredura da fato filtrada + top-N.
+
+    cursor: tupla devolvida pela página anterior (None = primeira página).
+    Retorna (DataFrame da página, cursor da próxima página ou None se esta for a última).
+    """
+    if ordem not in ORDENACOES:
+        raise ValueError(f"Ordenação inválida: {ordem} (opções: {', '.join(ORDENACOES)})")
+
+    colunas = _colunas_chave(ordem)
+    extras = [predicado_keyset(colunas, cursor, descendente)] if cursor is not None else []
+    origem, parametros = montar_origem(gold_dir, set(), filtros, extras)
+    direcao = " DESC" if descendente else ""
+    ordem_sql = ", ".join(f"{c}{direcao}" for c in colunas)
+    # Fora da CTE a página volta a se chamar "f": as colunas do extrato servem sem adaptação
+    joins = "".join(
+        f"\n            LEFT JOIN read_parquet('{gold_dir}/{arquivo}.parquet') {alias} ON f.{chave} = {alias}.{chave}"
+        for alias, arquivo, chave in [
+            ("p", "dim_produtos", "id_produto"), ("c", "dim_clientes", "id_cliente"),
+            ("l", "dim_logistica", "id_logistica"), ("t", "dim_tempo", "id_tempo"),
+        ]
+    )
+    colunas_pagina = ",\n            ".join(COLUNAS_EXPORTACAO)
+
+    sql = f"""
+        WITH g AS (
+            SELECT f.*, {', '.join(f'{c} AS _k{i}' for i, c in enumerate(colunas))}
+            FROM {origem}
+            ORDER BY {ordem_sql}
+            LIMIT {int(tamanho) + 1}
+        )
+        SELECT
+            {colunas_pagina},
+            {', '.join(f'f._k{i}' for i in range(len(colunas)))}
+        FROM g f{joins}
+        ORDER BY {', '.join(f'f._k{i}{direcao}' for i in range(len(colunas)))}
+    """
+    con = conectar_duckdb("dashboard")
+    try:
+        df = con.execute(sql, parametros).df()
+    finally:
+        con.close()
+
+    # A linha extra só indica que há próxima página; o cursor é a chave da última exibida
+    chaves = [f"_k{i}" for i in range(len(colunas))]
+    proximo = None
+    if len(df) > tamanho:
+        df = df.iloc[:tamanho]
+        proximo = tuple(v.item() if hasattr(v, "item") else v for v in df[chaves].iloc[-1])
+    return df.drop(columns=chaves), proximo
+
+
+if __name__ == "__main__":
+    from src.utils.snapshots import snapshot_atual
+
+    parser = argparse.ArgumentParser(description="Itens de pedido da Gold página a página (keyset)")
+    parser.add_argument("--cidade", dest="cliente_cidade", nargs="+")
+    parser.add_argument("--categoria", nargs="+")
+    parser.add_argument("--status-entrega", dest="status_entrega", nargs="+")
+    parser.add_argument("--ordem", choices=list(ORDENACOES), default="data")
+    parser.add_argument("--desc", action="store_true", help="Ordem decrescente")
+    parser.add_argument("--paginas", type=int, default=1, help="Quantas páginas percorrer")
+    args = parser.parse_args()
+
+    gold_dir = snapshot_atual("data/gold")
+    if not tem_chave_paginacao(gold_dir):
+        print("❌ fact_vendas sem seq_item: execute o pipeline Gold novamente.")
+        sys.exit(1)
+
+    filtros = {c: getattr(args, c) for c in ("cliente_cidade", "categoria", "status_entrega") if getattr(args, c)}
+    cursor = None
+    for numero in range(1, args.paginas + 1):
+        pagina, cursor = pagina_itens(gold_dir, filtros, args.ordem, args.desc, cursor)
+        print(f"\n📄 Página {numero} ({len(pagina)} itens)")
+        print(pagina.to_string(index=False))
+        if cursor is None:
+            break
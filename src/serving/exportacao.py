@@ -0,0 +1,176 @@
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+
+# pasta raiz ao caminho de busca do Python (permite executar o módulo diretamente)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.analysis.business_kpis import montar_origem
+from src.transform.gold_layer import GERAR_DIM_HORARIO
+from src.utils.helpers import conectar_duckdb
+
+# Colunas do extrato em nível de item de pedido (fato + todas as dimensões);
+# id_horario só existe na fato quando a Gold gera a dim_horario
+COLUNAS_EXPORTACAO = [
+    "f.id_pedido_original AS pedido",
+    "t.data_completa AS data",
+    *(["f.id_horario AS horario"] if GERAR_DIM_HORARIO else []),
+    "p.categoria",
+    "p.nome_produto AS produto",
+    "c.cliente_pais",
+    "c.cliente_estado",
+    "c.cliente_cidade",
+    "l.modo_envio",
+    "l.status_entrega",
+    "f.dias_envio_real",
+    "l.dias_envio_agendado",
+    "f.valor_venda",
+    "f.lucro_pedido",
+    "f.brent_diario",
+]
+
+# formato -> (opções do COPY, extensão, mimetype)
+FORMATOS = {
+    "csv": ("FORMAT csv, HEADER true", "csv", "text/csv"),
+    "parquet": ("FORMAT parquet, COMPRESSION zstd, ROW_GROUP_SIZE 122880", "parquet", "application/vnd.apache.parquet"),
+    "xlsx": ("FORMAT xlsx, HEADER true", "xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+}
+
+# Limite de linhas de uma planilha do Excel (cabeçalho incluso)
+MAX_LINHAS_XLSX = 1_048_575
+
+# Exportações simultâneas no processo: as demais esperam a vez em vez de disputar memória
+CONCORRENCIA = int(os.getenv("EXPORTACAO_CONCORRENCIA", "2"))
+TAMANHO_BLOCO = 1024 * 1024
+DIRETORIO_TMP = "data/tmp/exportacoes"
+
+_vagas = threading.BoundedSemaphore(CONCORRENCIA)
+
+
+class ExportacaoIndisponivel(RuntimeError):
+    """Formato não suportado neste ambiente (ex.: extensão excel do DuckDB ausente)."""
+
+
+def montar_exportacao(gold_dir, filtros=None):
+    """
+    SELECT do extrato com os mesmos joins e filtros do catálogo de KPIs.
+    Sem ORDER BY de propósito: um sort global obrigaria o DuckDB a reter o resultado inteiro;
+    com preserve_insertion_order (padrão) as linhas saem na ordem física da fato (id_tempo).
+    Retorna (sql, parametros).
+    """
+    origem, parametros = montar_origem(gold_dir, {"p", "l", "c", "t"}, filtros)
+    colunas = ",\n            ".join(COLUNAS_EXPORTACAO)
+    return f"""
+        SELECT
+            {colunas}
+        FROM {origem}
+    """, parametros
+
+
+def contar_linhas(gold_dir, filtros=None):
+    """Quantidade de itens que o extrato terá (só joins exigidos pelos filtros)."""
+    origem, parametros = montar_origem(gold_dir, set(), filtros)
+    con = conectar_duckdb("dashboard")
+    try:
+        return con.execute(f"SELECT COUNT(*) FROM {origem}", parametros).fetchone()[0]
+    finally:
+        con.close()
+
+
+def _carregar_excel(con):
+    """Extensão excel do DuckDB (COPY ... FORMAT xlsx); tenta instalar uma vez se faltar."""
+    try:
+        con.execute("LOAD excel")
+    except Exception:
+        try:
+            con.execute("INSTALL excel")
+            con.execute("LOAD excel")
+        except Exception as e:
+            raise ExportacaoIndisponivel(f"Exportação Excel indisponível (extensão excel do DuckDB): {e}") from e
+
+
+def excel_disponivel():
+    con = conectar_duckdb("dashboard")
+    try:
+        _carregar_excel(con)
+        return True
+    except ExportacaoIndisponivel:
+        return False
+    finally:
+        con.close()
+
+
+def exportar_arquivo(gold_dir, filtros, formato, destino):
+    """
+    Grava o extrato em `destino` com COPY: o DuckDB lê a Gold e escreve o arquivo em blocos,
+    dentro do teto de memória do perfil "dashboard" — o resultado nunca vira DataFrame.
+    """
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato inválido: {formato} (opções: {', '.join(FORMATOS)})")
+    sql, parametros = montar_exportacao(gold_dir, filtros)
+
+    with _vagas:
+        con = conectar_duckdb("dashboard")
+        try:
+            if formato == "xlsx":
+                _carregar_excel(con)
+                if contar_linhas(gold_dir, filtros) > MAX_LINHAS_XLSX:
+                    raise ExportacaoIndisponivel(
+                        f"Extrato maior que o limite do Excel ({MAX_LINHAS_XLSX:,} linhas): use CSV ou Parquet"
+                    )
+            con.execute(f"COPY ({sql}) TO '{destino}' ({FORMATOS[formato][0]})", parametros)
+        finally:
+            con.close()
+    return destino
+
+
+def blocos_exportacao(gold_dir, filtros, formato, tamanho=TAMANHO_BLOCO):
+    """
+    Gerador de blocos de bytes do extrato: o COPY grava em um arquivo temporário em disco
+    e o conteúdo é repassado em pedaços de `tamanho`. O temporário é removido ao final,
+    inclusive se o consumidor abandonar o gerador no meio.
+    """
+    os.makedirs(DIRETORIO_TMP, exist_ok=True)
+    pasta = tempfile.mkdtemp(prefix="exportacao_", dir=DIRETORIO_TMP)
+    try:
+        arquivo = exportar_arquivo(gold_dir, filtros, formato, os.path.join(pasta, f"extrato.{FORMATOS[formato][1]}"))
+        with open(arquivo, "rb") as f:
+            while bloco := f.read(tamanho):
+                yield bloco
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+
+
+def nome_arquivo(formato, versao=None):
+    """Nome sugerido para o download (inclui a versão da Gold quando houver)."""
+    return f"pedidos_{versao or 'gold'}.{FORMATOS[formato][1]}"
+
+
+if __name__ == "__main__":
+    from src.utils.snapshots import snapshot_atual
+
+    parser = argparse.ArgumentParser(description="Extrato de itens de pedido da Gold publicada")
+    parser.add_argument("destino", help="Arquivo de saída (.csv, .parquet ou .xlsx)")
+    parser.add_argument("--categoria", nargs="+")
+    parser.add_argument("--modo-envio", dest="modo_envio", nargs="+")
+    parser.add_argument("--status-entrega", dest="status_entrega", nargs="+")
+    parser.add_argument("--cliente-pais", dest="cliente_pais", nargs="+")
+    parser.add_argument("--de", type=int, help="id_tempo inicial (yyyymmdd)")
+    parser.add_argument("--ate", type=int, help="id_tempo final (yyyymmdd)")
+    args = parser.parse_args()
+
+    formato = os.path.splitext(args.destino)[1].lstrip(".").lower()
+    filtros = {
+        chave: valor for chave, valor in vars(args).items()
+        if chave != "destino" and valor is not None
+    }
+    gold_dir = snapshot_atual("data/gold")
+    try:
+        exportar_arquivo(gold_dir, filtros, formato, args.destino)
+    except (ValueError, ExportacaoIndisponivel) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print(f"📥 {contar_linhas(gold_dir, filtros):,} itens exportados para {args.destino}")
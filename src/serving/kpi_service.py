@@ -0,0 +1,308 @@
+import datetime
+import hashlib
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# pasta raiz ao caminho de busca do Python (permite executar o módulo diretamente)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.analysis.business_kpis import AGRUPAMENTOS, DIMENSOES, KPIS, montar_origem, montar_query
+from src.analysis.lead_time import METRICAS_LEAD_TIME, SEGMENTOS_LEAD_TIME, quantis_lead_time
+from src.serving.exportacao import FORMATOS, ExportacaoIndisponivel, blocos_exportacao, nome_arquivo
+from src.utils.helpers import conectar_duckdb
+from src.utils.manifest import ler_manifesto
+from src.utils.snapshots import snapshot_atual, versao_atual
+
+GOLD_ROOT = "data/gold"
+HOST = os.getenv("KPI_SERVICE_HOST", "127.0.0.1")
+PORTA = int(os.getenv("KPI_SERVICE_PORT", "8502"))
+
+# Resultados mantidos em memória (LRU) por versão da Gold + consulta normalizada
+CACHE_MAX = int(os.getenv("KPI_SERVICE_CACHE_MAX", "256"))
+
+# Granularidades da série temporal -> unidade do date_trunc (mesmos rótulos do dashboard)
+GRANULARIDADES_SQL = {"Dia": "day", "Semana": "week", "Mês": "month"}
+
+
+class ErroParametro(ValueError):
+    """Parâmetro de consulta inválido (vira HTTP 400)."""
+
+
+class RecursoAusente(LookupError):
+    """Tabela que o snapshot publicado não tem (vira HTTP 404)."""
+
+
+class CacheResultados:
+    """
+    Cache LRU thread-safe de respostas já serializadas.
+    Quando a versão publicada da Gold muda, as entradas antigas são descartadas de uma vez.
+    """
+
+    def __init__(self, maximo=CACHE_MAX):
+        self.maximo = maximo
+        self.versao = None
+        self.entradas = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def obter(self, versao, chave, calcular):
+        with self._lock:
+            if versao != self.versao:
+                self.entradas.clear()
+                self.versao = versao
+            if chave in self.entradas:
+                self.entradas.move_to_end(chave)
+                self.hits += 1
+                return self.entradas[chave]
+
+        # Calcula fora do lock: consultas diferentes não se bloqueiam
+        corpo = calcular()
+        entrada = (corpo, f'"{hashlib.sha1(corpo).hexdigest()}"')
+
+        with self._lock:
+            self.misses += 1
+            if versao == self.versao:
+                self.entradas[chave] = entrada
+                while len(self.entradas) > self.maximo:
+                    self.entradas.popitem(last=False)
+        return entrada
+
+    def estatisticas(self):
+        with self._lock:
+            return {"entradas": len(self.entradas), "hits": self.hits, "misses": self.misses, "versao": self.versao}
+
+
+cache = CacheResultados()
+
+
+def _lista(params, nome, permitidos=None):
+    """Valores de um parâmetro repetível (?x=a&x=b ou ?x=a,b), validados contra a lista permitida."""
+    valores = [v for bruto in params.get(nome, []) for v in bruto.split(",") if v]
+    invalidos = [v for v in valores if permitidos is not None and v not in permitidos]
+    if invalidos:
+        raise ErroParametro(f"{nome} inválido: {', '.join(invalidos)} (opções: {', '.join(permitidos)})")
+    return valores
+
+
+def _data(params, nome):
+    """Data ISO (YYYY-MM-DD) -> id_tempo inteiro yyyymmdd, ou None."""
+    valor = params.get(nome, [None])[-1]
+    if valor is None:
+        return None
+    try:
+        return int(datetime.date.fromisoformat(valor).strftime("%Y%m%d"))
+    except ValueError:
+        raise ErroParametro(f"{nome} deve estar no formato YYYY-MM-DD")
+
+
+def _filtros(params):
+    """Filtros comuns aos endpoints: colunas de dimensão (repetíveis) + intervalo de datas."""
+    filtros = {}
+    for coluna in DIMENSOES:
+        valores = _lista(params, coluna)
+        if valores:
+            if coluna in ("ano", "mes"):
+                try:
+                    valores = [int(v) for v in valores]
+                except ValueError:
+                    raise ErroParametro(f"{coluna} deve ser inteiro")
+            filtros[coluna] = valores
+    for limite in ("de", "ate"):
+        id_tempo = _data(params, limite)
+        if id_tempo is not None:
+            filtros[limite] = id_tempo
+    return filtros
+
+
+def _executar(sql, parametros):
+    """Executa no perfil de leitura do dashboard e devolve lista de dicts."""
+    con = conectar_duckdb("dashboard")
+    try:
+        cursor = con.execute(sql, parametros)
+        colunas = [c[0] for c in cursor.description]
+        return [dict(zip(colunas, linha)) for linha in cursor.fetchall()]
+    finally:
+        con.close()
+
+
+def consultar_kpis(gold_dir, params):
+    """GET /kpis?kpis=a,b&agrupamento=categoria&<filtros> — KPIs do catálogo em uma varredura."""
+    kpis = _lista(params, "kpis", list(KPIS)) or list(KPIS)
+    agrupamentos = _lista(params, "agrupamento", list(AGRUPAMENTOS)) or ["total"]
+    sql, parametros = montar_query(gold_dir, kpis, agrupamentos, _filtros(params))
+    return _executar(sql + " ORDER BY agrupamento", parametros)
+
+
+def consultar_serie(gold_dir, params):
+    """GET /serie?granularidade=Semana&<filtros> — Vendas vs Brent, como a timeline do dashboard."""
+    granularidade = params.get("granularidade", ["Dia"])[-1]
+    if granularidade not in GRANULARIDADES_SQL:
+        raise ErroParametro(f"granularidade inválida (opções: {', '.join(GRANULARIDADES_SQL)})")
+
+    # Mesmos joins e filtros do catálogo; o calendário sempre entra para a data
+    origem, parametros = montar_origem(gold_dir, {"t"}, _filtros(params))
+
+    return _executar(f"""
+        SELECT
+            CAST(date_trunc('{GRANULARIDADES_SQL[granularidade]}', t.data_completa) AS DATE) AS data,
+            ROUND(SUM(f.valor_venda), 2) AS valor_venda,
+            ROUND(AVG(f.brent_diario), 2) AS preco_petroleo_brent
+        FROM {origem}
+        GROUP BY 1
+        ORDER BY 1
+    """, parametros)
+
+
+def consultar_lead_time(gold_dir, params):
+    """GET /lead_time?segmento=pedido_regiao&metrica=atraso&de=...&ate=... — p50/p90/p99 do sketch diário."""
+    segmento = (_lista(params, "segmento", SEGMENTOS_LEAD_TIME) or ["modo_envio"])[-1]
+    metrica = (_lista(params, "metrica", list(METRICAS_LEAD_TIME)) or ["lead_time"])[-1]
+    resultado = quantis_lead_time(gold_dir, segmento, metrica, _data(params, "de"), _data(params, "ate"))
+    if resultado is None:
+        raise RecursoAusente("Snapshot publicado não tem agg_lead_time_diario: execute o pipeline Gold")
+    return resultado.to_dict(orient="records")
+
+
+def consultar_catalogo(gold_dir, params):
+    """GET /catalogo — KPIs, agrupamentos e filtros aceitos."""
+    return {
+        "kpis": {nome: descricao for nome, (_, descricao) in KPIS.items()},
+        "agrupamentos": AGRUPAMENTOS,
+        "filtros": list(DIMENSOES) + ["de", "ate"],
+        "granularidades": list(GRANULARIDADES_SQL),
+        "lead_time": {"segmentos": SEGMENTOS_LEAD_TIME, "metricas": list(METRICAS_LEAD_TIME)},
+        "exportar": list(FORMATOS),
+    }
+
+
+ROTAS = {
+    "/kpis": consultar_kpis,
+    "/serie": consultar_serie,
+    "/lead_time": consultar_lead_time,
+    "/catalogo": consultar_catalogo,
+}
+
+
+class KPIHandler(BaseHTTPRequestHandler):
+    """Somente leitura: GET/HEAD em JSON, com ETag e If-None-Match."""
+
+    server_version = "SupplyChainKPI/1.0"
+
+    def _responder(self, status, corpo=b"", etag=None, versao=None):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(corpo)))
+        # Clientes podem guardar a resposta, mas devem revalidar (barato: 304 sem corpo)
+        self.send_header("Cache-Control", "no-cache")
+        if etag:
+            self.send_header("ETag", etag)
+        if versao:
+            self.send_header("X-Gold-Version", versao)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(corpo)
+
+    def _erro(self, status, mensagem):
+        self._responder(status, json.dumps({"erro": mensagem}, ensure_ascii=False).encode("utf-8"))
+
+    def _exportar(self, gold_dir, versao, params):
+        """
+        GET /exportar?formato=csv&<filtros> — extrato de itens de pedido, fora do cache.
+        Corpo sem Content-Length (HTTP/1.0: termina ao fechar a conexão), escrito em blocos
+        do arquivo gerado pelo DuckDB: nem o serviço nem o cliente precisam do extrato inteiro em memória.
+        """
+        formato = params.get("formato", ["csv"])[-1]
+        if formato not in FORMATOS:
+            return self._erro(400, f"formato inválido (opções: {', '.join(FORMATOS)})")
+        try:
+            blocos = blocos_exportacao(gold_dir, _filtros(params), formato)
+            # O primeiro bloco só sai depois do COPY: erros de consulta ainda viram 4xx/5xx
+            primeiro = next(blocos, b"")
+        except ErroParametro as e:
+            return self._erro(400, str(e))
+        except ExportacaoIndisponivel as e:
+            return self._erro(501, str(e))
+        except Exception as e:
+            return self._erro(500, f"Falha na exportação: {e}")
+
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", FORMATOS[formato][2])
+            self.send_header("Content-Disposition", f'attachment; filename="{nome_arquivo(formato, versao)}"')
+            self.send_header("X-Gold-Version", versao)
+            self.end_headers()
+            if self.command != "HEAD":
+                self.wfile.write(primeiro)
+                for bloco in blocos:
+                    self.wfile.write(bloco)
+        finally:
+            blocos.close()
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = parse_qs(url.query)
+
+        # Versão resolvida UMA vez por requisição: a consulta inteira lê o mesmo snapshot
+        gold_dir = snapshot_atual(GOLD_ROOT)
+        versao = os.path.basename(gold_dir) if gold_dir != GOLD_ROOT else "legado"
+
+        if url.path == "/health":
+            manifesto = ler_manifesto(gold_dir) or {}
+            corpo = {"status": "ok", "versao": versao, "gerado_em": manifesto.get("gerado_em"), "cache": cache.estatisticas()}
+            return self._responder(200, json.dumps(corpo, ensure_ascii=False).encode("utf-8"), versao=versao)
+
+        if url.path == "/exportar":
+            return self._exportar(gold_dir, versao, params)
+
+        rota = ROTAS.get(url.path)
+        if rota is None:
+            return self._erro(404, f"Endpoint inexistente: {url.path} (disponíveis: {', '.join(ROTAS)}, /exportar, /health)")
+
+        # Chave normalizada: ordem dos parâmetros não gera entradas duplicadas
+        chave = (url.path, tuple(sorted((k, tuple(v)) for k, v in params.items())))
+
+        def calcular():
+            resultado = rota(gold_dir, params)
+            return json.dumps(
+                {"versao": versao, "dados": resultado}, ensure_ascii=False, default=str
+            ).encode("utf-8")
+
+        try:
+            corpo, etag = cache.obter(versao, chave, calcular)
+        except ErroParametro as e:
+            return self._erro(400, str(e))
+        except RecursoAusente as e:
+            return self._erro(404, str(e))
+        except Exception as e:
+            return self._erro(500, f"Falha na consulta: {e}")
+
+        if etag in (self.headers.get("If-None-Match") or ""):
+            return self._responder(304, etag=etag, versao=versao)
+        self._responder(200, corpo, etag=etag, versao=versao)
+
+    do_HEAD = do_GET
+
+    def log_message(self, formato, *args):
+        print(f"🌐 {self.address_string()} {formato % args}")
+
+
+def iniciar_servico(host=HOST, porta=PORTA):
+    """Sobe o serviço HTTP de KPIs (uma thread por requisição, cache compartilhado no processo)."""
+    servidor = ThreadingHTTPServer((host, porta), KPIHandler)
+    print(f"🚀 Serviço de KPIs em http://{host}:{porta} (Gold: {versao_atual(GOLD_ROOT) or GOLD_ROOT})")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        print("\n🛑 Serviço encerrado.")
+    finally:
+        servidor.server_close()
+
+
+if __name__ == "__main__":
+    iniciar_servico()
@@ -0,0 +1,380 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+# pasta raiz ao caminho de busca do Python (permite executar o módulo diretamente)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.utils.helpers import conectar_duckdb, opcoes_parquet_duckdb
+from src.utils.manifest import escrever_manifesto
+from src.utils.snapshots import novo_snapshot, publicar_snapshot, descartar_snapshot, snapshot_atual
+
+OUTPUT_GOLD_DIR = "data/gold"
+TABELA_ANOMALIAS = "agg_anomalias"
+TABELA_ESTADO = "agg_anomalias_estado"  # Estatísticas móveis por segmento (publicadas junto com as anomalias)
+
+# Gera as anomalias ao final do build da Gold
+GERAR_ANOMALIAS = True
+
+# Média e variância móveis exponenciais (EWMA): janela efetiva de N dias, atualização O(1) por dia
+JANELA_DIAS = int(os.getenv("ANOMALIAS_JANELA_DIAS", "28"))
+LIMIAR_Z = float(os.getenv("ANOMALIAS_LIMIAR_Z", "3"))
+AQUECIMENTO_DIAS = 14      # Dias observados antes de um segmento poder gerar alerta
+MIN_VENDAS_DIA = 100.0     # Vendas médias mínimas ($/dia) para alertar sobre o segmento
+MIN_ITENS_DIA = 5          # Itens mínimos no dia para alertar sobre a taxa de atraso
+DESVIO_MIN_VENDAS = 0.1    # Piso do desvio: 10% da média (evita z infinito em séries estáveis)
+DESVIO_MIN_ATRASO = 0.05   # Piso do desvio da taxa de atraso (5 p.p.)
+
+COLUNAS_ESTADO = ["media_vendas", "var_vendas", "n_vendas", "media_atraso", "var_atraso", "n_atraso"]
+# Colunas da fato que entram na assinatura do histórico (id_tempo primeiro: é a de poda)
+COLUNAS_ASSINATURA = ["id_tempo", "id_produto", "id_cliente", "id_logistica", "valor_venda"]
+
+
+def _config():
+    """Mudar janela/limiares invalida o estado: o histórico é reprocessado do zero."""
+    config = [JANELA_DIAS, LIMIAR_Z, AQUECIMENTO_DIAS, MIN_VENDAS_DIA, MIN_ITENS_DIA, DESVIO_MIN_VENDAS, DESVIO_MIN_ATRASO]
+    return hashlib.sha1(json.dumps(config).encode()).hexdigest()[:12]
+
+
+def assinatura_fato(con, gold_dir, ate):
+    """
+    Impressão digital do histórico da fato até `ate` (id_tempo): linhas, nulos e min/max
+    das COLUNAS_ASSINATURA. Row groups inteiramente anteriores ao corte entram pelo rodapé
+    do Parquet; só os que cruzam `ate` (ou sem estatísticas) são lidos, e o filtro por
+    id_tempo poda o resto. Não depende de onde caem os limites dos row groups.
+    Impacto: detecta dias com linhas a mais ou a menos e a maioria das correções de valor
+    sem varrer a fato; o que escapar é coberto por --reprocessar.
+    """
+    path = f"{gold_dir}/fact_vendas.parquet"
+    meta = pq.ParquetFile(path).metadata
+    indices = {meta.schema.column(i).name: i for i in range(meta.num_columns)}
+
+    def faixa(grupo):
+        stats = grupo.column(indices["id_tempo"]).statistics
+        if stats is None or not stats.has_min_max or stats.null_count:
+            return None
+        return stats.min, stats.max
+
+    grupos = [meta.row_group(rg) for rg in range(meta.num_row_groups)]
+    faixas = [faixa(g) for g in grupos]
+    # Corte: primeiro dia lido dos dados. Nenhum row group pode ficar dividido por ele
+    # (parte no rodapé, parte na consulta): desce até o início de quem o atravessa
+    corte = ate + 1
+    while True:
+        menor = min((f[0] if f else 0 for f in faixas if f is None or f[0] < corte <= f[1]), default=corte)
+        if menor == corte:
+            break
+        corte = menor
+
+    linhas, nulos = 0, dict.fromkeys(COLUNAS_ASSINATURA, 0)
+    minimos, maximos = dict.fromkeys(COLUNAS_ASSINATURA), dict.fromkeys(COLUNAS_ASSINATURA)
+    for grupo, f in zip(grupos, faixas):
+        if f is None or f[1] >= corte:
+            continue
+        linhas += grupo.num_rows
+        for coluna in COLUNAS_ASSINATURA:
+            stats = grupo.column(indices[coluna]).statistics
+            nulos[coluna] += stats.null_count
+            if stats.has_min_max:
+                minimos[coluna] = stats.min if minimos[coluna] is None else min(minimos[coluna], stats.min)
+                maximos[coluna] = stats.max if maximos[coluna] is None else max(maximos[coluna], stats.max)
+
+    # Row groups a partir do corte: agregados lidos com poda por id_tempo
+    resto = con.execute(f"""
+        SELECT COUNT(*),
+            {", ".join(f"COUNT(*) - COUNT({c}), MIN({c}), MAX({c})" for c in COLUNAS_ASSINATURA)}
+        FROM read_parquet('{path}')
+        WHERE id_tempo BETWEEN ? AND ?
+    """, [corte, ate]).fetchone()
+    linhas += resto[0]
+    for k, coluna in enumerate(COLUNAS_ASSINATURA):
+        n, menor, maior = resto[1 + 3 * k: 4 + 3 * k]
+        nulos[coluna] += n
+        if menor is not None:
+            minimos[coluna] = menor if minimos[coluna] is None else min(minimos[coluna], menor)
+            maximos[coluna] = maior if maximos[coluna] is None else max(maximos[coluna], maior)
+
+    return hashlib.sha1(json.dumps([linhas, nulos, minimos, maximos], default=str).encode()).hexdigest()[:16]
+
+
+def carregar_dias(con, gold_dir, desde):
+    """
+    Vendas, itens e itens atrasados por dia para categorias e cidades, só dos dias
+    posteriores a `desde` (id_tempo). A fato é ordenada por id_tempo: os row groups
+    já processados são pulados pelas estatísticas do Parquet, sem reler o histórico.
+    """
+    return con.execute(f"""
+        SELECT
+            f.id_tempo,
+            CASE WHEN GROUPING(p.categoria) = 0 THEN 'categoria' ELSE 'cidade' END AS tipo_segmento,
+            CASE WHEN GROUPING(p.categoria) = 0 THEN p.categoria
+                 ELSE c.cliente_cidade || ', ' || c.cliente_pais END AS segmento,
+            SUM(f.valor_venda) AS vendas,
+            COUNT(*) AS itens,
+            COUNT(*) FILTER (WHERE l.status_entrega = 'Late delivery') AS atrasados
+        FROM read_parquet('{gold_dir}/fact_vendas.parquet') f
+        JOIN read_parquet('{gold_dir}/dim_produtos.parquet') p ON f.id_produto = p.id_produto
+        JOIN read_parquet('{gold_dir}/dim_clientes.parquet') c ON f.id_cliente = c.id_cliente
+        LEFT JOIN read_parquet('{gold_dir}/dim_logistica.parquet') l ON f.id_logistica = l.id_logistica
+        WHERE f.id_tempo > ?
+        GROUP BY GROUPING SETS ((f.id_tempo, p.categoria), (f.id_tempo, c.cliente_cidade, c.cliente_pais))
+        ORDER BY f.id_tempo
+    """, [desde]).df()
+
+
+def ler_anterior(gold_root=OUTPUT_GOLD_DIR):
+    """(estado, anomalias) publicados na versão atual da Gold, ou (None, None)."""
+    gold_dir = snapshot_atual(gold_root)
+    estado_path = os.path.join(gold_dir, f"{TABELA_ESTADO}.parquet")
+    anomalias_path = os.path.join(gold_dir, f"{TABELA_ANOMALIAS}.parquet")
+    if not (os.path.exists(estado_path) and os.path.exists(anomalias_path)):
+        return None, None
+    return pd.read_parquet(estado_path), pd.read_parquet(anomalias_path)
+
+
+def processar_dias(estado, novos, desde=0):
+    """
+    Percorre os dias novos em ordem. A cada dia, TODOS os segmentos são avaliados e
+    atualizados de uma vez (arrays numpy): z-score contra a média/variância móveis
+    anteriores ao dia e, em seguida, a atualização EWMA O(1):
+
+        d = x - média;  média += λ·d;  variância = (1 - λ)·(variância + λ·d²)
+
+    O calendário começa no dia seguinte a `desde` (último dia já processado): dias
+    sem nenhuma venda também contam, como vendas zero.
+    Retorna (novo estado, anomalias detectadas).
+    """
+    chaves = pd.concat([estado[["tipo_segmento", "segmento"]], novos[["tipo_segmento", "segmento"]]])
+    chaves = chaves.drop_duplicates().sort_values(["tipo_segmento", "segmento"], ignore_index=True)
+    estado = (
+        chaves.merge(estado, on=["tipo_segmento", "segmento"], how="left")
+        .fillna({c: 0 for c in COLUNAS_ESTADO})
+    )
+    media_v, var_v, n_v, media_a, var_a, n_a = (estado[c].to_numpy(dtype=np.float64).copy() for c in COLUNAS_ESTADO)
+
+    indice = pd.MultiIndex.from_frame(chaves).get_indexer(pd.MultiIndex.from_frame(novos[["tipo_segmento", "segmento"]]))
+    dias_linha = novos["id_tempo"].to_numpy()
+    vendas_linha = novos["vendas"].to_numpy(dtype=np.float64)
+    itens_linha = novos["itens"].to_numpy(dtype=np.float64)
+    atrasados_linha = novos["atrasados"].to_numpy(dtype=np.float64)
+
+    lam = 2 / (JANELA_DIAS + 1)
+    n = len(chaves)
+    inicio_cal = pd.to_datetime(str(dias_linha.min()), format="%Y%m%d")
+    if desde:
+        inicio_cal = min(inicio_cal, pd.to_datetime(str(desde), format="%Y%m%d") + pd.Timedelta(days=1))
+    fim_cal = pd.to_datetime(str(dias_linha.max()), format="%Y%m%d")
+    calendario = pd.date_range(inicio_cal, fim_cal, freq="D")
+    ids_calendario = calendario.strftime("%Y%m%d").astype(int).to_numpy()
+    cortes = np.searchsorted(dias_linha, ids_calendario, side="left")
+    cortes = np.append(cortes, len(dias_linha))
+
+    anomalias = []
+    for i, id_tempo in enumerate(ids_calendario):
+        linhas = slice(cortes[i], cortes[i + 1])
+        vendas, itens, atrasados = np.zeros(n), np.zeros(n), np.zeros(n)
+        vendas[indice[linhas]] = vendas_linha[linhas]
+        itens[indice[linhas]] = itens_linha[linhas]
+        atrasados[indice[linhas]] = atrasados_linha[linhas]
+
+        # ---- Vendas: alta ou queda contra o nível recente do segmento ----
+        ativo = (n_v > 0) | (vendas > 0)  # Segmento entra na primeira venda
+        desvio = np.maximum(np.sqrt(var_v), DESVIO_MIN_VENDAS * media_v)
+        z = np.divide(vendas - media_v, desvio, out=np.zeros(n), where=desvio > 0)
+        alerta = ativo & (n_v >= AQUECIMENTO_DIAS) & (media_v >= MIN_VENDAS_DIA) & (np.abs(z) >= LIMIAR_Z)
+        if alerta.any():
+            anomalias.append(pd.DataFrame({
+                "id_tempo": id_tempo, "metrica": "vendas", "posicao": np.flatnonzero(alerta),
+                "valor": vendas[alerta], "esperado": media_v[alerta], "desvio": desvio[alerta],
+                "z_score": z[alerta], "itens": itens[alerta],
+            }))
+
+        primeiro = ativo & (n_v == 0)
+        d = vendas - media_v
+        media_v = np.where(primeiro, vendas, np.where(ativo, media_v + lam * d, media_v))
+        var_v = np.where(ativo & ~primeiro, (1 - lam) * (var_v + lam * d ** 2), var_v)
+        n_v += ativo
+
+        # ---- Taxa de atraso: só altas (piora), só em dias com itens ----
+        com_itens = itens > 0
+        taxa = np.divide(atrasados, itens, out=np.zeros(n), where=com_itens)
+        # Piso binomial: com poucos itens no dia a taxa oscila naturalmente
+        ruido = np.sqrt(np.clip(media_a * (1 - media_a), 0, None) / np.maximum(itens, 1))
+        desvio = np.maximum.reduce([np.sqrt(var_a), ruido, np.full(n, DESVIO_MIN_ATRASO)])
+        z = (taxa - media_a) / desvio
+        alerta = com_itens & (itens >= MIN_ITENS_DIA) & (n_a >= AQUECIMENTO_DIAS) & (z >= LIMIAR_Z)
+        if alerta.any():
+            anomalias.append(pd.DataFrame({
+                "id_tempo": id_tempo, "metrica": "taxa_atraso", "posicao": np.flatnonzero(alerta),
+                "valor": taxa[alerta], "esperado": media_a[alerta], "desvio": desvio[alerta],
+                "z_score": z[alerta], "itens": itens[alerta],
+            }))
+
+        primeiro = com_itens & (n_a == 0)
+        d = taxa - media_a
+        media_a = np.where(primeiro, taxa, np.where(com_itens, media_a + lam * d, media_a))
+        var_a = np.where(com_itens & ~primeiro, (1 - lam) * (var_a + lam * d ** 2), var_a)
+        n_a += com_itens
+
+    novo_estado = chaves.assign(
+        media_vendas=media_v, var_vendas=var_v, n_vendas=n_v,
+        media_atraso=media_a, var_atraso=var_a, n_atraso=n_a,
+        ultimo_id_tempo=int(ids_calendario[-1]), config=_config(),
+    )
+
+    if not anomalias:
+        return novo_estado, None
+    detectadas = pd.concat(anomalias, ignore_index=True)
+    segmentos = chaves.iloc[detectadas.pop("posicao")].reset_index(drop=True)
+    detectadas = pd.concat([detectadas[["id_tempo"]], segmentos, detectadas.drop(columns="id_tempo")], axis=1)
+    detectadas["direcao"] = np.where(detectadas["z_score"] > 0, "alta", "queda")
+    return novo_estado, detectadas
+
+
+def create_gold_anomalies(gold_dir=None, reprocessar=False):
+    """
+    Detecção de anomalias em vendas diárias e taxa de atraso por categoria e cidade.
+
+    Incremental: parte do estado publicado na Gold (agg_anomalias_estado) e processa só os
+    dias posteriores ao último já visto; o estado e o histórico de anomalias (agg_anomalias)
+    são gravados no mesmo snapshot, então são publicados (ou descartados) juntos.
+    O estado guarda a assinatura da fato até o último dia processado: se a Gold foi
+    reconstruída com outro histórico, tudo é reprocessado.
+    reprocessar=True recalcula todo o histórico.
+
+    gold_dir: snapshot de destino já aberto (build_gold). Sem ele, cria um snapshot
+    herdando as tabelas publicadas e o publica ao final.
+    """
+    if not GERAR_ANOMALIAS:
+        return True
+
+    print("\n🚨 Detectando anomalias (vendas e atrasos por categoria e cidade)...")
+    inicio_build = time.perf_counter()
+    estado, historico = (None, None) if reprocessar else ler_anterior()
+    publicar = gold_dir is None
+    gold_dir = gold_dir or novo_snapshot(OUTPUT_GOLD_DIR, herdar=True)
+    con = conectar_duckdb("pipeline")
+
+    try:
+        ultimo_dia = con.execute(f"SELECT MAX(id_tempo) FROM read_parquet('{gold_dir}/fact_vendas.parquet')").fetchone()[0]
+        if ultimo_dia is None:
+            print("⚠️ Aviso: fact_vendas vazia. Anomalias ignoradas.")
+            return True
+
+        # O estado só vale se a fato ainda tem exatamente o histórico que o gerou
+        ate_estado = int(estado["ultimo_id_tempo"].iloc[0]) if estado is not None and not estado.empty else 0
+        historico_atual = assinatura_fato(con, gold_dir, ate_estado)
+        valido = (
+            estado is not None and not estado.empty
+            and (estado["config"] == _config()).all()
+            and ate_estado <= ultimo_dia
+            and "assinatura_fato" in estado.columns
+            and (estado["assinatura_fato"] == historico_atual).all()
+        )
+        if not valido:
+            if estado is not None:
+                print("   ♻️ Estado anterior incompatível (configuração, período ou histórico da fato): reprocessando o histórico")
+            estado = pd.DataFrame(columns=["tipo_segmento", "segmento"] + COLUNAS_ESTADO)
+            historico = None
+        desde = int(estado["ultimo_id_tempo"].iloc[0]) if valido else 0
+
+        novos = carregar_dias(con, gold_dir, desde)
+        detectadas = None
+        if novos.empty:
+            print(f"   ✅ Nenhum dia novo desde {desde} (estado reaproveitado)")
+        else:
+            print(f"   📊 {novos['id_tempo'].nunique():,} dias novos, {len(novos):,} linhas dia/segmento")
+            estado, detectadas = processar_dias(estado, novos, desde)
+        # Cobre todos os dias da fato: é o histórico que o próximo build deve encontrar
+        estado = estado.assign(assinatura_fato=assinatura_fato(con, gold_dir, ultimo_dia))
+
+        # Histórico publicado + anomalias dos dias novos (tabela vazia mantém o esquema)
+        partes = [h for h in (historico, detectadas) if h is not None and not h.empty]
+        anomalias = pd.concat(partes, ignore_index=True) if partes else pd.DataFrame({
+            "id_tempo": pd.Series(dtype="int64"), "tipo_segmento": pd.Series(dtype="object"),
+            "segmento": pd.Series(dtype="object"), "metrica": pd.Series(dtype="object"),
+            "valor": pd.Series(dtype="float64"), "esperado": pd.Series(dtype="float64"),
+            "desvio": pd.Series(dtype="float64"), "z_score": pd.Series(dtype="float64"),
+            "itens": pd.Series(dtype="float64"), "direcao": pd.Series(dtype="object"),
+        })
+
+        con.register("anomalias_df", anomalias)
+        con.register("estado_df", estado)
+        con.execute(f"""
+            COPY (
+                SELECT CAST(id_tempo AS INTEGER) AS id_tempo, tipo_segmento, segmento, metrica,
+                    valor, esperado, desvio, z_score, CAST(itens AS INTEGER) AS itens, direcao
+                FROM anomalias_df
+                ORDER BY id_tempo, tipo_segmento, segmento, metrica
+            ) TO '{gold_dir}/{TABELA_ANOMALIAS}.parquet' ({opcoes_parquet_duckdb()})
+        """)
+        con.execute(f"""
+            COPY (SELECT * FROM estado_df ORDER BY tipo_segmento, segmento)
+            TO '{gold_dir}/{TABELA_ESTADO}.parquet' ({opcoes_parquet_duckdb()})
+        """)
+        novas = 0 if detectadas is None else len(detectadas)
+        print(f"   ✅ {novas:,} anomalias novas ({len(anomalias):,} no histórico) em {len(estado):,} segmentos")
+
+        escrever_manifesto(
+            gold_dir,
+            {nome: os.path.join(gold_dir, f"{nome}.parquet") for nome in (TABELA_ANOMALIAS, TABELA_ESTADO)},
+            {TABELA_ANOMALIAS: time.perf_counter() - inicio_build},
+            {},
+            substituir=False,
+        )
+
+        if publicar:
+            publicar_snapshot(gold_dir, OUTPUT_GOLD_DIR)
+
+        print(f"✅ Anomalias concluídas em {time.perf_counter() - inicio_build:.1f}s")
+        return True
+
+    except Exception as e:
+        print(f"\n❌ ERRO na detecção de anomalias: {e}")
+        import traceback
+        traceback.print_exc()
+        if publicar:
+            descartar_snapshot(gold_dir)
+        return False
+
+    finally:
+        con.close()
+
+
+def anomalias_recentes(gold_dir, dias=7):
+    """
+    Anomalias dos últimos `dias` dias processados (relativo ao último dia de dados, não à
+    última anomalia), mais fortes primeiro. Retorna None em snapshots sem as tabelas.
+    """
+    path = os.path.join(gold_dir, f"{TABELA_ANOMALIAS}.parquet").replace("\\", "/")
+    estado_path = os.path.join(gold_dir, f"{TABELA_ESTADO}.parquet").replace("\\", "/")
+    if not (os.path.exists(path) and os.path.exists(estado_path)):
+        return None
+    con = conectar_duckdb("dashboard")
+    try:
+        ultimo = con.execute(f"SELECT MAX(ultimo_id_tempo) FROM read_parquet('{estado_path}')").fetchone()[0]
+        if ultimo is None:
+            return None
+        corte = int((pd.to_datetime(str(ultimo), format="%Y%m%d") - pd.Timedelta(days=dias - 1)).strftime("%Y%m%d"))
+        return con.execute(f"""
+            SELECT CAST(strptime(CAST(id_tempo AS VARCHAR), '%Y%m%d') AS DATE) AS data, * EXCLUDE (id_tempo)
+            FROM read_parquet('{path}')
+            WHERE id_tempo >= ?
+            ORDER BY abs(z_score) DESC
+        """, [corte]).df()
+    finally:
+        con.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Detecção incremental de anomalias sobre a Gold publicada")
+    parser.add_argument("--reprocessar", action="store_true", help="Ignora o estado publicado e recalcula o histórico")
+    args = parser.parse_args()
+    sys.exit(0 if create_gold_anomalies(reprocessar=args.reprocessar) else 1)
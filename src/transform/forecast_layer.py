@@ -0,0 +1,368 @@
+import hashlib
+import itertools
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# pasta raiz ao caminho de busca do Python (permite executar o módulo diretamente)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.utils.helpers import conectar_duckdb, opcoes_parquet_duckdb
+from src.utils.manifest import escrever_manifesto
+from src.utils.snapshots import novo_snapshot, publicar_snapshot, descartar_snapshot
+from src.utils.watcher import ler_estado, salvar_estado
+
+OUTPUT_GOLD_DIR = "data/gold"
+TABELA_PREVISAO = "agg_previsao_vendas"
+
+# Gera a previsão ao final do build da Gold
+GERAR_PREVISAO = True
+
+# Parâmetros ajustados por série, reaproveitados entre builds (só séries alteradas são reajustadas)
+PREVISAO_CACHE = "data/tmp/previsao_parametros.json"
+
+HORIZONTE_DIAS = int(os.getenv("PREVISAO_HORIZONTE_DIAS", "30"))
+MIN_DIAS_COM_VENDA = int(os.getenv("PREVISAO_MIN_DIAS", "60"))  # Séries mais esparsas ficam só nos agregados
+TODOS = "(todos)"  # Rótulo das séries agregadas (categoria em todos os países / total geral)
+
+# Holt-Winters aditivo amortecido, sazonalidade semanal, forma de correção de erro:
+#   ŷ = l + φb + s[t mod 7];  l += φb + α·e;  b = φb + β·e;  s[t mod 7] += γ·e
+SAZONALIDADE = 7
+AMORTECIMENTO = 0.9
+GRADE_ALFA = [0.05, 0.1, 0.2, 0.4]
+GRADE_BETA = [0.0, 0.01, 0.05]
+GRADE_GAMA = [0.05, 0.2]
+AQUECIMENTO_DIAS = 28  # Janela de inicialização (fora do erro de ajuste)
+Z_95 = 1.96
+
+
+def _config():
+    """Identifica o modelo: mudar grade/amortecimento invalida todos os parâmetros em cache."""
+    config = [SAZONALIDADE, AMORTECIMENTO, GRADE_ALFA, GRADE_BETA, GRADE_GAMA, AQUECIMENTO_DIAS]
+    return hashlib.sha1(json.dumps(config).encode()).hexdigest()[:12]
+
+
+def carregar_series(con, gold_dir):
+    """
+    Vendas diárias por categoria x país, por categoria (todos os países) e total, em uma
+    consulta GROUPING SETS. Também devolve uma assinatura do conteúdo de cada série
+    (dias com venda e valores), estável quando o calendário só ganha dias sem venda da série.
+    """
+    return con.execute(f"""
+        WITH diario AS (
+            SELECT
+                COALESCE(p.categoria, '{TODOS}') AS categoria,
+                COALESCE(c.cliente_pais, '{TODOS}') AS cliente_pais,
+                f.id_tempo,
+                ROUND(SUM(f.valor_venda), 2) AS vendas
+            FROM read_parquet('{gold_dir}/fact_vendas.parquet') f
+            JOIN read_parquet('{gold_dir}/dim_produtos.parquet') p ON f.id_produto = p.id_produto
+            JOIN read_parquet('{gold_dir}/dim_clientes.parquet') c ON f.id_cliente = c.id_cliente
+            GROUP BY GROUPING SETS ((p.categoria, c.cliente_pais, f.id_tempo), (p.categoria, f.id_tempo), (f.id_tempo))
+        )
+        SELECT
+            *,
+            COUNT(*) OVER serie AS dias_com_venda,
+            CAST(hash(string_agg(id_tempo || ':' || vendas, ',' ORDER BY id_tempo) OVER serie) AS VARCHAR) AS assinatura
+        FROM diario
+        WINDOW serie AS (PARTITION BY categoria, cliente_pais ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING)
+    """).df()
+
+
+def montar_matriz(df):
+    """Séries longas -> matriz densa N x T (dias sem venda = 0) e o início de cada série."""
+    datas = pd.to_datetime(df["id_tempo"].astype(str), format="%Y%m%d")
+    calendario = pd.date_range(datas.min(), datas.max(), freq="D")
+    chaves = df[["categoria", "cliente_pais"]].drop_duplicates().sort_values(["categoria", "cliente_pais"], ignore_index=True)
+
+    linha = pd.MultiIndex.from_frame(chaves).get_indexer(pd.MultiIndex.from_frame(df[["categoria", "cliente_pais"]]))
+    coluna = (datas - calendario[0]).dt.days.to_numpy()
+    Y = np.zeros((len(chaves), len(calendario)))
+    Y[linha, coluna] = df["vendas"].to_numpy()
+
+    inicio = np.full(len(chaves), len(calendario) - 1)
+    np.minimum.at(inicio, linha, coluna)
+    assinaturas = df.groupby(["categoria", "cliente_pais"], sort=True)["assinatura"].first().to_numpy()
+    return chaves, calendario, Y, inicio, assinaturas
+
+
+def inicializar(Y, inicio):
+    """Nível e sazonalidade iniciais a partir das primeiras semanas de cada série (vetorizado)."""
+    n, t = Y.shape
+    janela = np.minimum(inicio[:, None] + np.arange(AQUECIMENTO_DIAS), t - 1)  # (N, W)
+    valores = np.take_along_axis(Y, janela, axis=1)
+    nivel = valores.mean(axis=1)
+
+    sazonal = np.zeros((n, SAZONALIDADE))
+    posicao = janela % SAZONALIDADE
+    for k in range(SAZONALIDADE):
+        mascara = posicao == k
+        soma = np.where(mascara, valores, 0).sum(axis=1)
+        sazonal[:, k] = np.divide(soma, mascara.sum(axis=1), out=nivel.copy(), where=mascara.any(axis=1)) - nivel
+    return nivel, sazonal
+
+
+def suavizar(Y, inicio, alfa, beta, gama):
+    """
+    Filtra TODAS as séries x combinações de parâmetros em um único laço no tempo.
+    alfa/beta/gama: arrays que fazem broadcast para (P, N) — grade (P, 1) no ajuste,
+    parâmetros por série (1, N) na atualização.
+    Retorna (sse, n_obs, nivel, tendencia, sazonal) com shapes (P, N[, 7]).
+    """
+    n, t_total = Y.shape
+    alfa, beta, gama = np.broadcast_arrays(*(np.asarray(p, dtype=np.float64) for p in (alfa, beta, gama)))
+    formato = np.broadcast_shapes(alfa.shape, (1, n))
+
+    nivel0, sazonal0 = inicializar(Y, inicio)
+    nivel = np.broadcast_to(nivel0, formato).copy()
+    tendencia = np.zeros(formato)
+    sazonal = np.broadcast_to(sazonal0, formato + (SAZONALIDADE,)).copy()
+    sse = np.zeros(formato)
+    n_obs = np.zeros(formato)
+    inicio_ajuste = inicio + AQUECIMENTO_DIAS
+
+    for t in range(t_total):
+        ativo = t >= inicio  # (N,) séries que já começaram
+        if not ativo.any():
+            continue
+        k = t % SAZONALIDADE
+        previsto = nivel + AMORTECIMENTO * tendencia
+        erro = Y[:, t] - (previsto + sazonal[..., k])
+
+        conta = (t >= inicio_ajuste)[None, :]
+        sse += np.where(conta, erro ** 2, 0)
+        n_obs += conta
+
+        nivel = np.where(ativo, previsto + alfa * erro, nivel)
+        tendencia = np.where(ativo, AMORTECIMENTO * tendencia + beta * erro, tendencia)
+        sazonal[..., k] = np.where(ativo, sazonal[..., k] + gama * erro, sazonal[..., k])
+
+    return sse, n_obs, nivel, tendencia, sazonal
+
+
+def prever(t_total, nivel, tendencia, sazonal, sigma, alfa, horizonte=HORIZONTE_DIAS):
+    """Previsão h = 1..H com faixa de 95% (variância cresce com o horizonte). Shapes (N, H)."""
+    h = np.arange(1, horizonte + 1)
+    amortecimento = np.cumsum(AMORTECIMENTO ** h)  # φ + φ² + ... + φ^h
+    posicao = (t_total + h - 1) % SAZONALIDADE
+    previsao = nivel[:, None] + amortecimento[None, :] * tendencia[:, None] + sazonal[:, posicao]
+    faixa = Z_95 * sigma[:, None] * np.sqrt(1 + (h[None, :] - 1) * alfa[:, None] ** 2)
+    previsao = np.maximum(previsao, 0)
+    return previsao, np.maximum(previsao - faixa, 0), previsao + faixa
+
+
+def ajustar_series(Y, inicio, assinaturas, chaves, cache):
+    """
+    Ajuste em lote: séries novas ou alteradas passam pela grade completa (P combinações x N séries
+    de uma vez); as demais reaproveitam os parâmetros do cache e só atualizam o estado.
+    Retorna (alfa, beta, gama, sigma, nivel, tendencia, sazonal) por série, o número de
+    séries reajustadas e o novo cache.
+    """
+    n = len(chaves)
+    rotulos = (chaves["categoria"] + "|" + chaves["cliente_pais"]).to_numpy()
+    anteriores = cache.get("series", {}) if cache.get("config") == _config() else {}
+
+    parametros = np.full((n, 3), np.nan)
+    for i, rotulo in enumerate(rotulos):
+        entrada = anteriores.get(rotulo)
+        if entrada and entrada["assinatura"] == assinaturas[i]:
+            parametros[i] = entrada["parametros"]
+    reajustar = np.isnan(parametros[:, 0])
+
+    alfa, beta, gama = parametros.T.copy()
+    sigma = np.zeros(n)
+    nivel, tendencia, sazonal = np.zeros(n), np.zeros(n), np.zeros((n, SAZONALIDADE))
+
+    if reajustar.any():
+        grade = np.array(list(itertools.product(GRADE_ALFA, GRADE_BETA, GRADE_GAMA)))  # (P, 3)
+        sse, n_obs, l, b, s = suavizar(
+            Y[reajustar], inicio[reajustar], grade[:, :1], grade[:, 1:2], grade[:, 2:3]
+        )
+        melhor = sse.argmin(axis=0)  # Combinação de menor erro por série
+        colunas = np.arange(reajustar.sum())
+        alfa[reajustar], beta[reajustar], gama[reajustar] = grade[melhor].T
+        sigma[reajustar] = np.sqrt(sse[melhor, colunas] / np.maximum(n_obs[melhor, colunas], 1))
+        nivel[reajustar], tendencia[reajustar] = l[melhor, colunas], b[melhor, colunas]
+        sazonal[reajustar] = s[melhor, colunas]
+
+    manter = ~reajustar
+    if manter.any():
+        sse, n_obs, l, b, s = suavizar(
+            Y[manter], inicio[manter], alfa[None, manter], beta[None, manter], gama[None, manter]
+        )
+        sigma[manter] = np.sqrt(sse[0] / np.maximum(n_obs[0], 1))
+        nivel[manter], tendencia[manter], sazonal[manter] = l[0], b[0], s[0]
+
+    novo_cache = {
+        "config": _config(),
+        "series": {
+            rotulo: {"assinatura": assinaturas[i], "parametros": [alfa[i], beta[i], gama[i]]}
+            for i, rotulo in enumerate(rotulos)
+        },
+    }
+    return (alfa, beta, gama, sigma, nivel, tendencia, sazonal), int(reajustar.sum()), novo_cache
+
+
+def create_gold_forecast(gold_dir=None):
+    """
+    Previsão diária de vendas por categoria x país (mais os agregados por categoria e o total),
+    publicada na Gold como agg_previsao_vendas.
+
+    Todas as séries são ajustadas juntas (numpy, sem laço por série). Os parâmetros ficam em
+    cache por assinatura do conteúdo da série: um novo build só reajusta as séries que mudaram.
+
+    gold_dir: snapshot de destino já aberto (build_gold). Sem ele, cria um snapshot
+    herdando as tabelas publicadas e o publica ao final.
+    """
+    if not GERAR_PREVISAO:
+        return True
+
+    print("\n🔮 Gerando previsão de vendas (categoria x país)...")
+    inicio_build = time.perf_counter()
+    publicar = gold_dir is None
+    gold_dir = gold_dir or novo_snapshot(OUTPUT_GOLD_DIR, herdar=True)
+    con = conectar_duckdb("pipeline")
+
+    try:
+        df = carregar_series(con, gold_dir)
+        if df.empty:
+            print("⚠️ Aviso: fact_vendas vazia. Previsão ignorada.")
+            return True
+
+        # Séries muito esparsas não sustentam um modelo diário; os agregados sempre entram
+        agregada = (df["categoria"] == TODOS) | (df["cliente_pais"] == TODOS)
+        df = df[agregada | (df["dias_com_venda"] >= MIN_DIAS_COM_VENDA)]
+        chaves, calendario, Y, inicio, assinaturas = montar_matriz(df)
+        print(f"   📊 {len(chaves):,} séries x {len(calendario):,} dias")
+
+        cache = ler_estado(PREVISAO_CACHE)
+        (alfa, _, _, sigma, nivel, tendencia, sazonal), reajustadas, novo_cache = ajustar_series(
+            Y, inicio, assinaturas, chaves, cache
+        )
+        print(f"   🧮 {reajustadas:,} séries reajustadas, {len(chaves) - reajustadas:,} com parâmetros do cache")
+
+        previsao, inferior, superior = prever(Y.shape[1], nivel, tendencia, sazonal, sigma, alfa)
+        datas = pd.date_range(calendario[-1] + pd.Timedelta(days=1), periods=HORIZONTE_DIAS, freq="D")
+        resultado = pd.DataFrame({
+            "data": np.tile(datas, len(chaves)),
+            "categoria": np.repeat(chaves["categoria"].to_numpy(), HORIZONTE_DIAS),
+            "cliente_pais": np.repeat(chaves["cliente_pais"].to_numpy(), HORIZONTE_DIAS),
+            "horizonte": np.tile(np.arange(1, HORIZONTE_DIAS + 1, dtype=np.int16), len(chaves)),
+            "previsao": previsao.ravel().round(2),
+            "limite_inferior": inferior.ravel().round(2),
+            "limite_superior": superior.ravel().round(2),
+        })
+
+        con.register("previsao_df", resultado)
+        con.execute(f"""
+            COPY (
+                SELECT CAST(data AS DATE) AS data, * EXCLUDE (data)
+                FROM previsao_df
+                ORDER BY categoria, cliente_pais, data
+            ) TO '{gold_dir}/{TABELA_PREVISAO}.parquet' ({opcoes_parquet_duckdb()})
+        """)
+        print(f"   ✅ {len(resultado):,} linhas de previsão ({HORIZONTE_DIAS} dias a partir de {datas[0]:%d/%m/%Y})")
+
+        escrever_manifesto(
+            gold_dir,
+            {TABELA_PREVISAO: os.path.join(gold_dir, f"{TABELA_PREVISAO}.parquet")},
+            {TABELA_PREVISAO: time.perf_counter() - inicio_build},
+            {},
+            substituir=False,
+        )
+        # Cache só é gravado depois da tabela: um build com erro não o contamina
+        novo_cache["versao_gold"] = os.path.basename(os.path.normpath(gold_dir))
+        salvar_estado(PREVISAO_CACHE, novo_cache)
+
+        if publicar:
+            publicar_snapshot(gold_dir, OUTPUT_GOLD_DIR)
+
+        print(f"✅ Previsão concluída em {time.perf_counter() - inicio_build:.1f}s")
+        return True
+
+    except Exception as e:
+        print(f"\n❌ ERRO na previsão de vendas: {e}")
+        import traceback
+        traceback.print_exc()
+        if publicar:
+            descartar_snapshot(gold_dir)
+        return False
+
+    finally:
+        con.close()
+
+
+def caminho_previsao(gold_dir):
+    """Parquet da previsão no snapshot, ou None em snapshots anteriores a ela."""
+    path = os.path.join(gold_dir, f"{TABELA_PREVISAO}.parquet").replace("\\", "/")
+    return path if os.path.exists(path) else None
+
+
+def previsao_total(gold_dir):
+    """Série diária prevista para o total geral (data, previsao, limite_inferior, limite_superior), ou None."""
+    path = caminho_previsao(gold_dir)
+    if path is None:
+        return None
+    con = conectar_duckdb("dashboard")
+    try:
+        return con.execute(f"""
+            SELECT data, previsao, limite_inferior, limite_superior
+            FROM read_parquet('{path}')
+            WHERE categoria = ? AND cliente_pais = ?
+            ORDER BY data
+        """, [TODOS, TODOS]).df()
+    finally:
+        con.close()
+
+
+def resumo_previsao(gold_dir):
+    """
+    Previsto no horizonte x realizado no mesmo número de dias imediatamente anteriores,
+    por categoria x país (e agregados). Retorna um DataFrame, ou None sem a tabela.
+    """
+    path = caminho_previsao(gold_dir)
+    if path is None:
+        return None
+    con = conectar_duckdb("dashboard")
+    try:
+        inicio, dias = con.execute(f"SELECT MIN(data), MAX(horizonte) FROM read_parquet('{path}')").fetchone()
+        corte = int((pd.Timestamp(inicio) - pd.Timedelta(days=int(dias))).strftime("%Y%m%d"))
+        return con.execute(f"""
+            WITH previsto AS (
+                SELECT categoria, cliente_pais,
+                    SUM(previsao) AS previsto, SUM(limite_inferior) AS limite_inferior, SUM(limite_superior) AS limite_superior
+                FROM read_parquet('{path}')
+                GROUP BY categoria, cliente_pais
+            ),
+            realizado AS (
+                SELECT
+                    COALESCE(p.categoria, '{TODOS}') AS categoria,
+                    COALESCE(c.cliente_pais, '{TODOS}') AS cliente_pais,
+                    SUM(f.valor_venda) AS realizado
+                FROM read_parquet('{gold_dir}/fact_vendas.parquet') f
+                JOIN read_parquet('{gold_dir}/dim_produtos.parquet') p ON f.id_produto = p.id_produto
+                JOIN read_parquet('{gold_dir}/dim_clientes.parquet') c ON f.id_cliente = c.id_cliente
+                WHERE f.id_tempo >= ?
+                GROUP BY GROUPING SETS ((p.categoria, c.cliente_pais), (p.categoria), ())
+            )
+            SELECT
+                v.categoria, v.cliente_pais,
+                ROUND(v.previsto, 2) AS previsto,
+                ROUND(v.limite_inferior, 2) AS limite_inferior,
+                ROUND(v.limite_superior, 2) AS limite_superior,
+                ROUND(COALESCE(r.realizado, 0), 2) AS realizado_periodo_anterior,
+                ROUND((v.previsto / NULLIF(r.realizado, 0) - 1) * 100, 1) AS variacao_pct
+            FROM previsto v
+            LEFT JOIN realizado r USING (categoria, cliente_pais)
+            ORDER BY v.previsto DESC
+        """, [corte]).df()
+    finally:
+        con.close()
+
+
+if __name__ == "__main__":
+    create_gold_forecast()
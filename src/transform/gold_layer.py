@@ -1,71 +1,210 @@
-import duckdb
 import os
+import sys
+import time
+
+# pasta raiz ao caminho de busca do Python (permite executar o módulo diretamente)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.utils.helpers import conectar_duckdb, opcoes_parquet_duckdb, tipo_inteiro
+from src.utils.manifest import escrever_manifesto, MANIFEST_NAME
+from src.utils.snapshots import novo_snapshot, publicar_snapshot, descartar_snapshot
+from src.transform.forecast_layer import create_gold_forecast
+from src.transform.anomaly_layer import create_gold_anomalies
 
 INPUT_SILVER = "data/silver/vendas_logistica.parquet"
-OUTPUT_GOLD_DIR = "data/gold"
+INPUT_SILVER_ACESSOS = "data/silver/acessos.parquet"
+OUTPUT_GOLD_DIR = "data/gold"  # Raiz: snapshots/<versao>/ + ponteiro CURRENT
+
+# Gera dim_horario (hora/minuto do pedido) separada do calendário diário
+GERAR_DIM_HORARIO = True
+
+# Layout físico da fact_vendas
+# - "sort": ordenação lexicográfica pelas colunas (a primeira domina a poda)
+# - "zorder": curva Z (Morton) sobre as colunas, poda equilibrada entre todas elas
+FACT_LAYOUT = "sort"
+FACT_CLUSTER_COLUNAS = ["id_tempo", "id_produto"]
+# Desempate único dentro de (id_tempo, id_produto): com ele a chave de clusterização
+# identifica cada item e serve de cursor para paginação por keyset
+FACT_SEQ_ITEM = "seq_item"
+FACT_ROW_GROUP_SIZE = 32_768  # Múltiplo de 2.048 (vetor DuckDB); menor = poda mais fina
+ZORDER_BITS = 10  # Bits por coluna na curva Z (1.024 faixas por coluna)
+
+# Tabelas registradas no manifest.json e chaves estrangeiras verificadas na cobertura dos joins
+TABELAS_STAR_SCHEMA = ["dim_tempo", "dim_horario", "dim_logistica", "dim_produtos", "dim_clientes", "dim_contexto", "fact_vendas", "fact_pedidos", "agg_lead_time_diario"]
+TABELAS_CLICKSTREAM = ["fact_acessos", "agg_interesse_produto_diario"]
+CHAVES_FACT_VENDAS = ["id_tempo", "id_produto", "id_cliente", "id_logistica"]
+CHAVES_FACT_PEDIDOS = ["id_tempo", "id_cliente", "id_logistica"]
+
+# Clickstream: minutos sem atividade do mesmo IP que encerram uma sessão
+SESSAO_INATIVIDADE_MIN = 30
+
+
+def sql_id_tempo(coluna):
+    """
+    Expressão SQL da chave inteira de calendário (yyyymmdd) para uma coluna de data/timestamp.
+    Impacto: chave de 4 bytes em granularidade diária no lugar do timestamp de minuto.
+    """
+    return (
+        f"CAST(EXTRACT(YEAR FROM {coluna}) * 10000 "
+        f"+ EXTRACT(MONTH FROM {coluna}) * 100 "
+        f"+ EXTRACT(DAY FROM {coluna}) AS INTEGER)"
+    )
+
+
+def sql_clusterizar(select_sql, colunas, layout="sort"):
+    """
+    Envolve um SELECT com a ordenação física desejada para a escrita em Parquet.
+    
+    - sort: ORDER BY colunas
+    - zorder: cada coluna vira um rank por quantis (NTILE) e os bits dos ranks são
+      intercalados em um código Morton, usado como chave de ordenação
+    """
+    if layout == "sort":
+        return f"SELECT * FROM ({select_sql}) ORDER BY {', '.join(colunas)}"
 
-def create_gold_layer_complete():
+    if layout == "zorder":
+        if len(colunas) * ZORDER_BITS > 62:
+            raise ValueError(f"Z-order suporta no máximo {62 // ZORDER_BITS} colunas com {ZORDER_BITS} bits")
+        ranks = ", ".join(
+            f"NTILE({2 ** ZORDER_BITS}) OVER (ORDER BY {col}) - 1 AS _z{i}"
+            for i, col in enumerate(colunas)
+        )
+        bits = " | ".join(
+            f"(((_z{i} >> {b}) & 1) << {b * len(colunas) + i})"
+            for b in range(ZORDER_BITS)
+            for i in range(len(colunas))
+        )
+        excluir = ", ".join(f"_z{i}" for i in range(len(colunas)))
+        return f"""
+            SELECT * EXCLUDE ({excluir}, _morton) FROM (
+                SELECT *, CAST({bits} AS BIGINT) AS _morton
+                FROM (SELECT *, {ranks} FROM ({select_sql}))
+            )
+            ORDER BY _morton, {', '.join(colunas)}
+        """
+
+    raise ValueError(f"Layout desconhecido: {layout}")
+
+def create_gold_layer_complete(gold_dir=None):
     """
-    Cria Star Schema COMPLETO com 5 dimensões + 1 fato
+    Cria Star Schema COMPLETO com 5 dimensões + 2 fatos
     
     Dimensões:
-    1. dim_tempo - Datas completas (ano, mês, dia, data_completa)
+    1. dim_tempo - Calendário diário, chave inteira yyyymmdd (ano, mês, dia, data_completa)
     2. dim_logistica - Status, modo, dias real/agendado
     3. dim_produtos - Categoria + Nome do produto
     4. dim_clientes - Cidade, Estado, País
-    5. dim_contexto - Petróleo Brent
+    5. dim_contexto - Petróleo Brent (por dia, chave id_tempo)
+    
+    Opcional:
+    - dim_horario - Hora/minuto do pedido (chave id_horario = hhmm)
     
-    Fato:
-    - fact_vendas - Relaciona todas as dimensões + métricas
+    Fatos:
+    - fact_vendas - Relaciona todas as dimensões + métricas (grão: item do pedido)
+    - fact_pedidos - Pré-agregada por pedido (grão: pedido; totais, itens, envio e status)
+    
+    Agregados:
+    - agg_lead_time_diario - Histograma diário de dias de envio (real x agendado) por
+      modo, região e categoria: sketch mesclável para p50/p90/p99 em qualquer período
+    
+    gold_dir: snapshot de destino já aberto (build_gold). Sem ele, a função cria
+    e publica o próprio snapshot. Retorna True se o Star Schema foi gerado.
     """
     
     print("🏗️ Construindo Star Schema COMPLETO com TODAS as colunas...")
-    os.makedirs(OUTPUT_GOLD_DIR, exist_ok=True)
-    con = duckdb.connect()
+    inicio_build = time.perf_counter()
+    tempos = {}
+    publicar = gold_dir is None
+    gold_dir = gold_dir or novo_snapshot(OUTPUT_GOLD_DIR)
+    print(f"📂 Snapshot de destino: {gold_dir}")
+    con = conectar_duckdb("pipeline")
 
     try:
         # Criar view da camada Silver
         con.execute(f"CREATE VIEW silver_data AS SELECT * FROM read_parquet('{INPUT_SILVER}')")
         
+        # Datas que o calendário precisa cobrir (pedidos + acessos, se o clickstream existir)
+        datas_sql = "SELECT data_pedido AS data FROM silver_data"
+        if os.path.exists(INPUT_SILVER_ACESSOS):
+            datas_sql += f" UNION ALL SELECT data_acesso FROM read_parquet('{INPUT_SILVER_ACESSOS}')"
+        
         # Verificar se Silver tem dados
         row_count = con.execute("SELECT COUNT(*) FROM silver_data").fetchone()[0]
         print(f"📊 Total de registros na Silver: {row_count:,}")
         
         if row_count == 0:
             print("❌ ERRO: Silver está vazia! Execute silver_layer.py primeiro.")
-            return
+            if publicar:
+                descartar_snapshot(gold_dir)
+            return False
 
         # ========================================================================
-        # 1. DIMENSÃO TEMPO - Com data completa + componentes
+        # 1. DIMENSÃO TEMPO - Calendário diário com chave inteira yyyymmdd
         # ========================================================================
         print("\n📅 1/5 - Criando dim_tempo...")
+        inicio = time.perf_counter()
         con.execute(f"""
             COPY (
-                SELECT DISTINCT 
-                    data_pedido AS id_tempo,
-                    data_pedido AS data_completa,
-                    EXTRACT(YEAR FROM data_pedido) AS ano,
-                    EXTRACT(MONTH FROM data_pedido) AS mes,
-                    EXTRACT(DAY FROM data_pedido) AS dia,
-                    EXTRACT(DOW FROM data_pedido) AS dia_semana,
-                    EXTRACT(QUARTER FROM data_pedido) AS trimestre
-                FROM silver_data 
-                WHERE data_pedido IS NOT NULL
-                ORDER BY data_pedido
-            ) TO '{OUTPUT_GOLD_DIR}/dim_tempo.parquet' (FORMAT PARQUET)
+                SELECT 
+                    {sql_id_tempo('dia')} AS id_tempo,
+                    CAST(dia AS DATE) AS data_completa,
+                    CAST(EXTRACT(YEAR FROM dia) AS {tipo_inteiro('SMALLINT')}) AS ano,
+                    CAST(EXTRACT(MONTH FROM dia) AS {tipo_inteiro('TINYINT')}) AS mes,
+                    CAST(EXTRACT(DAY FROM dia) AS {tipo_inteiro('TINYINT')}) AS dia,
+                    CAST(EXTRACT(DOW FROM dia) AS {tipo_inteiro('TINYINT')}) AS dia_semana,
+                    CAST(EXTRACT(QUARTER FROM dia) AS {tipo_inteiro('TINYINT')}) AS trimestre,
+                    CAST(EXTRACT(WEEK FROM dia) AS {tipo_inteiro('TINYINT')}) AS semana_ano,
+                    EXTRACT(DOW FROM dia) IN (0, 6) AS fim_de_semana
+                FROM (
+                    -- Calendário contínuo: inclui dias sem pedidos para séries temporais sem buracos
+                    SELECT UNNEST(range(
+                        MIN(CAST(data AS DATE))::TIMESTAMP,
+                        MAX(CAST(data AS DATE))::TIMESTAMP + INTERVAL 1 DAY,
+                        INTERVAL 1 DAY
+                    )) AS dia
+                    FROM ({datas_sql})
+                    WHERE data IS NOT NULL
+                )
+                ORDER BY id_tempo
+            ) TO '{gold_dir}/dim_tempo.parquet' ({opcoes_parquet_duckdb()})
         """)
         
-        tempo_count = con.execute(f"SELECT COUNT(*) FROM read_parquet('{OUTPUT_GOLD_DIR}/dim_tempo.parquet')").fetchone()[0]
-        print(f"   ✅ {tempo_count:,} datas únicas criadas")
+        tempo_count = con.execute(f"SELECT COUNT(*) FROM read_parquet('{gold_dir}/dim_tempo.parquet')").fetchone()[0]
+        print(f"   ✅ {tempo_count:,} dias de calendário criados")
+        tempos['dim_tempo'] = time.perf_counter() - inicio
+
+        # Dimensão opcional de horário do dia (granularidade de minuto, 1.440 linhas fixas)
+        if GERAR_DIM_HORARIO:
+            print("\n🕐 Criando dim_horario...")
+            inicio = time.perf_counter()
+            con.execute(f"""
+                COPY (
+                    SELECT 
+                        CAST(h * 100 + m AS {tipo_inteiro('SMALLINT')}) AS id_horario,
+                        CAST(h AS {tipo_inteiro('TINYINT')}) AS hora,
+                        CAST(m AS {tipo_inteiro('TINYINT')}) AS minuto,
+                        CASE 
+                            WHEN h < 6 THEN 'Madrugada'
+                            WHEN h < 12 THEN 'Manhã'
+                            WHEN h < 18 THEN 'Tarde'
+                            ELSE 'Noite'
+                        END AS periodo_dia
+                    FROM range(24) t(h), range(60) u(m)
+                    ORDER BY id_horario
+                ) TO '{gold_dir}/dim_horario.parquet' ({opcoes_parquet_duckdb()})
+            """)
+            print("   ✅ 1,440 minutos do dia criados")
+            tempos['dim_horario'] = time.perf_counter() - inicio
 
         # ========================================================================
         # 2. DIMENSÃO LOGÍSTICA - Status + Modo + Dias
         # ========================================================================
         print("\n🚚 2/5 - Criando dim_logistica...")
+        inicio = time.perf_counter()
         con.execute(f"""
             COPY (
                 SELECT 
-                    ROW_NUMBER() OVER() AS id_logistica,
+                    CAST(ROW_NUMBER() OVER(ORDER BY status_entrega, modo_envio) AS {tipo_inteiro('SMALLINT')}) AS id_logistica,
                     status_entrega,
                     modo_envio,
                     AVG(dias_envio_real) AS dias_envio_real,
@@ -79,20 +218,23 @@ def create_gold_layer_complete():
                     FROM silver_data
                 )
                 GROUP BY status_entrega, modo_envio
-            ) TO '{OUTPUT_GOLD_DIR}/dim_logistica.parquet' (FORMAT PARQUET)
+                ORDER BY status_entrega, modo_envio
+            ) TO '{gold_dir}/dim_logistica.parquet' ({opcoes_parquet_duckdb()})
         """)
         
-        log_count = con.execute(f"SELECT COUNT(*) FROM read_parquet('{OUTPUT_GOLD_DIR}/dim_logistica.parquet')").fetchone()[0]
+        log_count = con.execute(f"SELECT COUNT(*) FROM read_parquet('{gold_dir}/dim_logistica.parquet')").fetchone()[0]
         print(f"   ✅ {log_count} combinações de status/modo criadas")
+        tempos['dim_logistica'] = time.perf_counter() - inicio
 
         # ========================================================================
         # 3. DIMENSÃO PRODUTOS - Categoria + Nome
         # ========================================================================
         print("\n📦 3/5 - Criando dim_produtos...")
+        inicio = time.perf_counter()
         con.execute(f"""
             COPY (
                 SELECT 
-                    ROW_NUMBER() OVER() AS id_produto,
+                    CAST(ROW_NUMBER() OVER(ORDER BY categoria, nome_produto) AS {tipo_inteiro('INTEGER')}) AS id_produto,
                     categoria,
                     nome_produto
                 FROM (
@@ -103,20 +245,22 @@ def create_gold_layer_complete():
                     WHERE categoria IS NOT NULL
                 )
                 ORDER BY categoria, nome_produto
-            ) TO '{OUTPUT_GOLD_DIR}/dim_produtos.parquet' (FORMAT PARQUET)
+            ) TO '{gold_dir}/dim_produtos.parquet' ({opcoes_parquet_duckdb()})
         """)
         
-        prod_count = con.execute(f"SELECT COUNT(*) FROM read_parquet('{OUTPUT_GOLD_DIR}/dim_produtos.parquet')").fetchone()[0]
+        prod_count = con.execute(f"SELECT COUNT(*) FROM read_parquet('{gold_dir}/dim_produtos.parquet')").fetchone()[0]
         print(f"   ✅ {prod_count:,} produtos únicos criados")
+        tempos['dim_produtos'] = time.perf_counter() - inicio
 
         # ========================================================================
         # 4. DIMENSÃO CLIENTES - Cidade + Estado + País
         # ========================================================================
         print("\n👤 4/5 - Criando dim_clientes...")
+        inicio = time.perf_counter()
         con.execute(f"""
             COPY (
                 SELECT 
-                    ROW_NUMBER() OVER() AS id_cliente,
+                    CAST(ROW_NUMBER() OVER(ORDER BY cliente_pais, cliente_estado, cliente_cidade) AS {tipo_inteiro('INTEGER')}) AS id_cliente,
                     cliente_cidade,
                     cliente_estado,
                     cliente_pais
@@ -129,39 +273,45 @@ def create_gold_layer_complete():
                     WHERE cliente_cidade IS NOT NULL
                 )
                 ORDER BY cliente_pais, cliente_estado, cliente_cidade
-            ) TO '{OUTPUT_GOLD_DIR}/dim_clientes.parquet' (FORMAT PARQUET)
+            ) TO '{gold_dir}/dim_clientes.parquet' ({opcoes_parquet_duckdb()})
         """)
         
-        cli_count = con.execute(f"SELECT COUNT(*) FROM read_parquet('{OUTPUT_GOLD_DIR}/dim_clientes.parquet')").fetchone()[0]
+        cli_count = con.execute(f"SELECT COUNT(*) FROM read_parquet('{gold_dir}/dim_clientes.parquet')").fetchone()[0]
         print(f"   ✅ {cli_count:,} localizações únicas criadas")
+        tempos['dim_clientes'] = time.perf_counter() - inicio
 
         # ========================================================================
         # 5. DIMENSÃO CONTEXTO - Petróleo Brent
         # ========================================================================
         print("\n🛢️ 5/5 - Criando dim_contexto...")
+        inicio = time.perf_counter()
         con.execute(f"""
             COPY (
                 SELECT 
-                    data_pedido AS data_referencia,
+                    {sql_id_tempo('data_pedido')} AS id_tempo,
+                    CAST(data_pedido AS DATE) AS data_referencia,
                     AVG(preco_petroleo_brent) AS preco_brent
                 FROM silver_data
-                GROUP BY data_pedido
-            ) TO '{OUTPUT_GOLD_DIR}/dim_contexto.parquet' (FORMAT PARQUET)
+                WHERE data_pedido IS NOT NULL
+                GROUP BY 1, 2
+                ORDER BY 1
+            ) TO '{gold_dir}/dim_contexto.parquet' ({opcoes_parquet_duckdb()})
         """)
         
-        ctx_count = con.execute(f"SELECT COUNT(*) FROM read_parquet('{OUTPUT_GOLD_DIR}/dim_contexto.parquet')").fetchone()[0]
-        print(f"   ✅ {ctx_count} valores de Brent únicos")
+        ctx_count = con.execute(f"SELECT COUNT(*) FROM read_parquet('{gold_dir}/dim_contexto.parquet')").fetchone()[0]
+        print(f"   ✅ {ctx_count:,} dias com valor de Brent")
+        tempos['dim_contexto'] = time.perf_counter() - inicio
 
         # ========================================================================
         # TABELA FATO - Centro do Star Schema
         # ========================================================================
         print("\n💰 Gerando fact_vendas (Centro do Star Schema)...")
+        inicio = time.perf_counter()
         
-        con.execute(f"""
-            COPY (
+        fact_select = f"""
                 SELECT 
-                    s.data_pedido AS id_tempo,
-                    s.data_pedido AS data_completa,
+                    {sql_id_tempo('s.data_pedido')} AS id_tempo,
+                    {f"CAST(hour(s.data_pedido) * 100 + minute(s.data_pedido) AS {tipo_inteiro('SMALLINT')}) AS id_horario," if GERAR_DIM_HORARIO else ""}
                     p.id_produto,
                     c.id_cliente,
                     l.id_logistica,
@@ -169,19 +319,113 @@ def create_gold_layer_complete():
                     s.valor_venda,
                     s.lucro_pedido,
                     s.venda_por_cliente,
-                    s.dias_envio_real
+                    s.dias_envio_real,
+                    s.id_pedido_original
                 FROM silver_data s
-                LEFT JOIN (SELECT id_produto, categoria, nome_produto FROM read_parquet('{OUTPUT_GOLD_DIR}/dim_produtos.parquet')) p 
+                LEFT JOIN (SELECT id_produto, categoria, nome_produto FROM read_parquet('{gold_dir}/dim_produtos.parquet')) p 
                     ON s.categoria = p.categoria AND s.nome_produto = p.nome_produto
-                LEFT JOIN (SELECT id_cliente, cliente_cidade, cliente_estado, cliente_pais FROM read_parquet('{OUTPUT_GOLD_DIR}/dim_clientes.parquet')) c 
+                LEFT JOIN (SELECT id_cliente, cliente_cidade, cliente_estado, cliente_pais FROM read_parquet('{gold_dir}/dim_clientes.parquet')) c 
                     ON s.cliente_cidade = c.cliente_cidade AND s.cliente_estado = c.cliente_estado
-                LEFT JOIN (SELECT id_logistica, status_entrega, modo_envio FROM read_parquet('{OUTPUT_GOLD_DIR}/dim_logistica.parquet')) l 
+                LEFT JOIN (SELECT id_logistica, status_entrega, modo_envio FROM read_parquet('{gold_dir}/dim_logistica.parquet')) l 
                     ON s.status_entrega = l.status_entrega AND s.modo_envio = l.modo_envio
-            ) TO '{OUTPUT_GOLD_DIR}/fact_vendas.parquet' (FORMAT PARQUET)
+        """
+        
+        # Sequência do item dentro do mesmo dia e produto (ordem estável por horário e pedido)
+        fact_select = f"""
+                SELECT *,
+                    CAST(ROW_NUMBER() OVER (
+                        PARTITION BY {', '.join(FACT_CLUSTER_COLUNAS)}
+                        ORDER BY {"id_horario, " if GERAR_DIM_HORARIO else ""}id_pedido_original, id_cliente, id_logistica
+                    ) AS INTEGER) AS {FACT_SEQ_ITEM}
+                FROM ({fact_select})
+        """
+        # No layout "sort" o desempate entra na ordenação: ordem física = ordem da chave de paginação.
+        # No "zorder" a ordem física é a curva Morton: a paginação por keyset (drill_down) segue
+        # correta, mas cada página vira varredura + top-N em vez de busca por row group
+        colunas_ordem = FACT_CLUSTER_COLUNAS + [FACT_SEQ_ITEM] if FACT_LAYOUT == "sort" else FACT_CLUSTER_COLUNAS
+
+        # Layout clusterizado: ordena a fato para que as estatísticas min/max de cada
+        # row group permitam pular blocos em filtros por data, produto e cliente
+        print(f"   🧭 Layout: {FACT_LAYOUT} em {', '.join(colunas_ordem)} (row group: {FACT_ROW_GROUP_SIZE:,})")
+        con.execute(f"""
+            COPY (
+                {sql_clusterizar(fact_select, colunas_ordem, FACT_LAYOUT)}
+            ) TO '{gold_dir}/fact_vendas.parquet' ({opcoes_parquet_duckdb(row_group_size=FACT_ROW_GROUP_SIZE)})
         """)
         
-        fact_count = con.execute(f"SELECT COUNT(*) FROM read_parquet('{OUTPUT_GOLD_DIR}/fact_vendas.parquet')").fetchone()[0]
+        fact_count = con.execute(f"SELECT COUNT(*) FROM read_parquet('{gold_dir}/fact_vendas.parquet')").fetchone()[0]
         print(f"   ✅ {fact_count:,} transações na tabela fato")
+        tempos['fact_vendas'] = time.perf_counter() - inicio
+
+        # ========================================================================
+        # FATO DE PEDIDOS - Grão de pedido (pré-agregada a partir de fact_vendas)
+        # ========================================================================
+        # Impacto: contagem de pedidos e ticket médio viram varreduras de uma tabela
+        # várias vezes menor, sem COUNT(DISTINCT) sobre a fato de itens
+        print("\n🧾 Gerando fact_pedidos (grão de pedido)...")
+        inicio = time.perf_counter()
+        pedidos_select = f"""
+                SELECT 
+                    f.id_pedido_original,
+                    MIN(f.id_tempo) AS id_tempo,
+                    {"MIN(f.id_horario) AS id_horario," if GERAR_DIM_HORARIO else ""}
+                    MIN(f.id_cliente) AS id_cliente,
+                    MIN(f.id_logistica) AS id_logistica,
+                    CAST(COUNT(*) AS {tipo_inteiro('SMALLINT')}) AS itens,
+                    CAST(COUNT(DISTINCT f.id_produto) AS {tipo_inteiro('SMALLINT')}) AS produtos_distintos,
+                    SUM(f.valor_venda) AS valor_pedido,
+                    SUM(f.lucro_pedido) AS lucro_pedido,
+                    MAX(f.dias_envio_real) AS dias_envio_real,
+                    bool_or(l.status_entrega = 'Late delivery') AS entrega_atrasada,
+                    MIN(f.brent_diario) AS brent_diario
+                FROM read_parquet('{gold_dir}/fact_vendas.parquet') f
+                LEFT JOIN read_parquet('{gold_dir}/dim_logistica.parquet') l ON f.id_logistica = l.id_logistica
+                GROUP BY f.id_pedido_original
+        """
+        con.execute(f"""
+            COPY (
+                {sql_clusterizar(pedidos_select, ["id_tempo", "id_cliente", "id_pedido_original"], "sort")}
+            ) TO '{gold_dir}/fact_pedidos.parquet' ({opcoes_parquet_duckdb(row_group_size=FACT_ROW_GROUP_SIZE)})
+        """)
+        
+        pedidos_count, itens_pedidos = con.execute(
+            f"SELECT COUNT(*), SUM(itens) FROM read_parquet('{gold_dir}/fact_pedidos.parquet')"
+        ).fetchone()
+        print(f"   ✅ {pedidos_count:,} pedidos ({fact_count / max(pedidos_count, 1):.2f} itens por pedido)")
+        tempos['fact_pedidos'] = time.perf_counter() - inicio
+
+        # ========================================================================
+        # SKETCH DE LEAD TIME - Histograma diário (real x agendado) por segmento
+        # ========================================================================
+        # Dias de envio são inteiros pequenos: o histograma por valor é um sketch de
+        # quantis EXATO e mesclável (somar contagens). Qualquer intervalo de datas é
+        # respondido somando os histogramas diários, sem reler as linhas de pedido.
+        # O arquivo é único e regerado a cada build, como o resto da Gold (sem partição física);
+        # ordenado por id_tempo, um filtro de período descarta row groups pelas estatísticas.
+        print("\n⏱️ Gerando agg_lead_time_diario (sketch diário de lead time)...")
+        inicio = time.perf_counter()
+        con.execute(f"""
+            COPY (
+                SELECT 
+                    {sql_id_tempo('data_pedido')} AS id_tempo,
+                    modo_envio,
+                    pedido_regiao,
+                    categoria,
+                    CAST(dias_envio_real AS {tipo_inteiro('TINYINT')}) AS dias_envio_real,
+                    CAST(dias_envio_agendado AS {tipo_inteiro('TINYINT')}) AS dias_envio_agendado,
+                    CAST(COUNT(*) AS {tipo_inteiro('INTEGER')}) AS itens
+                FROM silver_data
+                WHERE data_pedido IS NOT NULL AND dias_envio_real IS NOT NULL
+                GROUP BY ALL
+                ORDER BY id_tempo, modo_envio, pedido_regiao, categoria, dias_envio_real, dias_envio_agendado
+            ) TO '{gold_dir}/agg_lead_time_diario.parquet' ({opcoes_parquet_duckdb()})
+        """)
+        
+        sketch_count, itens_sketch = con.execute(
+            f"SELECT COUNT(*), SUM(itens) FROM read_parquet('{gold_dir}/agg_lead_time_diario.parquet')"
+        ).fetchone()
+        print(f"   ✅ {sketch_count:,} células de histograma ({fact_count / max(sketch_count, 1):.1f} itens por célula)")
+        tempos['agg_lead_time_diario'] = time.perf_counter() - inicio
 
         # ========================================================================
         # VALIDAÇÃO FINAL
@@ -191,52 +435,219 @@ def create_gold_layer_complete():
         print("="*70)
         
         # Criar arquivo de validação
-        validation_path = os.path.join(OUTPUT_GOLD_DIR, "VALIDACAO.txt")
+        validation_path = os.path.join(gold_dir, "VALIDACAO.txt")
         with open(validation_path, 'w', encoding='utf-8') as f:
             f.write("VALIDAÇÃO DO STAR SCHEMA\n")
             f.write("="*70 + "\n\n")
-            f.write(f"📅 dim_tempo: {tempo_count:,} registros\n")
+            f.write(f"📅 dim_tempo: {tempo_count:,} registros (dias)\n")
             f.write(f"🚚 dim_logistica: {log_count} registros\n")
             f.write(f"📦 dim_produtos: {prod_count:,} registros\n")
             f.write(f"👤 dim_clientes: {cli_count:,} registros\n")
             f.write(f"🛢️ dim_contexto: {ctx_count} registros\n")
-            f.write(f"💰 fact_vendas: {fact_count:,} registros\n\n")
+            f.write(f"💰 fact_vendas: {fact_count:,} registros\n")
+            f.write(f"🧾 fact_pedidos: {pedidos_count:,} registros\n")
+            f.write(f"⏱️ agg_lead_time_diario: {sketch_count:,} registros\n\n")
             f.write("✅ Todas as dimensões e fato foram criadas com sucesso!\n")
         
         print(f"\n📋 Resumo:")
-        print(f"   • dim_tempo: {tempo_count:,} datas")
+        print(f"   • dim_tempo: {tempo_count:,} dias")
         print(f"   • dim_logistica: {log_count} combinações")
         print(f"   • dim_produtos: {prod_count:,} produtos")
         print(f"   • dim_clientes: {cli_count:,} localizações")
         print(f"   • dim_contexto: {ctx_count} valores Brent")
         print(f"   • fact_vendas: {fact_count:,} transações")
+        print(f"   • fact_pedidos: {pedidos_count:,} pedidos")
+        print(f"   • agg_lead_time_diario: {sketch_count:,} células")
         
-        print(f"\n📁 Arquivos salvos em: {OUTPUT_GOLD_DIR}/")
+        print(f"\n📁 Arquivos salvos em: {gold_dir}/")
         print(f"📄 Validação salva em: {validation_path}")
         
-        # Teste rápido de integridade
+        # Manifesto (row counts, checksums, estatísticas e cobertura lidos do rodapé dos Parquets)
+        tabelas = {nome: os.path.join(gold_dir, f"{nome}.parquet") for nome in TABELAS_STAR_SCHEMA}
+        if not GERAR_DIM_HORARIO:
+            tabelas.pop("dim_horario")
+        tempos['total'] = time.perf_counter() - inicio_build
+        manifesto = escrever_manifesto(
+            gold_dir, tabelas, tempos,
+            {"fact_vendas": CHAVES_FACT_VENDAS, "fact_pedidos": CHAVES_FACT_PEDIDOS},
+        )
+        print(f"🧾 Manifesto salvo em: {os.path.join(gold_dir, MANIFEST_NAME)}")
+        
+        # Teste rápido de integridade (sem reler dados: apenas o manifesto)
         print("\n🔍 Teste de Integridade...")
-        test_query = con.execute(f"""
-            SELECT 
-                COUNT(*) as total,
-                SUM(valor_venda) as faturamento_total,
-                AVG(lucro_pedido) as lucro_medio
-            FROM read_parquet('{OUTPUT_GOLD_DIR}/fact_vendas.parquet')
-        """).df()
+        if fact_count != row_count:
+            print(f"   ❌ fact_vendas tem {fact_count:,} linhas, Silver tem {row_count:,} (joins duplicando linhas?)")
+        else:
+            print(f"   Total de vendas: {fact_count:,} (igual à Silver)")
+        if itens_pedidos != fact_count:
+            print(f"   ❌ fact_pedidos soma {itens_pedidos:,} itens, fact_vendas tem {fact_count:,}")
+        else:
+            print(f"   Itens em fact_pedidos: {itens_pedidos:,} (igual a fact_vendas)")
+        if (itens_sketch or 0) != fact_count:
+            print(f"   ⚠️ agg_lead_time_diario cobre {itens_sketch or 0:,} itens de {fact_count:,} (sem data ou dias de envio)")
+        for chave, cobertura in manifesto["cobertura_joins"]["fact_vendas"].items():
+            print(f"   {'✅' if cobertura == 1 else '⚠️'} Cobertura {chave}: {cobertura:.2%}")
         
-        print(f"   Total de vendas: {test_query['total'].iloc[0]:,}")
-        print(f"   Faturamento: ${test_query['faturamento_total'].iloc[0]:,.2f}")
-        print(f"   Lucro médio: ${test_query['lucro_medio'].iloc[0]:,.2f}")
+        if publicar:
+            publicar_snapshot(gold_dir, OUTPUT_GOLD_DIR)
         
         print("\n✅ Pipeline Gold concluído! Pronto para o Dashboard.")
+        return True
 
     except Exception as e:
         print(f"\n❌ ERRO na camada Gold: {e}")
         import traceback
         traceback.print_exc()
+        if publicar:
+            descartar_snapshot(gold_dir)
+        return False
         
     finally:
         con.close()
 
+def create_gold_clickstream(gold_dir=None):
+    """
+    Cria o clickstream da Gold a partir da Silver de acessos.
+    
+    - fact_acessos - Uma linha por visualização de produto, com sessão (IP + inatividade)
+      e chaves id_tempo/id_horario/id_produto compatíveis com o Star Schema de vendas
+    - agg_interesse_produto_diario - Visualizações, visitantes e sessões por dia e produto
+    
+    Tudo roda em SQL sobre Parquet: ordenações e agregações do DuckDB derramam em disco
+    quando passam do memory_limit, então o volume do log não precisa caber em RAM.
+    
+    gold_dir: snapshot de destino já aberto (build_gold). Sem ele, cria um snapshot
+    herdando as tabelas publicadas e o publica ao final.
+    """
+    print("\n🖱️ Construindo clickstream da Gold...")
+    tempos = {}
+    
+    if not os.path.exists(INPUT_SILVER_ACESSOS):
+        print(f"⚠️ Aviso: {INPUT_SILVER_ACESSOS} não encontrado. Clickstream ignorado.")
+        return True
+    
+    publicar = gold_dir is None
+    gold_dir = gold_dir or novo_snapshot(OUTPUT_GOLD_DIR, herdar=True)
+    con = conectar_duckdb("pipeline")
+    
+    try:
+        con.execute("SET preserve_insertion_order = false")
+        
+        # ====================================================================
+        # FATO DE ACESSOS - Sessionização por IP
+        # ====================================================================
+        print("\n👁️ Gerando fact_acessos...")
+        inicio = time.perf_counter()
+        acessos_select = f"""
+            SELECT 
+                {sql_id_tempo('a.data_acesso')} AS id_tempo,
+                CAST(hour(a.data_acesso) * 100 + minute(a.data_acesso) AS {tipo_inteiro('SMALLINT')}) AS id_horario,
+                p.id_produto,
+                hash(a.ip) AS id_visitante,
+                hash(a.ip, a.seq_sessao) AS id_sessao,
+                a.departamento
+            FROM (
+                SELECT 
+                    *,
+                    SUM(nova_sessao) OVER (PARTITION BY ip ORDER BY data_acesso ROWS UNBOUNDED PRECEDING) AS seq_sessao
+                FROM (
+                    SELECT 
+                        ip,
+                        data_acesso,
+                        categoria,
+                        nome_produto,
+                        departamento,
+                        CASE 
+                            WHEN data_acesso - LAG(data_acesso) OVER (PARTITION BY ip ORDER BY data_acesso)
+                                 <= INTERVAL {SESSAO_INATIVIDADE_MIN} MINUTE THEN 0
+                            ELSE 1
+                        END AS nova_sessao
+                    FROM read_parquet('{INPUT_SILVER_ACESSOS}')
+                    WHERE data_acesso IS NOT NULL
+                )
+            ) a
+            LEFT JOIN (SELECT id_produto, categoria, nome_produto FROM read_parquet('{gold_dir}/dim_produtos.parquet')) p 
+                ON a.categoria = p.categoria AND a.nome_produto = p.nome_produto
+        """
+        con.execute(f"""
+            COPY (
+                {sql_clusterizar(acessos_select, ["id_tempo", "id_produto"], "sort")}
+            ) TO '{gold_dir}/fact_acessos.parquet' ({opcoes_parquet_duckdb(row_group_size=FACT_ROW_GROUP_SIZE)})
+        """)
+        
+        acessos_count, sem_produto, sessoes = con.execute(f"""
+            SELECT COUNT(*), COUNT(*) FILTER (WHERE id_produto IS NULL), COUNT(DISTINCT id_sessao)
+            FROM read_parquet('{gold_dir}/fact_acessos.parquet')
+        """).fetchone()
+        print(f"   ✅ {acessos_count:,} visualizações em {sessoes:,} sessões")
+        tempos['fact_acessos'] = time.perf_counter() - inicio
+        if sem_produto:
+            print(f"   ⚠️ {sem_produto:,} visualizações de produtos sem venda (id_produto nulo)")
+        
+        # ====================================================================
+        # ROLLUP DIÁRIO - Interesse por produto
+        # ====================================================================
+        print("\n📈 Gerando agg_interesse_produto_diario...")
+        inicio = time.perf_counter()
+        con.execute(f"""
+            COPY (
+                SELECT 
+                    id_tempo,
+                    id_produto,
+                    COUNT(*) AS visualizacoes,
+                    COUNT(DISTINCT id_visitante) AS visitantes_unicos,
+                    COUNT(DISTINCT id_sessao) AS sessoes
+                FROM read_parquet('{gold_dir}/fact_acessos.parquet')
+                GROUP BY id_tempo, id_produto
+                ORDER BY id_tempo, id_produto
+            ) TO '{gold_dir}/agg_interesse_produto_diario.parquet' ({opcoes_parquet_duckdb()})
+        """)
+        
+        agg_count = con.execute(f"SELECT COUNT(*) FROM read_parquet('{gold_dir}/agg_interesse_produto_diario.parquet')").fetchone()[0]
+        print(f"   ✅ {agg_count:,} combinações dia/produto")
+        tempos['agg_interesse_produto_diario'] = time.perf_counter() - inicio
+        
+        # Complementa o manifesto do Star Schema com as tabelas de clickstream
+        escrever_manifesto(
+            gold_dir,
+            {nome: os.path.join(gold_dir, f"{nome}.parquet") for nome in TABELAS_CLICKSTREAM},
+            tempos,
+            {"fact_acessos": ["id_produto"]},
+            substituir=False,
+        )
+        
+        if publicar:
+            publicar_snapshot(gold_dir, OUTPUT_GOLD_DIR)
+        
+        print("\n✅ Clickstream Gold concluído!")
+        return True
+    
+    except Exception as e:
+        print(f"\n❌ ERRO no clickstream da Gold: {e}")
+        import traceback
+        traceback.print_exc()
+        if publicar:
+            descartar_snapshot(gold_dir)
+        return False
+    
+    finally:
+        con.close()
+
+def build_gold():
+    """
+    Build completo da Gold (Star Schema + clickstream + previsão + anomalias) em um único snapshot.
+    Impacto: o dashboard continua lendo a versão anterior até a troca atômica do ponteiro;
+    se qualquer etapa falhar, o snapshot é descartado e nada muda para os leitores.
+    """
+    gold_dir = novo_snapshot(OUTPUT_GOLD_DIR)
+    
+    if (create_gold_layer_complete(gold_dir) and create_gold_clickstream(gold_dir)
+            and create_gold_forecast(gold_dir) and create_gold_anomalies(gold_dir)):
+        return publicar_snapshot(gold_dir, OUTPUT_GOLD_DIR)
+    
+    print("❌ Gold com erro: snapshot descartado, leitores seguem na versão publicada.")
+    descartar_snapshot(gold_dir)
+    return None
+
 if __name__ == "__main__":
-    create_gold_layer_complete()
\ No newline at end of file
+    build_gold()
\ No newline at end of file
@@ -1,11 +1,35 @@
-import duckdb
 import os
+import sys
 import pandas as pd
 import datetime
 
+# pasta raiz ao caminho de busca do Python (permite executar o módulo diretamente)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.utils.helpers import (
+    conectar_duckdb,
+    esquema_parquet,
+    opcoes_parquet_duckdb,
+    opcoes_parquet_pandas,
+    STORAGE_PROFILE,
+)
+
 # Caminhos
 INPUT_CSV = "data/bronze/raw/DataCoSupplyChainDataset.csv"
 OUTPUT_SILVER = "data/silver/vendas_logistica.parquet"
+INPUT_ACCESS_LOGS = "data/bronze/raw/tokenized_access_logs.csv"
+OUTPUT_SILVER_ACESSOS = "data/silver/acessos.parquet"
+
+# Tipos fixos da Silver nos perfis compacto/arquivo: texto de baixa cardinalidade como
+# dicionário (ENUM) e inteiros estreitos com folga para o domínio (não para os dados atuais)
+TIPOS_COMPACTOS = {
+    'categoria': 'dicionario', 'status_entrega': 'dicionario', 'modo_envio': 'dicionario',
+    'cliente_cidade': 'dicionario', 'cliente_estado': 'dicionario', 'cliente_pais': 'dicionario',
+    'pedido_cidade': 'dicionario', 'pedido_estado': 'dicionario', 'pedido_pais': 'dicionario',
+    'pedido_regiao': 'dicionario',
+    'dias_envio_real': 'int8', 'dias_envio_agendado': 'int8',
+    'id_pedido_original': 'int32', 'id_produto_original': 'int32', 'id_cliente_original': 'int32',
+}
 
 def quality_check(df):
     """
@@ -72,7 +96,7 @@ def process_silver_layer():
         print(f"📋 Colunas disponíveis no CSV: {df_raw.columns.tolist()[:10]}...")
         
         # 2. Conectamos o DuckDB ao DataFrame do Pandas
-        con = duckdb.connect()
+        con = conectar_duckdb("pipeline")
         
         # ✅ AGORA COM TODAS AS COLUNAS NECESSÁRIAS
         df_cleaned = con.execute(f"""
@@ -134,20 +158,85 @@ def process_silver_layer():
         # Auditoria de Qualidade
         df_final = quality_check(df_cleaned)
 
-        # 4. Salvando em Parquet
-        df_final.to_parquet(OUTPUT_SILVER, index=False)
+        # 4. Salvando em Parquet (tipos e codec conforme o perfil de armazenamento)
+        df_final.to_parquet(
+            OUTPUT_SILVER, index=False, schema=esquema_parquet(df_final, TIPOS_COMPACTOS), **opcoes_parquet_pandas()
+        )
         
         print(f"\n✅ Silver concluída com SUCESSO!")
         print(f"📊 Registros processados: {len(df_final):,}")
         print(f"🌍 Países únicos: {df_final['cliente_pais'].nunique()}")
         print(f"📦 Categorias: {df_final['categoria'].nunique()}")
         print(f"📍 Cidades: {df_final['cliente_cidade'].nunique()}")
-        print(f"\n💾 Arquivo salvo em: {OUTPUT_SILVER}")
+        print(f"\n💾 Arquivo salvo em: {OUTPUT_SILVER} (perfil: {STORAGE_PROFILE})")
+        return True
 
     except Exception as e:
         print(f"❌ Erro crítico na Silver: {e}")
         import traceback
         traceback.print_exc()
+        return False
+
+def process_silver_access_logs():
+    """
+    Limpa o log de acessos (clickstream) do DataCo direto do CSV para Parquet.
+    Impacto: o arquivo é maior que o de pedidos, então nunca passa pelo Pandas; o DuckDB
+    lê e grava em streaming (blocos de vetores), com memória limitada pelo perfil pipeline.
+    """
+    print("🖱️ Camada Silver: Log de Acessos (clickstream)...")
+
+    if not os.path.exists(INPUT_ACCESS_LOGS):
+        print(f"⚠️ Aviso: {INPUT_ACCESS_LOGS} não encontrado. Clickstream ignorado.")
+        return True
+
+    os.makedirs("data/silver", exist_ok=True)
+    con = conectar_duckdb("pipeline")
+
+    try:
+        # Sem garantia de ordem, o COPY não precisa reter blocos para reordenar a saída
+        con.execute("SET preserve_insertion_order = false")
+
+        print(f"📖 Lendo arquivo em: {INPUT_ACCESS_LOGS}")
+        con.execute(f"""
+            COPY (
+                SELECT 
+                    TRIM("Category") AS categoria,
+                    TRIM("Product") AS nome_produto,
+                    TRIM("Department") AS departamento,
+                    try_strptime(TRIM("Date"), '%m/%d/%Y %H:%M') AS data_acesso,
+                    TRIM("ip") AS ip,
+                    TRIM("url") AS url
+                FROM read_csv(
+                    '{INPUT_ACCESS_LOGS}',
+                    header = true,
+                    all_varchar = true,
+                    ignore_errors = true
+                )
+                WHERE "Product" IS NOT NULL
+            ) TO '{OUTPUT_SILVER_ACESSOS}' ({opcoes_parquet_duckdb()})
+        """)
+
+        total, sem_data = con.execute(f"""
+            SELECT COUNT(*), COUNT(*) FILTER (WHERE data_acesso IS NULL)
+            FROM read_parquet('{OUTPUT_SILVER_ACESSOS}')
+        """).fetchone()
+
+        print("\n✅ Silver de acessos concluída!")
+        print(f"📊 Acessos processados: {total:,}")
+        if sem_data:
+            print(f"⚠️ {sem_data:,} acessos com data inválida (excluídos na Gold).")
+        print(f"💾 Arquivo salvo em: {OUTPUT_SILVER_ACESSOS}")
+        return True
+
+    except Exception as e:
+        print(f"❌ Erro crítico na Silver de acessos: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+    finally:
+        con.close()
 
 if __name__ == "__main__":
-    process_silver_layer()
\ No newline at end of file
+    process_silver_layer()
+    process_silver_access_logs()
\ No newline at end of file
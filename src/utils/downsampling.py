@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+
+# Granularidades do seletor do dashboard -> regra de resample do Pandas
+GRANULARIDADES = {
+    "Dia": "D",
+    "Semana": "W-MON",
+    "Mês": "MS",
+}
+
+
+def reamostrar_serie(df, coluna_data, agregacoes, granularidade="Dia"):
+    """
+    Agrega um DataFrame na granularidade pedida (Dia, Semana ou Mês).
+    agregacoes: {coluna: função} no formato de DataFrame.agg.
+    """
+    regra = GRANULARIDADES[granularidade]
+    serie = (
+        df.assign(**{coluna_data: pd.to_datetime(df[coluna_data])})
+        .set_index(coluna_data)
+        .resample(regra, label="left", closed="left")
+        .agg(agregacoes)
+        .dropna(how="all")
+        .reset_index()
+    )
+    return serie
+
+
+def lttb(x, y, n_pontos):
+    """
+    Largest-Triangle-Three-Buckets: escolhe n_pontos índices que preservam a forma da série
+    (picos e vales), em vez de amostragem uniforme que apaga extremos.
+
+    Retorna os índices selecionados (sempre inclui o primeiro e o último ponto).
+    """
+    n = len(y)
+    if n_pontos >= n or n_pontos < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    # Limites dos buckets internos (o primeiro e o último ponto são fixos)
+    limites = np.linspace(1, n - 1, n_pontos - 1).astype(np.int64)
+    indices = np.empty(n_pontos, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n - 1
+
+    anterior = 0
+    for i in range(n_pontos - 2):
+        inicio, fim = limites[i], limites[i + 1]
+
+        # Média do próximo bucket (ou o último ponto, no bucket final)
+        prox_inicio = fim
+        prox_fim = limites[i + 2] if i + 2 < len(limites) else n
+        media_x = x[prox_inicio:prox_fim].mean()
+        media_y = y[prox_inicio:prox_fim].mean()
+
+        # Área do triângulo (ponto anterior escolhido, candidato, média do próximo bucket)
+        ax, ay = x[anterior], y[anterior]
+        areas = np.abs(
+            (ax - media_x) * (y[inicio:fim] - ay) - (ax - x[inicio:fim]) * (media_y - ay)
+        )
+        anterior = inicio + int(np.argmax(areas))
+        indices[i + 1] = anterior
+
+    return indices
+
+
+def reduzir_para_pixels(df, coluna_x, coluna_y, n_pontos):
+    """Aplica LTTB a uma coluna de um DataFrame ordenado por coluna_x."""
+    if len(df) <= n_pontos:
+        return df
+    x = pd.to_datetime(df[coluna_x]).astype("int64").to_numpy()
+    return df.iloc[lttb(x, df[coluna_y].to_numpy(), n_pontos)]
@@ -0,0 +1,161 @@
+import json
+import os
+
+import duckdb
+import pyarrow as pa
+from dotenv import load_dotenv
+
+# Arquivo opcional de configuração de recursos do DuckDB (sobrescrito pelas variáveis de ambiente)
+DUCKDB_CONFIG_FILE = os.getenv("DUCKDB_CONFIG_FILE", "config/duckdb.json")
+
+# Perfis padrão: o pipeline pode usar a máquina inteira e derramar em disco;
+# o dashboard fica com uma fatia menor para não competir com builds da Gold no mesmo host
+PERFIS_PADRAO = {
+    "pipeline": {
+        "threads": None,
+        "memory_limit": None,
+        "temp_directory": "data/tmp/duckdb",
+        "max_temp_directory_size": None,
+    },
+    "dashboard": {
+        "threads": 2,
+        "memory_limit": "2GB",
+        "temp_directory": None,
+        "max_temp_directory_size": None,
+    },
+}
+
+OPCOES_DUCKDB = ["threads", "memory_limit", "temp_directory", "max_temp_directory_size"]
+
+
+def carregar_config_duckdb(perfil="pipeline"):
+    """
+    Resolve a configuração de recursos do DuckDB para um perfil.
+
+    Precedência (maior para menor):
+    1. Variáveis de ambiente do perfil: DUCKDB_<PERFIL>_THREADS, DUCKDB_<PERFIL>_MEMORY_LIMIT, ...
+    2. Variáveis globais: DUCKDB_THREADS, DUCKDB_MEMORY_LIMIT, ...
+    3. Seção do perfil no arquivo JSON (DUCKDB_CONFIG_FILE)
+    4. PERFIS_PADRAO
+    """
+    load_dotenv()
+    config = dict(PERFIS_PADRAO.get(perfil, PERFIS_PADRAO["pipeline"]))
+
+    if os.path.exists(DUCKDB_CONFIG_FILE):
+        with open(DUCKDB_CONFIG_FILE, encoding="utf-8") as f:
+            config.update(json.load(f).get(perfil, {}))
+
+    for opcao in OPCOES_DUCKDB:
+        valor = os.getenv(f"DUCKDB_{perfil.upper()}_{opcao.upper()}") or os.getenv(f"DUCKDB_{opcao.upper()}")
+        if valor:
+            config[opcao] = valor
+
+    if config.get("threads") is not None:
+        config["threads"] = int(config["threads"])
+
+    return {k: v for k, v in config.items() if k in OPCOES_DUCKDB and v is not None}
+
+
+def conectar_duckdb(perfil="pipeline"):
+    """
+    Abre uma conexão DuckDB em memória com os limites de recursos do perfil.
+    Impacto: threads, teto de memória e diretório de spill controlados em um único lugar.
+    """
+    config = carregar_config_duckdb(perfil)
+    if "temp_directory" in config:
+        os.makedirs(config["temp_directory"], exist_ok=True)
+    return duckdb.connect(config=config)
+
+
+# ============================================================================
+# PERFIS DE ARMAZENAMENTO (PARQUET)
+# ============================================================================
+
+# Perfil ativo de escrita Silver/Gold (padrao | compacto | arquivo)
+STORAGE_PROFILE = os.getenv("STORAGE_PROFILE", "padrao")
+
+PERFIS_ARMAZENAMENTO = {
+    # Comportamento original: snappy, strings e inteiros de 64 bits
+    "padrao": {
+        "compression": "snappy",
+        "compression_level": None,
+        "row_group_size": 122_880,
+        "data_page_size": None,
+        "compactar_tipos": False,
+    },
+    # Dia a dia: zstd rápido + dicionário para colunas de baixa cardinalidade + inteiros estreitos
+    "compacto": {
+        "compression": "zstd",
+        "compression_level": 3,
+        "row_group_size": 122_880,
+        "data_page_size": 1024 * 1024,
+        "compactar_tipos": True,
+    },
+    # Histórico/arquivamento: máxima compressão, leitura um pouco mais lenta
+    "arquivo": {
+        "compression": "zstd",
+        "compression_level": 15,
+        "row_group_size": 1_000_000,
+        "data_page_size": 4 * 1024 * 1024,
+        "compactar_tipos": True,
+    },
+}
+
+
+def perfil_armazenamento(perfil=None):
+    """Retorna o dicionário do perfil de armazenamento (padrão: STORAGE_PROFILE)."""
+    perfil = perfil or STORAGE_PROFILE
+    if perfil not in PERFIS_ARMAZENAMENTO:
+        raise ValueError(f"Perfil de armazenamento desconhecido: {perfil}")
+    return PERFIS_ARMAZENAMENTO[perfil]
+
+
+def opcoes_parquet_duckdb(perfil=None, row_group_size=None):
+    """
+    Opções do COPY ... TO (FORMAT PARQUET, ...) do DuckDB para o perfil.
+    O DuckDB não expõe tamanho de página; apenas codec, nível e row group.
+    """
+    p = perfil_armazenamento(perfil)
+    opcoes = ["FORMAT PARQUET", f"COMPRESSION {p['compression']}"]
+    if p["compression_level"] is not None:
+        opcoes.append(f"COMPRESSION_LEVEL {p['compression_level']}")
+    opcoes.append(f"ROW_GROUP_SIZE {row_group_size or p['row_group_size']}")
+    return ", ".join(opcoes)
+
+
+def opcoes_parquet_pandas(perfil=None):
+    """Argumentos de DataFrame.to_parquet (engine pyarrow) para o perfil."""
+    p = perfil_armazenamento(perfil)
+    opcoes = {"engine": "pyarrow", "compression": p["compression"], "row_group_size": p["row_group_size"]}
+    if p["compression_level"] is not None:
+        opcoes["compression_level"] = p["compression_level"]
+    if p["data_page_size"] is not None:
+        opcoes["data_page_size"] = p["data_page_size"]
+    return opcoes
+
+
+def esquema_parquet(df, tipos, perfil=None):
+    """
+    Schema Arrow de gravação (DataFrame.to_parquet(schema=...)) para o perfil, ou None no
+    perfil padrão. `tipos` fixa o tipo de cada coluna: "dicionario" (texto de baixa
+    cardinalidade, gravado como dicionário/ENUM) ou um inteiro estreito ("int8", "int32"...).
+    O tipo é o mesmo a cada execução, independente dos valores do dia; um valor fora da faixa
+    faz a conversão (segura) do pyarrow falhar em vez de truncar.
+    """
+    if not perfil_armazenamento(perfil)["compactar_tipos"]:
+        return None
+
+    esquema = pa.Schema.from_pandas(df, preserve_index=False)
+    for col, tipo in tipos.items():
+        if col in esquema.names:
+            tipo_arrow = pa.dictionary(pa.int32(), pa.string()) if tipo == "dicionario" else pa.type_for_alias(tipo)
+            esquema = esquema.set(esquema.get_field_index(col), pa.field(col, tipo_arrow))
+    return esquema
+
+
+def tipo_inteiro(estreito, perfil=None, largo="BIGINT"):
+    """
+    Tipo SQL de uma coluna inteira da Gold: o estreito (ex.: TINYINT) nos perfis que
+    compactam tipos, o largo (BIGINT, como o DuckDB devolve) no perfil padrão.
+    """
+    return estreito if perfil_armazenamento(perfil)["compactar_tipos"] else largo
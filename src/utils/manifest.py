@@ -0,0 +1,111 @@
+import datetime
+import hashlib
+import json
+import os
+
+import pyarrow.parquet as pq
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSAO = 1
+
+
+def checksum_arquivo(path, bloco=1024 * 1024):
+    """SHA-256 do arquivo lido em blocos (memória constante)."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(bloco), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def estatisticas_parquet(path):
+    """
+    Linhas, row groups e min/max/nulos por coluna lidos apenas do rodapé do Parquet.
+    Impacto: nenhuma página de dados é lida; custo independe do tamanho da tabela.
+    """
+    meta = pq.ParquetFile(path).metadata
+    colunas = {}
+
+    for rg in range(meta.num_row_groups):
+        row_group = meta.row_group(rg)
+        for c in range(row_group.num_columns):
+            col = row_group.column(c)
+            info = colunas.setdefault(col.path_in_schema, {
+                "tipo": col.physical_type, "min": None, "max": None, "nulos": 0,
+            })
+            stats = col.statistics
+            if stats is None:
+                continue
+            if stats.null_count is not None:
+                info["nulos"] += stats.null_count
+            if stats.has_min_max:
+                info["min"] = stats.min if info["min"] is None else min(info["min"], stats.min)
+                info["max"] = stats.max if info["max"] is None else max(info["max"], stats.max)
+
+    return {
+        "linhas": meta.num_rows,
+        "row_groups": meta.num_row_groups,
+        "colunas": colunas,
+    }
+
+
+def descrever_tabela(path):
+    """Entrada do manifesto para um arquivo Parquet da Gold."""
+    return {
+        "arquivo": os.path.basename(path),
+        "bytes": os.path.getsize(path),
+        "sha256": checksum_arquivo(path),
+        **estatisticas_parquet(path),
+    }
+
+
+def cobertura_joins(tabela, chaves):
+    """Fração de linhas da fato com cada chave de dimensão preenchida (a partir dos nulos do rodapé)."""
+    linhas = tabela["linhas"]
+    return {
+        chave: round(1 - tabela["colunas"][chave]["nulos"] / linhas, 6) if linhas else None
+        for chave in chaves
+        if chave in tabela["colunas"]
+    }
+
+
+def ler_manifesto(gold_dir):
+    """Manifesto da Gold como dict, ou None se ainda não existir."""
+    path = os.path.join(gold_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def escrever_manifesto(gold_dir, tabelas, tempos, coberturas, substituir=True):
+    """
+    Grava (ou complementa, com substituir=False) o manifest.json da Gold.
+
+    tabelas: {nome: caminho do parquet}
+    tempos: {etapa: segundos}
+    coberturas: {tabela: [colunas de chave estrangeira]}
+    """
+    manifesto = None if substituir else ler_manifesto(gold_dir)
+    if manifesto is None:
+        manifesto = {"versao": MANIFEST_VERSAO, "tabelas": {}, "cobertura_joins": {}, "tempos_s": {}}
+
+    manifesto["gerado_em"] = datetime.datetime.now().isoformat(timespec="seconds")
+
+    for nome, path in tabelas.items():
+        manifesto["tabelas"][nome] = descrever_tabela(path)
+
+    for nome, chaves in coberturas.items():
+        manifesto["cobertura_joins"][nome] = cobertura_joins(manifesto["tabelas"][nome], chaves)
+
+    manifesto["tempos_s"].update({etapa: round(t, 3) for etapa, t in tempos.items()})
+
+    # Grava em arquivo novo + os.replace: um manifesto herdado por hard link (snapshot
+    # parcial) não pode ser sobrescrito no lugar, senão o snapshot anterior mudaria junto
+    path = os.path.join(gold_dir, MANIFEST_NAME)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifesto, f, ensure_ascii=False, indent=2, default=str)
+    os.replace(tmp, path)
+
+    return manifesto
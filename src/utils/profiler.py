@@ -0,0 +1,86 @@
+import datetime
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Um profiler por thread: o Streamlit executa cada sessão (e seus fragmentos) na própria thread
+_estado = threading.local()
+
+
+def ativo():
+    """True se há um profiler coletando eventos nesta thread."""
+    return getattr(_estado, "eventos", None) is not None
+
+
+def iniciar(execucao):
+    """Começa a coletar eventos para uma execução (página inteira ou fragmento)."""
+    _estado.execucao = execucao
+    _estado.inicio = time.perf_counter()
+    _estado.eventos = []
+    _estado.misses = {}
+    _estado.profundidade = 0
+
+
+def marcar_miss(funcao):
+    """Chamado no corpo de uma função cacheada: o corpo só roda em cache miss."""
+    if ativo():
+        _estado.misses[funcao] = _estado.misses.get(funcao, 0) + 1
+
+
+def registrar_linhas(nome, lidas, retornadas):
+    """Registra linhas lidas vs. retornadas por uma consulta ou agregação."""
+    if ativo():
+        _estado.eventos.append({
+            "categoria": "linhas", "nome": nome, "nivel": _estado.profundidade,
+            "linhas_lidas": int(lidas), "linhas_retornadas": int(retornadas),
+        })
+
+
+@contextmanager
+def medir(categoria, nome, cache=None):
+    """
+    Cronometra um bloco. Com cache=<nome da função cacheada>, também registra hit/miss
+    comparando os misses marcados pela função antes e depois do bloco.
+    Sem profiler ativo, não faz nada (custo zero fora do modo profiling).
+    """
+    if not ativo():
+        yield
+        return
+
+    evento = {"categoria": categoria, "nome": nome, "nivel": _estado.profundidade}
+    _estado.eventos.append(evento)
+    misses_antes = _estado.misses.get(cache, 0)
+    _estado.profundidade += 1
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        evento["ms"] = round((time.perf_counter() - inicio) * 1000, 2)
+        _estado.profundidade -= 1
+        if cache is not None:
+            evento["cache"] = "miss" if _estado.misses.get(cache, 0) > misses_antes else "hit"
+
+
+def finalizar(log_path=None):
+    """
+    Encerra a coleta, grava uma linha JSON no log (se informado) e devolve o resumo.
+    """
+    if not ativo():
+        return None
+
+    resumo = {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "execucao": _estado.execucao,
+        "total_ms": round((time.perf_counter() - _estado.inicio) * 1000, 2),
+        "eventos": _estado.eventos,
+    }
+    _estado.eventos = None
+
+    if log_path:
+        os.makedirs(os.path.dirname(log_path), exist_ok=True)
+        with open(log_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(resumo, ensure_ascii=False) + "\n")
+
+    return resumo
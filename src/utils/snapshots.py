@@ -0,0 +1,182 @@
+import datetime
+import os
+import shutil
+
+from src.utils.manifest import ler_manifesto
+
+# Estrutura:
+#   data/gold/CURRENT                 -> nome do snapshot publicado (trocado atomicamente)
+#   data/gold/snapshots/<versao>/     -> um Star Schema completo e imutável por build
+SNAPSHOTS_SUBDIR = "snapshots"
+POINTER_NAME = "CURRENT"
+
+# Quantos snapshots publicados manter para rollback
+SNAPSHOTS_MANTIDOS = int(os.getenv("GOLD_SNAPSHOTS_MANTIDOS", "5"))
+
+# Tabelas lidas pelo dashboard: só mudanças nelas trocam o snapshot canônico (chave dos caches)
+TABELAS_DASHBOARD = [
+    "fact_vendas", "fact_pedidos", "agg_lead_time_diario", "agg_previsao_vendas", "agg_anomalias",
+    "agg_anomalias_estado", "dim_produtos", "dim_clientes", "dim_logistica", "dim_tempo",
+]
+
+
+def _snapshots_dir(gold_root):
+    return os.path.join(gold_root, SNAPSHOTS_SUBDIR)
+
+
+def listar_snapshots(gold_root):
+    """Versões existentes, da mais antiga para a mais recente (o nome é um timestamp ordenável)."""
+    base = _snapshots_dir(gold_root)
+    if not os.path.isdir(base):
+        return []
+    return sorted(d for d in os.listdir(base) if os.path.isdir(os.path.join(base, d)) and not d.startswith("."))
+
+
+def versao_atual(gold_root):
+    """Versão publicada no ponteiro CURRENT, ou None se a Gold ainda não usa snapshots."""
+    pointer = os.path.join(gold_root, POINTER_NAME)
+    if not os.path.exists(pointer):
+        return None
+    with open(pointer, encoding="utf-8") as f:
+        return f.read().strip() or None
+
+
+def snapshot_atual(gold_root):
+    """
+    Diretório do snapshot publicado. Leitores devem resolver isto UMA vez por consulta
+    e usar o caminho retornado para todas as tabelas (fato e dimensões da mesma versão).
+    Sem ponteiro, cai no layout antigo (arquivos direto em gold_root).
+    """
+    versao = versao_atual(gold_root)
+    if versao is None:
+        return gold_root
+    return os.path.join(_snapshots_dir(gold_root), versao)
+
+
+def assinatura_tabelas(snapshot_dir, tabelas=TABELAS_DASHBOARD):
+    """sha256 das tabelas segundo o manifesto do snapshot (None se indisponível)."""
+    manifesto = ler_manifesto(snapshot_dir)
+    if not manifesto:
+        return None
+    registradas = manifesto.get("tabelas", {})
+    return tuple(registradas.get(nome, {}).get("sha256") for nome in tabelas)
+
+
+def snapshot_canonico(gold_root, tabelas=TABELAS_DASHBOARD):
+    """
+    O snapshot MAIS ANTIGO, numa sequência contínua até o publicado, cujas `tabelas` são
+    idênticas (sha256 do manifesto) às do publicado. Sem manifesto completo, o próprio publicado.
+    Impacto: builds que só alteram outras tabelas (ex.: clickstream) não trocam a chave dos caches.
+    limpar_snapshots nunca apaga este snapshot, então leitores que o usam como chave podem ler dele.
+    """
+    atual = snapshot_atual(gold_root)
+    assinatura = assinatura_tabelas(atual, tabelas)
+    if assinatura is None or None in assinatura:
+        return atual
+
+    canonico = atual
+    versoes = listar_snapshots(gold_root)
+    versao = os.path.basename(atual)
+    anteriores = versoes[:versoes.index(versao)] if versao in versoes else []
+    for anterior in reversed(anteriores):
+        path = os.path.join(_snapshots_dir(gold_root), anterior)
+        if assinatura_tabelas(path, tabelas) != assinatura:
+            break
+        canonico = path
+    return canonico
+
+
+def novo_snapshot(gold_root, herdar=False):
+    """
+    Cria um diretório de snapshot vazio para um novo build (invisível aos leitores até publicar).
+    herdar=True traz as tabelas do snapshot atual via hard link, para builds parciais.
+    """
+    versao = datetime.datetime.now().strftime("%Y%m%dT%H%M%S_%f")
+    destino = os.path.join(_snapshots_dir(gold_root), versao)
+    os.makedirs(destino)
+
+    if herdar:
+        origem = snapshot_atual(gold_root)
+        for nome in os.listdir(origem):
+            src = os.path.join(origem, nome)
+            if not os.path.isfile(src) or nome == POINTER_NAME:
+                continue
+            try:
+                os.link(src, os.path.join(destino, nome))
+            except OSError:
+                shutil.copy2(src, os.path.join(destino, nome))
+
+    return destino
+
+
+def publicar_snapshot(snapshot_dir, gold_root):
+    """
+    Publica o snapshot trocando o ponteiro CURRENT com os.replace (atômico em POSIX e Windows):
+    um leitor vê a versão antiga inteira ou a nova inteira, nunca uma mistura.
+    """
+    versao = os.path.basename(os.path.normpath(snapshot_dir))
+    pointer = os.path.join(gold_root, POINTER_NAME)
+    tmp = f"{pointer}.{versao}.tmp"
+
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(versao)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, pointer)
+
+    print(f"📌 Snapshot Gold publicado: {versao}")
+    limpar_snapshots(gold_root)
+    return versao
+
+
+def descartar_snapshot(snapshot_dir):
+    """Remove um snapshot que falhou antes de ser publicado."""
+    shutil.rmtree(snapshot_dir, ignore_errors=True)
+
+
+def limpar_snapshots(gold_root, manter=None):
+    """
+    Apaga os snapshots mais antigos, mantendo os N mais recentes, o publicado e o canônico
+    do publicado (snapshot_canonico): o dashboard lê do canônico enquanto ele for equivalente.
+    """
+    manter = SNAPSHOTS_MANTIDOS if manter is None else manter
+    atual = versao_atual(gold_root)
+    canonico = os.path.basename(snapshot_canonico(gold_root)) if atual else None
+    versoes = listar_snapshots(gold_root)
+
+    for versao in versoes[:-manter] if manter > 0 else versoes:
+        if versao not in (atual, canonico):
+            shutil.rmtree(os.path.join(_snapshots_dir(gold_root), versao), ignore_errors=True)
+
+
+def rollback_snapshot(gold_root, versao=None):
+    """Republica uma versão anterior (padrão: a imediatamente anterior à atual)."""
+    versoes = listar_snapshots(gold_root)
+    atual = versao_atual(gold_root)
+
+    if versao is None:
+        anteriores = [v for v in versoes if atual is None or v < atual]
+        if not anteriores:
+            print("⚠️ Nenhum snapshot anterior disponível para rollback.")
+            return None
+        versao = anteriores[-1]
+
+    if versao not in versoes:
+        raise ValueError(f"Snapshot inexistente: {versao}")
+
+    return publicar_snapshot(os.path.join(_snapshots_dir(gold_root), versao), gold_root)
+
+
+if __name__ == "__main__":
+    # Uso: python src/utils/snapshots.py [listar | rollback [versao]]
+    import sys
+
+    GOLD_ROOT = "data/gold"
+    acao = sys.argv[1] if len(sys.argv) > 1 else "listar"
+
+    if acao == "rollback":
+        rollback_snapshot(GOLD_ROOT, sys.argv[2] if len(sys.argv) > 2 else None)
+    else:
+        atual = versao_atual(GOLD_ROOT)
+        for versao in listar_snapshots(GOLD_ROOT):
+            print(f"{'📌' if versao == atual else '  '} {versao}")
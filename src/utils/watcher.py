@@ -0,0 +1,44 @@
+import json
+import os
+
+
+def estado_arquivos(diretorio):
+    """
+    Tamanho e mtime de cada arquivo sob `diretorio` (apenas metadados do sistema de arquivos;
+    nenhum byte de dado é lido). Caminhos relativos com '/' para serem estáveis entre SOs.
+    """
+    estado = {}
+    for raiz, _, arquivos in os.walk(diretorio):
+        for nome in arquivos:
+            if nome.startswith("."):
+                continue
+            path = os.path.join(raiz, nome)
+            try:
+                info = os.stat(path)
+            except FileNotFoundError:
+                continue  # Removido entre o walk e o stat
+            rel = os.path.relpath(path, diretorio).replace("\\", "/")
+            estado[rel] = [info.st_size, info.st_mtime_ns]
+    return estado
+
+
+def alterados(anterior, atual):
+    """Arquivos novos ou modificados entre dois estados."""
+    return sorted(path for path, meta in atual.items() if anterior.get(path) != meta)
+
+
+def ler_estado(path):
+    """Último estado processado (persistido entre execuções do watch), ou {}."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def salvar_estado(path, estado):
+    """Grava o estado processado de forma atômica."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(estado, f)
+    os.replace(tmp, path)
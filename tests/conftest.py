@@ -0,0 +1,103 @@
+import os
+import sys
+
+import duckdb
+import pytest
+
+# pasta raiz ao caminho de busca do Python (os testes importam src.* como os scripts do projeto)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+DIAS = 20
+PRODUTOS = 6
+
+
+@pytest.fixture
+def gold_dir(tmp_path):
+    """
+    Star Schema mínimo no layout da Gold: fato ordenada pela chave de paginação
+    (id_tempo, id_produto, seq_item), empates e nulos nas métricas e um sketch de lead time.
+    """
+    destino = str(tmp_path / "gold").replace("\\", "/")
+    os.makedirs(destino)
+    con = duckdb.connect()
+    try:
+        con.execute(f"""
+            COPY (
+                SELECT CAST(i AS INTEGER) AS id_produto,
+                       ['A', 'B', 'C'][(i % 3) + 1] AS categoria,
+                       'Produto ' || i AS nome_produto
+                FROM range(1, {PRODUTOS + 1}) t(i)
+            ) TO '{destino}/dim_produtos.parquet' (FORMAT PARQUET)
+        """)
+        con.execute(f"""
+            COPY (
+                SELECT CAST(i AS INTEGER) AS id_cliente,
+                       'Cidade ' || i AS cliente_cidade,
+                       'Estado ' || (i % 2) AS cliente_estado,
+                       ['Brasil', 'Chile'][(i % 2) + 1] AS cliente_pais
+                FROM range(1, 5) t(i)
+            ) TO '{destino}/dim_clientes.parquet' (FORMAT PARQUET)
+        """)
+        con.execute(f"""
+            COPY (
+                SELECT * FROM (VALUES
+                    (1, 'Late delivery', 'Standard Class', 4),
+                    (2, 'Shipping on time', 'First Class', 1),
+                    (3, 'Advance shipping', 'Second Class', 2)
+                ) t(id_logistica, status_entrega, modo_envio, dias_envio_agendado)
+            ) TO '{destino}/dim_logistica.parquet' (FORMAT PARQUET)
+        """)
+        con.execute(f"""
+            COPY (
+                SELECT CAST(strftime(dia, '%Y%m%d') AS INTEGER) AS id_tempo,
+                       CAST(dia AS DATE) AS data_completa,
+                       year(dia) AS ano,
+                       month(dia) AS mes
+                FROM range(DATE '2024-01-25', DATE '2024-01-25' + INTERVAL {DIAS} DAY, INTERVAL 1 DAY) t(dia)
+            ) TO '{destino}/dim_tempo.parquet' (FORMAT PARQUET)
+        """)
+        # 1 a 3 itens por (dia, produto); valores repetidos e nulos de propósito
+        con.execute(f"""
+            COPY (
+                WITH itens AS (
+                    SELECT t.id_tempo, CAST(p AS INTEGER) AS id_produto, CAST(k AS INTEGER) AS seq_item
+                    FROM read_parquet('{destino}/dim_tempo.parquet') t,
+                         range(1, {PRODUTOS + 1}) u(p),
+                         range(1, 4) v(k)
+                    WHERE k <= 1 + (t.id_tempo + p) % 3
+                ),
+                numerados AS (
+                    SELECT *, ROW_NUMBER() OVER (ORDER BY id_tempo, id_produto, seq_item) AS n FROM itens
+                )
+                SELECT
+                    id_tempo,
+                    CAST((n * 7) % 1440 AS SMALLINT) AS id_horario,
+                    id_produto,
+                    CAST(n % 4 + 1 AS INTEGER) AS id_cliente,
+                    CAST(n % 3 + 1 AS INTEGER) AS id_logistica,
+                    CAST(1000 + n AS INTEGER) AS id_pedido_original,
+                    CAST(n % 5 AS INTEGER) AS dias_envio_real,
+                    CASE WHEN n % 11 = 0 THEN NULL ELSE (n % 5) * 10.0 END AS valor_venda,
+                    CASE WHEN n % 7 = 0 THEN NULL ELSE (n % 3) * 2.5 END AS lucro_pedido,
+                    80.0 AS brent_diario,
+                    seq_item
+                FROM numerados
+                ORDER BY id_tempo, id_produto, seq_item
+            ) TO '{destino}/fact_vendas.parquet' (FORMAT PARQUET, ROW_GROUP_SIZE 64)
+        """)
+        con.execute(f"""
+            COPY (
+                SELECT f.id_tempo, l.modo_envio, 'Regiao ' || (f.id_cliente % 2) AS pedido_regiao, p.categoria,
+                       CAST(f.dias_envio_real AS TINYINT) AS dias_envio_real,
+                       CAST(l.dias_envio_agendado AS TINYINT) AS dias_envio_agendado,
+                       CAST(COUNT(*) AS INTEGER) AS itens
+                FROM read_parquet('{destino}/fact_vendas.parquet') f
+                JOIN read_parquet('{destino}/dim_logistica.parquet') l USING (id_logistica)
+                JOIN read_parquet('{destino}/dim_produtos.parquet') p USING (id_produto)
+                GROUP BY ALL
+                ORDER BY ALL
+            ) TO '{destino}/agg_lead_time_diario.parquet' (FORMAT PARQUET)
+        """)
+    finally:
+        con.close()
+    return destino
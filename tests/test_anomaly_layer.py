@@ -0,0 +1,93 @@
+import duckdb
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+from src.transform.anomaly_layer import COLUNAS_ESTADO, assinatura_fato, processar_dias
+
+SEGMENTOS = [("categoria", "Cleats"), ("categoria", "Fishing"), ("cidade", "Caguas, EE. UU.")]
+DIA_SEM_VENDAS = 20240131
+DIA_PICO = 20240210
+
+
+def _estado_vazio():
+    return pd.DataFrame(columns=["tipo_segmento", "segmento"] + COLUNAS_ESTADO)
+
+
+@pytest.fixture
+def novos():
+    """
+    Linhas diárias no formato de carregar_dias: um dia inteiro sem vendas, lacunas de um
+    segmento e um pico de vendas e de atraso depois do aquecimento.
+    """
+    rng = np.random.default_rng(7)
+    linhas = []
+    for dia in pd.date_range("2024-01-01", "2024-02-20", freq="D"):
+        id_tempo = int(dia.strftime("%Y%m%d"))
+        if id_tempo == DIA_SEM_VENDAS:
+            continue
+        for i, (tipo, segmento) in enumerate(SEGMENTOS):
+            if segmento == "Fishing" and dia.day % 5 == 0:
+                continue
+            vendas = 1000 * (i + 1) + rng.normal(0, 50)
+            itens = 40 + int(rng.integers(0, 5))
+            atrasados = int(rng.integers(0, 6))
+            if id_tempo == DIA_PICO and segmento == "Cleats":
+                vendas, atrasados = vendas * 8, itens
+            linhas.append((id_tempo, tipo, segmento, vendas, itens, atrasados))
+    return pd.DataFrame(linhas, columns=["id_tempo", "tipo_segmento", "segmento", "vendas", "itens", "atrasados"])
+
+
+def test_incremental_equivale_ao_historico_completo(novos):
+    estado_total, anomalias_total = processar_dias(_estado_vazio(), novos)
+    assert anomalias_total is not None
+    assert ((anomalias_total["id_tempo"] == DIA_PICO) & (anomalias_total["segmento"] == "Cleats")).any()
+
+    # Corte logo antes do dia sem vendas: o segundo lote tem que preencher o calendário desde o corte
+    corte = DIA_SEM_VENDAS - 1
+    estado_1, anomalias_1 = processar_dias(_estado_vazio(), novos[novos["id_tempo"] <= corte])
+    assert int(estado_1["ultimo_id_tempo"].iloc[0]) == corte
+    estado_2, anomalias_2 = processar_dias(estado_1, novos[novos["id_tempo"] > corte], desde=corte)
+
+    colunas = ["tipo_segmento", "segmento"] + COLUNAS_ESTADO + ["ultimo_id_tempo", "config"]
+    pd.testing.assert_frame_equal(estado_2[colunas], estado_total[colunas])
+    incremental = pd.concat([a for a in (anomalias_1, anomalias_2) if a is not None], ignore_index=True)
+    pd.testing.assert_frame_equal(incremental, anomalias_total)
+
+
+def test_dia_sem_vendas_entra_como_zero(novos):
+    # Sem o dia vazio no calendário, o EWMA do dia seguinte partiria de outra média
+    estado, _ = processar_dias(_estado_vazio(), novos)
+    dias_cleats = novos.loc[novos["segmento"] == "Cleats", "id_tempo"].nunique()
+    n_vendas = estado.set_index("segmento").loc["Cleats", "n_vendas"]
+    assert n_vendas == dias_cleats + 1
+
+
+def _reescrever(gold_dir, destino, where="TRUE", row_group_size=50):
+    # pyarrow respeita row groups pequenos (o DuckDB arredonda para cima)
+    destino.mkdir()
+    tabela = duckdb.execute(f"SELECT * FROM read_parquet('{gold_dir}/fact_vendas.parquet') WHERE {where}").to_arrow_table()
+    pq.write_table(tabela, f"{destino}/fact_vendas.parquet", row_group_size=row_group_size)
+    return str(destino)
+
+
+def test_assinatura_independe_dos_row_groups(gold_dir, tmp_path):
+    ate = 20240205
+    con = duckdb.connect()
+    referencia = assinatura_fato(con, gold_dir, ate)
+
+    # Mesmo histórico até o corte: só dias novos depois dele e outros limites de row group
+    build_anterior = _reescrever(gold_dir, tmp_path / "anterior", f"id_tempo <= {ate}", 64)
+    assert assinatura_fato(con, build_anterior, ate) == referencia
+    fatiada = _reescrever(gold_dir, tmp_path / "fatiada")
+    for corte in (20240125, 20240129, 20240202, ate, 20240213):
+        assert assinatura_fato(con, fatiada, corte) == assinatura_fato(con, gold_dir, corte)
+
+    # Histórico corrigido antes do corte: um item a menos muda a assinatura
+    corrigido = _reescrever(gold_dir, tmp_path / "corrigido", "NOT (id_tempo = 20240130 AND seq_item = 1 AND id_produto = 1)")
+    assert assinatura_fato(con, corrigido, ate) != referencia
+    # ... e um dia depois do corte, não
+    posterior = _reescrever(gold_dir, tmp_path / "posterior", "NOT (id_tempo = 20240210 AND seq_item = 1 AND id_produto = 1)")
+    assert assinatura_fato(con, posterior, ate) == referencia
+    con.close()
@@ -0,0 +1,95 @@
+import duckdb
+
+from src.analysis.business_kpis import montar_query
+
+
+def _executar(gold_dir, kpis, agrupamentos, filtros=None):
+    sql, parametros = montar_query(gold_dir, kpis, agrupamentos, filtros)
+    return duckdb.execute(sql, parametros).df()
+
+
+def _total_itens(gold_dir):
+    return duckdb.execute(f"SELECT COUNT(*) FROM read_parquet('{gold_dir}/fact_vendas.parquet')").fetchone()[0]
+
+
+def test_grouping_sets_rotulados(gold_dir):
+    df = _executar(gold_dir, ["total_itens", "faturamento_total"], ["total", "categoria", "categoria_modo", "mes"])
+    total = _total_itens(gold_dir)
+    assert set(df["agrupamento"]) == {"total", "categoria", "categoria_modo", "mes"}
+
+    # Cada conjunto cobre a fato inteira, e só as suas colunas vêm preenchidas
+    for nome, preenchidas in [
+        ("total", []),
+        ("categoria", ["categoria"]),
+        ("categoria_modo", ["categoria", "modo_envio"]),
+        ("mes", ["ano", "mes"]),
+    ]:
+        conjunto = df[df["agrupamento"] == nome]
+        assert conjunto["total_itens"].sum() == total
+        for coluna in ["categoria", "modo_envio", "ano", "mes"]:
+            assert conjunto[coluna].notna().all() if coluna in preenchidas else conjunto[coluna].isna().all()
+
+    assert len(df[df["agrupamento"] == "total"]) == 1
+    assert len(df[df["agrupamento"] == "categoria"]) == 3
+
+
+def test_filtros_como_parametros(gold_dir):
+    df = _executar(gold_dir, ["total_itens"], ["total"], {"categoria": ["A", "C"], "de": 20240201})
+    esperado = duckdb.execute(f"""
+        SELECT COUNT(*)
+        FROM read_parquet('{gold_dir}/fact_vendas.parquet') f
+        JOIN read_parquet('{gold_dir}/dim_produtos.parquet') p USING (id_produto)
+        WHERE p.categoria IN ('A', 'C') AND f.id_tempo >= 20240201
+    """).fetchone()[0]
+    assert 0 < esperado < _total_itens(gold_dir)
+    assert df["total_itens"].tolist() == [esperado]
+
+
+def test_kpi_com_dimensao_fora_do_agrupamento(gold_dir):
+    # taxa_atraso_pct usa dim_logistica mesmo sem agrupar por ela
+    df = _executar(gold_dir, ["taxa_atraso_pct"], ["categoria"])
+    assert df["taxa_atraso_pct"].notna().all()
+
+
+def _criar_fact_pedidos(gold_dir):
+    duckdb.execute(f"""
+        COPY (
+            SELECT id_pedido_original, MIN(id_tempo) AS id_tempo, MIN(id_cliente) AS id_cliente,
+                   MIN(id_logistica) AS id_logistica, COUNT(*) AS itens, SUM(valor_venda) AS valor_pedido
+            FROM read_parquet('{gold_dir}/fact_vendas.parquet')
+            GROUP BY id_pedido_original
+        ) TO '{gold_dir}/fact_pedidos.parquet' (FORMAT PARQUET)
+    """)
+
+
+def test_total_de_pedidos_lido_da_fact_pedidos(gold_dir):
+    kpis = ["total_pedidos", "ticket_medio_pedido", "total_itens"]
+    grao_item = _executar(gold_dir, kpis, ["total", "categoria"])
+    _criar_fact_pedidos(gold_dir)
+
+    filtros = {"cliente_pais": ["Chile"], "de": 20240201}
+    sql, _ = montar_query(gold_dir, kpis, ["total", "categoria"], filtros)
+    assert "fact_pedidos" in sql
+    for f in (None, filtros):
+        df = _executar(gold_dir, kpis, ["total", "categoria"], f)
+        esperado = _executar(gold_dir, kpis, ["categoria"], f)  # sem o conjunto total: só grão de item
+        total = duckdb.execute(f"""
+            SELECT COUNT(DISTINCT f.id_pedido_original), ROUND(SUM(f.valor_venda) / COUNT(DISTINCT f.id_pedido_original), 2)
+            FROM read_parquet('{gold_dir}/fact_vendas.parquet') f
+            JOIN read_parquet('{gold_dir}/dim_clientes.parquet') c USING (id_cliente)
+            WHERE {"c.cliente_pais = 'Chile' AND f.id_tempo >= 20240201" if f else "TRUE"}
+        """).fetchone()
+        linha = df[df["agrupamento"] == "total"].iloc[0]
+        assert (linha["total_pedidos"], linha["ticket_medio_pedido"]) == total
+        categorias = df[df["agrupamento"] == "categoria"].sort_values("categoria").reset_index(drop=True)
+        assert categorias[kpis].equals(esperado.sort_values("categoria").reset_index(drop=True)[kpis])
+
+    assert _executar(gold_dir, kpis, ["total", "categoria"]).sort_values("categoria").reset_index(drop=True).equals(
+        grao_item.sort_values("categoria").reset_index(drop=True)
+    )
+
+
+def test_filtro_de_produto_segue_no_grao_de_item(gold_dir):
+    _criar_fact_pedidos(gold_dir)
+    sql, _ = montar_query(gold_dir, ["total_pedidos"], ["total"], {"categoria": ["A"]})
+    assert "fact_pedidos" not in sql
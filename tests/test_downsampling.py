@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+
+from src.utils.downsampling import lttb, reamostrar_serie, reduzir_para_pixels
+
+
+def test_lttb_preserva_extremos_e_ordem():
+    x = np.arange(1000)
+    y = np.sin(x / 40)
+    y[613] = 25.0   # pico isolado
+    y[271] = -25.0  # vale isolado
+
+    indices = lttb(x, y, 50)
+    assert len(indices) == 50
+    assert indices[0] == 0 and indices[-1] == len(x) - 1
+    assert np.all(np.diff(indices) > 0)
+    assert {613, 271} <= set(indices.tolist())
+
+
+def test_lttb_sem_reducao():
+    assert lttb(range(10), range(10), 10).tolist() == list(range(10))
+    assert lttb(range(10), range(10), 2).tolist() == list(range(10))
+
+
+def test_reamostrar_semana_comeca_na_segunda():
+    df = pd.DataFrame({"data": pd.date_range("2024-01-03", "2024-01-16", freq="D"), "valor": 1.0})
+    serie = reamostrar_serie(df, "data", {"valor": "sum"}, "Semana")
+    assert serie["data"].dt.dayofweek.eq(0).all()
+    assert serie["valor"].tolist() == [5.0, 7.0, 2.0]
+
+
+def test_reamostrar_mes_soma_o_total():
+    df = pd.DataFrame({"data": pd.date_range("2024-01-20", "2024-03-10", freq="D"), "valor": 2.0})
+    serie = reamostrar_serie(df, "data", {"valor": "sum"}, "Mês")
+    assert serie["data"].dt.day.eq(1).all()
+    assert serie["valor"].sum() == df["valor"].sum()
+
+
+def test_reduzir_para_pixels():
+    df = pd.DataFrame({"data": pd.date_range("2024-01-01", periods=500, freq="D"), "valor": np.arange(500.0)})
+    assert reduzir_para_pixels(df, "data", "valor", 600) is df
+    reduzido = reduzir_para_pixels(df, "data", "valor", 100)
+    assert len(reduzido) == 100
+    assert reduzido["data"].is_monotonic_increasing
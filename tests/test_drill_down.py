@@ -0,0 +1,62 @@
+import duckdb
+import pytest
+
+from src.serving.drill_down import ORDENACOES, fato_ordenada_pela_chave, pagina_itens, tem_chave_paginacao
+
+
+def _ordem_esperada(gold_dir, ordem, descendente, categoria=None):
+    """Pedidos na ordem total esperada, com um único ORDER BY sobre a fato inteira."""
+    expressao = ORDENACOES[ordem][0]
+    direcao = " DESC" if descendente else ""
+    colunas = ([expressao] if expressao else []) + ["f.id_tempo", "f.id_produto", "f.seq_item"]
+    where = "WHERE p.categoria = ?" if categoria else ""
+    return [linha[0] for linha in duckdb.execute(f"""
+        SELECT f.id_pedido_original
+        FROM read_parquet('{gold_dir}/fact_vendas.parquet') f
+        JOIN read_parquet('{gold_dir}/dim_produtos.parquet') p USING (id_produto)
+        {where}
+        ORDER BY {', '.join(c + direcao for c in colunas)}
+    """, [categoria] if categoria else []).fetchall()]
+
+
+def _percorrer(gold_dir, ordem, descendente, tamanho, filtros=None):
+    pedidos, cursor, paginas = [], None, 0
+    while True:
+        pagina, cursor = pagina_itens(gold_dir, filtros, ordem, descendente, cursor, tamanho)
+        assert len(pagina) <= tamanho
+        pedidos.extend(pagina["pedido"].tolist())
+        paginas += 1
+        if cursor is None:
+            return pedidos, paginas
+
+
+@pytest.mark.parametrize("ordem", list(ORDENACOES))
+@pytest.mark.parametrize("descendente", [False, True])
+def test_keyset_sem_duplicatas_nem_lacunas(gold_dir, ordem, descendente):
+    esperado = _ordem_esperada(gold_dir, ordem, descendente)
+    pedidos, _ = _percorrer(gold_dir, ordem, descendente, tamanho=7)
+    assert len(pedidos) == len(set(pedidos))
+    assert pedidos == esperado
+
+
+@pytest.mark.parametrize("ordem", ["data", "valor_venda"])
+def test_keyset_com_filtro(gold_dir, ordem):
+    pedidos, _ = _percorrer(gold_dir, ordem, False, tamanho=5, filtros={"categoria": ["B"]})
+    assert pedidos == _ordem_esperada(gold_dir, ordem, False, categoria="B")
+
+
+def test_pagina_exata_nao_gera_pagina_vazia(gold_dir):
+    total = len(_ordem_esperada(gold_dir, "data", False))
+    pedidos, paginas = _percorrer(gold_dir, "data", False, tamanho=total)
+    assert paginas == 1
+    assert len(pedidos) == total
+
+
+def test_ordenacao_invalida(gold_dir):
+    with pytest.raises(ValueError):
+        pagina_itens(gold_dir, ordem="inexistente")
+
+
+def test_layout_da_fato(gold_dir):
+    assert tem_chave_paginacao(gold_dir)
+    assert fato_ordenada_pela_chave(gold_dir)
@@ -0,0 +1,88 @@
+import datetime
+
+import duckdb
+import pytest
+
+from src.transform import gold_layer
+from src.transform.gold_layer import create_gold_layer_complete, sql_id_tempo
+
+# Pedidos em dias esparsos: o calendário tem que preencher os buracos entre eles
+DATAS_PEDIDO = ["2024-02-27 09:05", "2024-02-27 23:59", "2024-03-02 00:00", "2024-03-10 14:30"]
+
+
+@pytest.fixture
+def gold_build(tmp_path, monkeypatch):
+    """Gold gerada pelo create_gold_layer_complete a partir de uma Silver mínima."""
+    silver = str(tmp_path / "vendas_logistica.parquet").replace("\\", "/")
+    datas = ", ".join(f"('{d}'::TIMESTAMP, {i})" for i, d in enumerate(DATAS_PEDIDO))
+    duckdb.execute(f"""
+        COPY (
+            SELECT data_pedido,
+                   ['Cleats', 'Fishing'][(i % 2) + 1] AS categoria,
+                   'Produto ' || (i % 2) AS nome_produto,
+                   'Caguas' AS cliente_cidade, 'PR' AS cliente_estado, 'Puerto Rico' AS cliente_pais,
+                   'Caribbean' AS pedido_regiao,
+                   ['Late delivery', 'Shipping on time'][(i % 2) + 1] AS status_entrega,
+                   'Standard Class' AS modo_envio,
+                   i + 1 AS dias_envio_real, 4 AS dias_envio_agendado,
+                   80.0 + i AS preco_petroleo_brent,
+                   100.0 * (i + 1) AS valor_venda, 10.0 AS lucro_pedido, 100.0 AS venda_por_cliente,
+                   i AS id_pedido_original
+            FROM (VALUES {datas}) t(data_pedido, i)
+        ) TO '{silver}' (FORMAT PARQUET)
+    """)
+    monkeypatch.setattr(gold_layer, "INPUT_SILVER", silver)
+    monkeypatch.setattr(gold_layer, "INPUT_SILVER_ACESSOS", str(tmp_path / "sem_acessos.parquet"))
+    monkeypatch.setattr(gold_layer, "GERAR_DIM_HORARIO", True)
+
+    destino = tmp_path / "gold"
+    destino.mkdir()
+    assert create_gold_layer_complete(str(destino).replace("\\", "/"))
+    return str(destino).replace("\\", "/")
+
+
+@pytest.mark.parametrize("data", ["2024-02-29", "2023-12-31", "2024-01-01", "1999-10-09"])
+def test_id_tempo_ida_e_volta(data):
+    id_tempo = duckdb.execute(
+        f"SELECT {sql_id_tempo('d')} FROM (SELECT ?::TIMESTAMP AS d)", [f"{data} 23:59"]
+    ).fetchone()[0]
+    assert isinstance(id_tempo, int)
+    assert datetime.datetime.strptime(str(id_tempo), "%Y%m%d").date() == datetime.date.fromisoformat(data)
+
+
+def test_calendario_continuo_com_dias_sem_pedido(gold_build):
+    dias = duckdb.execute(f"""
+        SELECT id_tempo, data_completa, ano, mes, dia
+        FROM read_parquet('{gold_build}/dim_tempo.parquet') ORDER BY id_tempo
+    """).fetchall()
+
+    esperado = [datetime.date(2024, 2, 27) + datetime.timedelta(days=i) for i in range(13)]
+    assert [d[1] for d in dias] == esperado  # inclui 29/02 e os dias sem pedido até 10/03
+    for id_tempo, data, ano, mes, dia in dias:
+        assert id_tempo == ano * 10000 + mes * 100 + dia
+        assert (ano, mes, dia) == (data.year, data.month, data.day)
+
+
+def test_fato_liga_no_calendario_e_no_horario(gold_build):
+    linhas = duckdb.execute(f"""
+        SELECT t.data_completa, h.hora, h.minuto, f.id_horario
+        FROM read_parquet('{gold_build}/fact_vendas.parquet') f
+        JOIN read_parquet('{gold_build}/dim_tempo.parquet') t USING (id_tempo)
+        JOIN read_parquet('{gold_build}/dim_horario.parquet') h USING (id_horario)
+        ORDER BY f.id_pedido_original
+    """).fetchall()
+
+    assert len(linhas) == len(DATAS_PEDIDO)
+    for (data, hora, minuto, id_horario), texto in zip(linhas, DATAS_PEDIDO):
+        pedido = datetime.datetime.fromisoformat(texto)
+        assert (data, hora, minuto) == (pedido.date(), pedido.hour, pedido.minute)
+        assert id_horario == hora * 100 + minuto  # chave hhmm
+
+
+def test_dim_horario_cobre_o_dia(gold_build):
+    total, distintos, menor, maior = duckdb.execute(f"""
+        SELECT COUNT(*), COUNT(DISTINCT id_horario), MIN(id_horario), MAX(id_horario)
+        FROM read_parquet('{gold_build}/dim_horario.parquet')
+        WHERE id_horario = hora * 100 + minuto
+    """).fetchone()
+    assert (total, distintos, menor, maior) == (1440, 1440, 0, 2359)
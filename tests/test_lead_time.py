@@ -0,0 +1,34 @@
+import duckdb
+import pytest
+
+from src.analysis.lead_time import METRICAS_LEAD_TIME, SEGMENTOS_LEAD_TIME, quantis_lead_time
+
+QUANTIS = [0.01, 0.29, 0.5, 0.9, 0.99]
+
+
+@pytest.mark.parametrize("segmento", SEGMENTOS_LEAD_TIME)
+@pytest.mark.parametrize("metrica", list(METRICAS_LEAD_TIME))
+def test_quantis_iguais_ao_quantile_disc(gold_dir, segmento, metrica):
+    """O sketch mesclado dá o mesmo quantil que quantile_disc sobre o histograma expandido."""
+    de, ate = 20240128, 20240210
+    resultado = quantis_lead_time(gold_dir, segmento, metrica, de, ate, quantis=QUANTIS)
+
+    colunas = ", ".join(f"quantile_disc(valor, {q})" for q in QUANTIS)
+    esperado = duckdb.execute(f"""
+        WITH h AS (
+            SELECT {segmento} AS segmento, {METRICAS_LEAD_TIME[metrica][0]} AS valor, itens
+            FROM read_parquet('{gold_dir}/agg_lead_time_diario.parquet')
+            WHERE id_tempo BETWEEN ? AND ?
+        )
+        SELECT segmento, {colunas}
+        FROM h, range(itens)
+        GROUP BY segmento
+        ORDER BY segmento
+    """, [de, ate]).fetchall()
+
+    obtido = resultado[["segmento"] + [f"p{round(q * 100)}" for q in QUANTIS]].itertuples(index=False, name=None)
+    assert list(obtido) == esperado
+
+
+def test_sem_sketch(tmp_path):
+    assert quantis_lead_time(str(tmp_path)) is None
@@ -0,0 +1,93 @@
+import json
+import os
+
+from src.utils.snapshots import (
+    TABELAS_DASHBOARD,
+    limpar_snapshots,
+    listar_snapshots,
+    novo_snapshot,
+    publicar_snapshot,
+    rollback_snapshot,
+    snapshot_atual,
+    snapshot_canonico,
+    versao_atual,
+)
+
+
+def _gravar(snapshot_dir, nome, conteudo):
+    # Snapshots herdados compartilham arquivos por hard link: troca o arquivo, nunca edita no lugar
+    path = os.path.join(snapshot_dir, nome)
+    if os.path.exists(path):
+        os.remove(path)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(conteudo)
+
+
+def _publicar(gold_root, fato="v1", outra="v1"):
+    """Publica um snapshot herdado cujo manifesto traz os checksums dados."""
+    snapshot_dir = novo_snapshot(gold_root, herdar=True)
+    tabelas = {nome: {"sha256": f"{nome}-{fato}"} for nome in TABELAS_DASHBOARD}
+    tabelas["fact_acessos"] = {"sha256": f"fact_acessos-{outra}"}
+    _gravar(snapshot_dir, "manifest.json", json.dumps({"tabelas": tabelas}))
+    publicar_snapshot(snapshot_dir, gold_root)
+    return os.path.basename(snapshot_dir)
+
+
+def test_sem_ponteiro_usa_layout_antigo(tmp_path):
+    assert versao_atual(str(tmp_path)) is None
+    assert snapshot_atual(str(tmp_path)) == str(tmp_path)
+
+
+def test_publicar_e_rollback(tmp_path):
+    root = str(tmp_path)
+    primeiro = novo_snapshot(root)
+    _gravar(primeiro, "fact_vendas.parquet", "v1")
+    publicar_snapshot(primeiro, root)
+    assert snapshot_atual(root) == primeiro
+
+    # Herança por hard link: o novo snapshot vê os arquivos do publicado sem copiá-los
+    segundo = novo_snapshot(root, herdar=True)
+    assert os.path.samefile(os.path.join(primeiro, "fact_vendas.parquet"), os.path.join(segundo, "fact_vendas.parquet"))
+    _gravar(segundo, "fact_vendas.parquet", "v2")
+    publicar_snapshot(segundo, root)
+    assert versao_atual(root) == os.path.basename(segundo)
+
+    # Reescrever no snapshot novo não altera o anterior; o rollback o republica intacto
+    assert rollback_snapshot(root) == os.path.basename(primeiro)
+    with open(os.path.join(snapshot_atual(root), "fact_vendas.parquet"), encoding="utf-8") as f:
+        assert f.read() == "v1"
+
+
+def test_rollback_sem_anterior(tmp_path):
+    root = str(tmp_path)
+    publicar_snapshot(novo_snapshot(root), root)
+    assert rollback_snapshot(root) is None
+
+
+def test_limpeza_mantem_os_mais_recentes(tmp_path):
+    root = str(tmp_path)
+    versoes = [_publicar(root, fato=str(i)) for i in range(7)]
+    limpar_snapshots(root, manter=3)
+    assert listar_snapshots(root) == versoes[-3:]
+
+
+def test_limpeza_preserva_o_snapshot_canonico(tmp_path):
+    root = str(tmp_path)
+    canonico = _publicar(root)
+    # Builds que só mudam tabelas fora do dashboard: o canônico continua sendo o primeiro
+    for i in range(7):
+        _publicar(root, outra=str(i))
+    assert os.path.basename(snapshot_canonico(root)) == canonico
+    assert canonico in listar_snapshots(root)
+    assert len(listar_snapshots(root)) == 6
+
+    # Mudança numa tabela do dashboard: o publicado vira o canônico e o antigo pode sair
+    atual = _publicar(root, fato="v2")
+    assert os.path.basename(snapshot_canonico(root)) == atual
+    assert canonico not in listar_snapshots(root)
+
+
+def test_canonico_sem_manifesto_e_o_publicado(tmp_path):
+    root = str(tmp_path)
+    publicar_snapshot(novo_snapshot(root), root)
+    assert snapshot_canonico(root) == snapshot_atual(root)
@@ -0,0 +1,30 @@
+import os
+
+from src.utils.watcher import alterados, estado_arquivos, ler_estado, salvar_estado
+
+
+def test_alterados_novos_e_modificados():
+    anterior = {"a.csv": [10, 1], "b.csv": [20, 2]}
+    atual = {"a.csv": [10, 1], "b.csv": [21, 3], "c.csv": [5, 4]}
+    assert alterados(anterior, atual) == ["b.csv", "c.csv"]
+    assert alterados(atual, atual) == []
+    assert alterados({}, atual) == ["a.csv", "b.csv", "c.csv"]
+
+
+def test_estado_arquivos_le_so_metadados(tmp_path):
+    (tmp_path / "raw").mkdir()
+    (tmp_path / "raw" / "vendas.csv").write_text("x")
+    (tmp_path / ".oculto").write_text("x")
+
+    estado = estado_arquivos(str(tmp_path))
+    assert list(estado) == ["raw/vendas.csv"]
+
+    (tmp_path / "raw" / "vendas.csv").write_text("xy")
+    assert alterados(estado, estado_arquivos(str(tmp_path))) == ["raw/vendas.csv"]
+
+
+def test_estado_persistido(tmp_path):
+    path = os.path.join(str(tmp_path), "logs", "watch.json")
+    assert ler_estado(path) == {}
+    salvar_estado(path, {"raw/vendas.csv": [1, 2]})
+    assert ler_estado(path) == {"raw/vendas.csv": [1, 2]}